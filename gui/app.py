@@ -140,8 +140,10 @@ class GenealogyApp:
         try:
             # Verificar si el canvas existe
             if hasattr(self, 'tree_canvas') and self.tree_canvas.winfo_exists():
-                # Crear una nueva instancia del visualizador para asegurar datos frescos
-                visualizer = FamilyGraphVisualizer()
+                # Reutilizar el visualizador: el canvas se actualiza de forma incremental
+                if getattr(self, 'tree_visualizer', None) is None:
+                    self.tree_visualizer = FamilyGraphVisualizer()
+                visualizer = self.tree_visualizer
                 
                 # ✅ CORRECCIÓN CLAVE: Nueva definición con orden correcto
                 def custom_show_menu(event, person):
@@ -182,6 +184,10 @@ class GenealogyApp:
                             label="� Ver relaciones",
                             command=lambda: self.mostrar_relaciones(person)
                         )
+                        menu.add_command(
+                            label="🌿 Expandir/Contraer rama",
+                            command=lambda: visualizer._toggle_expand(person)
+                        )
                         # NO incluir opción de eliminar para el Ego
                     else:
                         # MENÚ NORMAL PARA OTRAS PERSONAS
@@ -216,6 +222,10 @@ class GenealogyApp:
                             label="🔍 Ver relaciones",
                             command=lambda: self.mostrar_relaciones(person)
                         )
+                        menu.add_command(
+                            label="🌿 Expandir/Contraer rama",
+                            command=lambda: visualizer._toggle_expand(person)
+                        )
                         menu.add_command(
                             label="🗑️ Eliminar Persona",
                             command=lambda: self.eliminar_persona(person)
@@ -309,7 +319,7 @@ class GenealogyApp:
                     )
                 else:
                     messagebox.showerror("Error", "El padre debe ser masculino")
-                    self.family.members.remove(nueva_persona)  # Eliminar si falla
+                    self.family.remove_member(nueva_persona)  # Eliminar si falla
                     return
             
             elif tipo_relacion == "madre":
@@ -322,7 +332,7 @@ class GenealogyApp:
                     )
                 else:
                     messagebox.showerror("Error", "La madre debe ser femenina")
-                    self.family.members.remove(nueva_persona)  # Eliminar si falla
+                    self.family.remove_member(nueva_persona)  # Eliminar si falla
                     return
 
             elif tipo_relacion == "conyuge":
@@ -358,7 +368,7 @@ class GenealogyApp:
                 messagebox.showerror("Error", mensaje)
                 # Si falló, eliminar la persona recién creada
                 if nueva_persona in self.family.members:
-                    self.family.members.remove(nueva_persona)
+                    self.family.remove_member(nueva_persona)
 
         # Abrir formulario para NUEVA persona
         title_map = {
@@ -536,7 +536,7 @@ class ConsultasPanel:
                 gedcom_content = f.read()
             
             # Limpiar familia actual
-            self.family.members.clear()
+            self.family.clear_members()
             self.family.name = "Familia de Ejemplo"
             self.family.description = "Árbol familiar de ejemplo cargado desde archivo GEDCOM"
             
@@ -583,7 +583,7 @@ class ConsultasPanel:
                 gedcom_content = f.read()
             
             # Limpiar familia actual
-            self.family.members.clear()
+            self.family.clear_members()
             self.family.name = f"Familia desde {os.path.basename(file_path)}"
             self.family.description = f"Árbol familiar cargado desde: {file_path}"
             
@@ -827,10 +827,7 @@ class RelationshipForm:
             return
         
         # Generar cédula única
-        from models.family import Family
-        cedula = Family.generate_cedula()
-        while not Family.validate_cedula_unique(cedula, self.family):
-            cedula = Family.generate_cedula()
+        cedula = self.family.allocate_cedula(self.person.province)
         
         # Crear bebé
         from models.person import Person
@@ -889,10 +886,7 @@ class RelationshipForm:
             return
         
         # Generar cédula única
-        from models.family import Family
-        cedula = Family.generate_cedula()
-        while not Family.validate_cedula_unique(cedula, self.family):
-            cedula = Family.generate_cedula()
+        cedula = self.family.allocate_cedula(self.person.province)
         
         # Crear hermano
         from models.person import Person
@@ -113,7 +113,7 @@ class HistoryPanel:
     def limpiar_historial(self):
         if messagebox.askyesno("Confirmar", "¿Estás seguro de limpiar todo el historial?"):
             for person in self.family.members:
-                person.history.clear()
+                person.clear_history()
             self.update_history()
 
     def agregar_evento_manual(self):
@@ -353,6 +353,6 @@ class HistoryPanel:
         self.history_text.delete(1.0, tk.END)
         for person in self.family.members:
             self.history_text.insert(tk.END, f"👤 {person}\n", "person")
-            for event in person.history:
+            for event in person.get_history():
                 self.history_text.insert(tk.END, f"  • {event}\n", "event")
             self.history_text.insert(tk.END, "\n")
\ No newline at end of file
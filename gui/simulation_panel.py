@@ -24,21 +24,27 @@ import threading
 import datetime
 import os
 import random
+from collections import deque
 from models.simulation_config import SimulationConfig
 from services.simulacion_service import SimulacionService
+from utils.event_feed import EventFeed
 from utils.graph_visualizer import FamilyGraphVisualizer
 from utils.timeline_visualizer import TimelineVisualizer
 
 # ✅ CORRECCIÓN: Asegurar que logging esté importado
 logger = logging.getLogger(__name__)
 
+MAX_EVENTS = 1000      # Eventos retenidos en memoria y en el listbox
+EVENT_TICK_MS = 100    # Cada cuánto la interfaz vacía la cola de eventos
+
 class SimulationPanel:
     def __init__(self, parent, family, config: SimulationConfig = None):
         self.parent = parent
         self.family = family
         self.config = config or SimulationConfig()
         self.simulated_family = None
-        self.simulation_events = []
+        self.simulation_events = deque(maxlen=MAX_EVENTS)
+        self.event_feed = EventFeed(maxlen=MAX_EVENTS)  # Eventos pendientes de mostrar
         self.running = False
         self.paused = False
         self.simulation_mode = "memory"  # "memory" o "file"
@@ -57,6 +63,7 @@ class SimulationPanel:
         self.mode_var = None
         
         self.setup_ui()
+        self.parent.after(EVENT_TICK_MS, self._drain_events)
     
     def setup_ui(self):
         """Configura la interfaz de usuario del panel de simulación"""
@@ -261,8 +268,8 @@ class SimulationPanel:
             self.tree_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
             
             # Configurar scrollbars
-            h_scrollbar.config(command=self.tree_canvas.xview)
-            v_scrollbar.config(command=self.tree_canvas.yview)
+            h_scrollbar.config(command=self.on_xscroll)
+            v_scrollbar.config(command=self.on_yscroll)
             
             # Bind eventos del mouse para scroll y zoom
             self.bind_mouse_events()
@@ -342,6 +349,9 @@ class SimulationPanel:
             self.tree_canvas.bind("<ButtonPress-1>", self.on_canvas_drag_start)
             self.tree_canvas.bind("<B1-Motion>", self.on_canvas_drag)
             
+            # Al cambiar de tamaño puede quedar a la vista contenido aún no dibujado
+            self.tree_canvas.bind("<Configure>", lambda e: self.update_viewport())
+            
             # Focus para recibir eventos de teclado
             self.tree_canvas.focus_set()
             
@@ -361,9 +371,33 @@ class SimulationPanel:
                 delta = 0
             
             self.tree_canvas.yview_scroll(int(-1 * (delta / 120)), "units")
+            self.update_viewport()
         except Exception as e:
             logger.error(f"Error en scroll del mouse: {e}")
     
+    def on_xscroll(self, *args):
+        """Desplaza el canvas con la barra horizontal"""
+        self.tree_canvas.xview(*args)
+        self.update_viewport()
+    
+    def on_yscroll(self, *args):
+        """Desplaza el canvas con la barra vertical"""
+        self.tree_canvas.yview(*args)
+        self.update_viewport()
+    
+    def update_viewport(self):
+        """Dibuja las partes del árbol que entraron en la vista"""
+        try:
+            if self.visualizer and self.tree_canvas:
+                self.visualizer.update_viewport(self.tree_canvas)
+        except Exception as e:
+            logger.error(f"Error actualizando la vista del árbol: {e}")
+    
+    def _content_bbox(self):
+        """Rectángulo del árbol completo (incluye lo que no está dibujado por estar fuera de vista)"""
+        bbox = self.visualizer.content_bbox() if self.visualizer else None
+        return bbox or self.tree_canvas.bbox("all")
+    
     def on_ctrl_mouse_wheel(self, event):
         """Maneja el zoom con Ctrl + rueda del mouse"""
         try:
@@ -381,6 +415,7 @@ class SimulationPanel:
     def on_canvas_drag(self, event):
         """Arrastra el canvas"""
         self.tree_canvas.scan_dragto(event.x, event.y, gain=1)
+        self.update_viewport()
     
     def zoom_in(self):
         """Aumenta el zoom"""
@@ -420,7 +455,7 @@ class SimulationPanel:
         try:
             # Actualizar canvas y obtener dimensiones
             self.tree_canvas.update_idletasks()
-            bbox = self.tree_canvas.bbox("all")
+            bbox = self._content_bbox()
             
             if not bbox:
                 return
@@ -432,9 +467,9 @@ class SimulationPanel:
             if canvas_width <= 1 or canvas_height <= 1:
                 return
             
-            # Calcular dimensiones del contenido
-            content_width = bbox[2] - bbox[0]
-            content_height = bbox[3] - bbox[1]
+            # Calcular dimensiones del contenido (sin el zoom actual)
+            content_width = max(bbox[2] - bbox[0], 1) / self.zoom_level
+            content_height = max(bbox[3] - bbox[1], 1) / self.zoom_level
             
             # Calcular zoom necesario con margen
             margin_factor = 0.9  # 10% de margen
@@ -468,14 +503,18 @@ class SimulationPanel:
             # Evitar re-escalar si ya aplicamos este zoom
             if abs(self._last_applied_zoom - self.zoom_level) > 1e-6:
                 try:
-                    scale_factor = self.zoom_level / max(old_zoom, 1e-6)
-                    self.tree_canvas.scale("all", 0, 0, scale_factor, scale_factor)
+                    if self.visualizer:
+                        # El visualizador reubica solo lo dibujado y ajusta el nivel de detalle
+                        self.visualizer.set_zoom(self.tree_canvas, self.zoom_level)
+                    else:
+                        scale_factor = self.zoom_level / max(old_zoom, 1e-6)
+                        self.tree_canvas.scale("all", 0, 0, scale_factor, scale_factor)
                     self._last_applied_zoom = self.zoom_level
                 except Exception as e:
                     logger.error(f"Error aplicando escala al canvas: {e}")
             
             # Actualizar región de scroll
-            bbox = self.tree_canvas.bbox("all")
+            bbox = self._content_bbox()
             if bbox:
                 margin = 100
                 scroll_region = (
@@ -486,6 +525,9 @@ class SimulationPanel:
                 )
                 self.tree_canvas.configure(scrollregion=scroll_region)
             
+            # Dibujar lo que haya quedado a la vista con la nueva región de scroll
+            self.update_viewport()
+            
         except Exception as e:
             logger.error(f"Error aplicando zoom: {e}")
     
@@ -531,11 +573,10 @@ class SimulationPanel:
                 # Crear copia profunda de la familia
                 self.simulated_family = copy.deepcopy(self.family)
                 self.simulated_family.current_year = self.family.current_year or 2024
+                SimulacionService.inicializar_semilla(self.config)
                 
                 # Limpiar eventos anteriores
-                self.simulation_events.clear()
-                if self.event_listbox:
-                    self.event_listbox.delete(0, tk.END)
+                self._clear_events()
                 
                 self.add_simulation_event("🚀 Simulación iniciada en modo memoria")
             
@@ -657,9 +698,7 @@ class SimulationPanel:
             self.simulated_family.current_year = 2024  # Año base
             
             # Limpiar eventos anteriores
-            self.simulation_events.clear()
-            if self.event_listbox:
-                self.event_listbox.delete(0, tk.END)
+            self._clear_events()
             
             # Actualizar visualización
             self.draw_tree()
@@ -669,9 +708,10 @@ class SimulationPanel:
             self.add_simulation_event("📂 Familia de ejemplo importada exitosamente")
             
             # Mostrar información de la familia importada
-            living_members = len([p for p in self.simulated_family.members if p.alive])
-            total_members = len(self.simulated_family.members)
-            couples = len([p for p in self.simulated_family.members if p.has_partner()]) // 2
+            aggregates = self.simulated_family.get_aggregates()
+            living_members = aggregates.living
+            total_members = aggregates.size
+            couples = aggregates.couples
             
             info_event = f"👥 {living_members} miembros vivos de {total_members} totales, {couples} parejas"
             self.add_simulation_event(info_event)
@@ -732,22 +772,20 @@ class SimulationPanel:
             self.simulated_family = copy.deepcopy(self.family)
             self.simulated_family.current_year = self.family.current_year or 2024
             
-            if self.event_listbox:
-                self.event_listbox.delete(0, tk.END)
-            self.simulation_events.clear()
+            self._clear_events()
             
             self.add_simulation_event("👣 Modo paso a paso iniciado")
         
         try:
             # Ejecutar un ciclo completo de simulación
-            eventos = SimulacionService.ejecutar_ciclo_completo(self.simulated_family, self.config)
+            with self.simulated_family.lock:
+                eventos = SimulacionService.ejecutar_ciclo_completo(self.simulated_family, self.config)
+                
+                # Avanzar un año
+                self.simulated_family.current_year += 1
             
             # Agregar eventos a la lista
-            for evento in eventos:
-                self.add_simulation_event(evento)
-            
-            # Avanzar un año
-            self.simulated_family.current_year += 1
+            self.event_feed.extend(eventos)
             
             # Actualizar visualización
             self.draw_tree()
@@ -784,9 +822,7 @@ class SimulationPanel:
             self.simulated_family = None
             
             # Limpiar eventos de simulación
-            self.simulation_events.clear()
-            if self.event_listbox:
-                self.event_listbox.delete(0, tk.END)
+            self._clear_events()
             
             # Limpiar canvas
             if hasattr(self, 'tree_canvas') and self.tree_canvas:
@@ -863,21 +899,22 @@ class SimulationPanel:
         """Ejecuta el bucle principal de simulación"""
         try:
             while self.running:
-                if not self.paused and self.simulated_family:
-                    # Ejecutar un ciclo de simulación
-                    eventos = SimulacionService.ejecutar_ciclo_completo(self.simulated_family, self.config)
+                family = self.simulated_family
+                if not self.paused and family:
+                    # Ejecutar un ciclo de simulación (con el candado: el dibujo copia la familia con él)
+                    with family.lock:
+                        eventos = SimulacionService.ejecutar_ciclo_completo(family, self.config)
+                        
+                        # Avanzar un año
+                        family.current_year += 1
                     
-                    # Agregar eventos a la lista
-                    for evento in eventos:
-                        self.add_simulation_event(evento)
+                    # Encolar los eventos del ciclo; la interfaz los muestra en su próximo tick
+                    self.event_feed.extend(eventos)
                     
                     # Actualizar visualización
                     self.parent.after(0, self.draw_tree)
                     self.parent.after(0, self.update_stats_display)
                     
-                    # Avanzar un año
-                    self.simulated_family.current_year += 1
-                    
                     # Dormir según la configuración
                     threading.Event().wait(self.config.events_interval)
                 else:
@@ -886,7 +923,7 @@ class SimulationPanel:
                     
         except Exception as e:
             logger.error(f"Error en simulación: {e}", exc_info=True)
-            self.parent.after(0, lambda: self.add_simulation_event(f"❌ Error en simulación: {str(e)}"))
+            self.add_simulation_event(f"❌ Error en simulación: {str(e)}")
     
     def draw_tree(self):
         """Dibuja el árbol de la familia simulada con soporte para scroll y zoom"""
@@ -897,19 +934,11 @@ class SimulationPanel:
             # Crear nuevo visualizador si no existe
             if not self.visualizer:
                 self.visualizer = FamilyGraphVisualizer()
+                self.visualizer.set_zoom(self.tree_canvas, self._last_applied_zoom)
             
-            # ✅ USAR EL MÉTODO CORRECTO con Canvas (la limpieza se hace en draw_family_tree)
-            self.visualizer.draw_family_tree(self.simulated_family, self.tree_canvas)
-            
-            # Actualizar región de scroll después de dibujar
-            self.update_scroll_region()
-            
-            # Reaplicar zoom actual en caso de que el canvas haya sido limpiado/redibujado
-            try:
-                self.apply_zoom(self._last_applied_zoom)
-            except Exception:
-                # Fallback sencillo si no está inicializado
-                self.apply_zoom(1.0)
+            # El layout se calcula en un hilo aparte; el cuadro se aplica en el hilo de Tk
+            self.visualizer.request_draw(self.simulated_family, self.tree_canvas,
+                                         on_applied=self._on_tree_drawn)
             
         except Exception as e:
             logger.error(f"Error al dibujar árbol en simulación: {e}", exc_info=True)
@@ -923,6 +952,21 @@ class SimulationPanel:
                     fill="red"
                 )
     
+    def _on_tree_drawn(self):
+        """Ajusta scroll y zoom cuando el cuadro calculado en segundo plano ya está en el canvas"""
+        try:
+            # Actualizar región de scroll después de dibujar
+            self.update_scroll_region()
+            
+            # Reaplicar zoom actual en caso de que el canvas haya sido limpiado/redibujado
+            try:
+                self.apply_zoom(self._last_applied_zoom)
+            except Exception:
+                # Fallback sencillo si no está inicializado
+                self.apply_zoom(1.0)
+        except Exception as e:
+            logger.error(f"Error al ajustar el árbol de la simulación: {e}", exc_info=True)
+    
     def update_scroll_region(self):
         """Actualiza la región de scroll basada en el contenido del canvas"""
         try:
@@ -930,7 +974,7 @@ class SimulationPanel:
             self.tree_canvas.update_idletasks()
             
             # Obtener las dimensiones del contenido
-            bbox = self.tree_canvas.bbox("all")
+            bbox = self._content_bbox()
             
             if bbox:
                 margin = 100
@@ -960,13 +1004,17 @@ class SimulationPanel:
             if not self.simulated_family or not self.stats_labels:
                 return
             
-            living_members = len([p for p in self.simulated_family.members if p.alive])
-            total_members = len(self.simulated_family.members)
-            couples = len([p for p in self.simulated_family.members if p.has_partner()]) // 2
-            
-            # Contar nacimientos y fallecimientos (simplificado)
-            births = len([p for p in self.simulated_family.members if p.calculate_virtual_age() < 1])
-            deaths = len([p for p in self.simulated_family.members if not p.alive])
+            # Los índices se leen con el candado: el hilo de simulación puede estar modificándolos
+            with self.simulated_family.lock:
+                aggregates = self.simulated_family.get_aggregates()
+                living_members = aggregates.living
+                total_members = aggregates.size
+                couples = aggregates.couples
+                
+                # Nacimientos del año simulado actual (desde el índice de años)
+                current_year = self.simulated_family.current_year
+                births = self.simulated_family.get_year_index().count_born_between(current_year, current_year)
+                deaths = aggregates.deceased
             
             # Actualizar labels
             stats = {
@@ -986,25 +1034,41 @@ class SimulationPanel:
             logger.error(f"Error actualizando estadísticas: {e}", exc_info=True)
     
     def add_simulation_event(self, event_text: str):
-        """Agrega un evento a la lista de eventos de simulación"""
+        """Encola un evento de simulación (se puede llamar desde cualquier hilo)"""
+        self.event_feed.append(event_text)
+    
+    def _drain_events(self):
+        """Vuelca en el listbox los eventos pendientes y se reprograma a ritmo fijo"""
         try:
-            timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-            formatted_event = f"[{timestamp}] {event_text}"
-            
-            # Agregar a la lista interna
-            self.simulation_events.append(formatted_event)
-            
-            # Agregar al listbox visual si existe
-            if self.event_listbox:
-                self.event_listbox.insert(tk.END, formatted_event)
-                self.event_listbox.see(tk.END)
+            if self.event_listbox and not self.event_listbox.winfo_exists():
+                return  # El panel se destruyó: no seguir programando ticks
+            events, dropped = self.event_feed.drain()
+            if dropped:
+                # La cola se desbordó: avisar antes de los eventos que sí llegaron
+                events = [f"⚠ {dropped} eventos omitidos"] + events[-(MAX_EVENTS - 1):]
+            if events:
+                # Agregar a la lista interna (acotada a MAX_EVENTS)
+                self.simulation_events.extend(events)
                 
-                # Limitar número de eventos mostrados
-                if self.event_listbox.size() > 1000:
-                    self.event_listbox.delete(0, 50)
-                    
+                # Una sola inserción por tick y un solo recorte
+                if self.event_listbox:
+                    self.event_listbox.insert(tk.END, *events)
+                    excess = self.event_listbox.size() - MAX_EVENTS
+                    if excess > 0:
+                        self.event_listbox.delete(0, excess - 1)
+                    self.event_listbox.see(tk.END)
+        except tk.TclError:
+            return
         except Exception as e:
-            logger.error(f"Error agregando evento de simulación: {e}", exc_info=True)
+            logger.error(f"Error mostrando eventos de simulación: {e}", exc_info=True)
+        self.parent.after(EVENT_TICK_MS, self._drain_events)
+    
+    def _clear_events(self):
+        """Descarta los eventos retenidos, los pendientes y los del listbox"""
+        self.event_feed.clear()
+        self.simulation_events.clear()
+        if self.event_listbox:
+            self.event_listbox.delete(0, tk.END)
     
     def save_simulation_state(self):
         """Guarda el estado actual de la simulación"""
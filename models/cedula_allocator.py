@@ -0,0 +1,78 @@
+# models/cedula_allocator.py
+from __future__ import annotations
+import random
+from typing import Iterable, List, Optional
+
+from utils.validators import PROVINCIAS_DIGITOS
+
+# Dígito usado cuando la provincia no está en PROVINCIAS_DIGITOS
+UNKNOWN_PROVINCE_DIGIT = "8"
+
+_RANGE = 10 ** 8        # Números disponibles después del dígito de provincia
+_MULTIPLIER = 48271     # Coprimo con 10^8: recorre todo el rango sin repetir
+
+
+class CedulaAllocator:
+    """Asignador de cédulas únicas con prefijo de provincia.
+
+    Cada provincia tiene su propio rango de 9 dígitos ("P" + 8 dígitos) que se
+    recorre con una permutación fija, así que cada cédula se entrega una sola
+    vez sin reintentos aleatorios. Las cédulas ya existentes (por ejemplo las
+    escritas a mano) se registran para saltarlas.
+    """
+
+    def __init__(self, existing: Iterable[str] = (), seed: Optional[int] = None):
+        """
+        Args:
+            existing: Cédulas que ya están en uso
+            seed (int, optional): Semilla para el punto de inicio de cada rango;
+                sin semilla se usa el generador global (reproducible con random.seed)
+        """
+        self._used = set()
+        self._counters = {}  # dígito de provincia -> siguiente posición de la permutación
+        self._offsets = {}   # dígito de provincia -> desplazamiento inicial
+        self._rng = random.Random(seed) if seed is not None else None  # None = generador global
+        self.retries = 0     # Cédulas saltadas por estar ya registradas (acumulado)
+        self.register_many(existing)
+
+    def register(self, cedula: str) -> None:
+        """Marca una cédula como usada"""
+        if cedula:
+            self._used.add(str(cedula))
+
+    def register_many(self, cedulas: Iterable[str]) -> None:
+        """Marca varias cédulas como usadas"""
+        for cedula in cedulas:
+            self.register(cedula)
+
+    def is_available(self, cedula: str) -> bool:
+        """Indica si una cédula no ha sido usada ni entregada"""
+        return str(cedula) not in self._used
+
+    @staticmethod
+    def province_digit(province: Optional[str]) -> str:
+        """Dígito inicial de la cédula para una provincia"""
+        return PROVINCIAS_DIGITOS.get(province, UNKNOWN_PROVINCE_DIGIT)
+
+    def allocate(self, province: Optional[str] = None) -> str:
+        """Entrega una cédula nueva para la provincia indicada"""
+        digit = self.province_digit(province)
+        if digit not in self._counters:
+            self._counters[digit] = 0
+            self._offsets[digit] = (self._rng or random).randrange(_RANGE)
+
+        # Solo se salta cuando la cédula ya estaba registrada de antemano
+        while self._counters[digit] < _RANGE:
+            position = self._counters[digit]
+            self._counters[digit] += 1
+            number = (position * _MULTIPLIER + self._offsets[digit]) % _RANGE
+            cedula = f"{digit}{number:08d}"
+            if cedula not in self._used:
+                self._used.add(cedula)
+                return cedula
+            self.retries += 1
+        raise ValueError(f"No quedan cédulas disponibles para la provincia {province}")
+
+    def reserve(self, count: int, province: Optional[str] = None) -> List[str]:
+        """Reserva varias cédulas de una vez (para generadores por lotes)"""
+        return [self.allocate(province) for _ in range(count)]
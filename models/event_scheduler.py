@@ -0,0 +1,59 @@
+# models/event_scheduler.py
+from __future__ import annotations
+import heapq
+from typing import Any, List
+
+
+class EventScheduler:
+    """Cola de eventos futuros de la simulación, ordenada por año.
+
+    Cada tipo de evento ('fallecimiento', 'pareja', 'nacimiento') tiene su propia
+    cola de prioridad. Un sujeto tiene como máximo un evento vigente por tipo:
+    al reprogramarlo o cancelarlo, la entrada anterior queda obsoleta y se
+    descarta al salir de la cola, sin tener que buscarla.
+    """
+
+    def __init__(self):
+        self.scheduled = {}    # id(miembro) -> miembro ya programado
+        self.death_bands = {}  # id(miembro) -> tramo de salud con que se muestreó su fallecimiento
+        self.current_year = None  # Año del ciclo en curso (referencia para las edades)
+        self._queues = {}      # tipo -> heap de (año, secuencia, versión, sujeto)
+        self._versions = {}    # (tipo, id(sujeto)) -> versión vigente
+        self._sequence = 0     # Desempate estable entre eventos del mismo año
+
+    def schedule(self, kind: str, year: int, subject: Any) -> None:
+        """Programa (o reprograma) el evento de un sujeto para el año indicado"""
+        key = (kind, id(subject))
+        version = self._versions.get(key, 0) + 1
+        self._versions[key] = version
+        self._sequence += 1
+        heapq.heappush(self._queues.setdefault(kind, []), (year, self._sequence, version, subject))
+
+    def cancel(self, kind: str, subject: Any) -> None:
+        """Anula el evento pendiente de un sujeto (si lo tiene)"""
+        key = (kind, id(subject))
+        if key in self._versions:
+            self._versions[key] += 1
+
+    def forget(self, subject: Any) -> None:
+        """Anula todos los eventos de un sujeto que dejó de pertenecer a la familia"""
+        for kind in self._queues:
+            self.cancel(kind, subject)
+        self.scheduled.pop(id(subject), None)
+        self.death_bands.pop(id(subject), None)
+
+    def pop_due(self, kind: str, year: int) -> List[Any]:
+        """Saca los sujetos con eventos vigentes del tipo indicado hasta el año dado"""
+        queue = self._queues.get(kind, [])
+        due = []
+        while queue and queue[0][0] <= year:
+            _, _, version, subject = heapq.heappop(queue)
+            key = (kind, id(subject))
+            if self._versions.get(key) == version:
+                del self._versions[key]
+                due.append(subject)
+        return due
+
+    def pending(self, kind: str) -> int:
+        """Cantidad de entradas en la cola de un tipo (incluye obsoletas aún no descartadas)"""
+        return len(self._queues.get(kind, []))
@@ -0,0 +1,166 @@
+# models/external_pool.py
+from __future__ import annotations
+import random
+import threading
+from collections import deque
+from typing import Optional
+
+from .person import Person
+from .family import Family
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional: sin él los lotes se generan con random
+    np = None
+
+PROVINCES = ["San José", "Alajuela", "Cartago", "Heredia", "Guanacaste", "Puntarenas", "Limón"]
+
+EXTERNAL_SURNAMES = ["González", "Vargas", "Morales", "Castro", "Rojas", "Herrera", "Vega", "Ramírez",
+                     "Aguilar", "Solano", "Mora", "Araya", "Villalobos", "Cordero", "Chaves", "Monge",
+                     "Quesada", "Carballo", "Mendez", "Esquivel", "Segura", "Trejos", "Salas", "Picado",
+                     "Mena", "Fallas", "Alfaro", "Ulate", "Zúñiga", "Calderón", "Matarrita", "Elizondo"]
+
+
+class ExternalPool:
+    """Reserva de personas externas pre-generadas para formar parejas.
+
+    Las personas se crean por lotes sin cédula, que la asigna la familia que
+    las recibe, y se guardan por género y franja de edad. NumPy (si está
+    disponible) solo sortea de una vez los datos sueltos del lote (edad, fecha,
+    provincia, apellido, salud); cada Person se sigue armando en Python. La
+    reserva se llena al crearse, así las primeras parejas ya la encuentran
+    lista; cuando baja del mínimo se rellena en un hilo de fondo, o en el mismo
+    hilo si se pidió una semilla para que la simulación sea reproducible.
+    """
+
+    BAND_WIDTH = 5
+    MIN_AGE = 18
+    MAX_AGE = 85
+
+    def __init__(self, target_size: int = 200, low_water: int = 50, seed: int = None):
+        """
+        Args:
+            target_size (int): Cantidad de personas que se mantiene en la reserva
+            low_water (int): Cantidad bajo la cual se pide un relleno
+            seed (int, optional): Semilla del generador; si se indica, el relleno es síncrono
+        """
+        self.target_size = target_size
+        self.low_water = low_water
+        self.background = seed is None
+        self._rng = random.Random(seed)
+        self._buckets = {}  # (género, franja) -> deque de (edad, persona)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._refilling = False
+        self.refill()  # Primer llenado síncrono: take() nunca arranca con la reserva vacía
+
+    def __len__(self):
+        return self._size
+
+    def _band(self, age: int) -> int:
+        return age // self.BAND_WIDTH
+
+    def _generate_batch(self, count: int) -> list:
+        """Genera un lote de personas externas solteras (los datos sueltos se sortean juntos)"""
+        rng = self._rng
+        if np is not None:
+            bulk = np.random.default_rng(rng.getrandbits(64))
+            ages = bulk.integers(self.MIN_AGE, self.MAX_AGE + 1, count).tolist()
+            months = bulk.integers(1, 13, count).tolist()
+            days = bulk.integers(1, 29, count).tolist()
+            female = (bulk.random(count) < 0.5).tolist()
+            provinces = bulk.integers(0, len(PROVINCES), count).tolist()
+            surnames = bulk.integers(0, len(EXTERNAL_SURNAMES), count).tolist()
+            health = bulk.integers(60, 96, count).tolist()
+        else:
+            ages = [rng.randint(self.MIN_AGE, self.MAX_AGE) for _ in range(count)]
+            months = [rng.randint(1, 12) for _ in range(count)]
+            days = [rng.randint(1, 28) for _ in range(count)]
+            female = [rng.random() < 0.5 for _ in range(count)]
+            provinces = [rng.randrange(len(PROVINCES)) for _ in range(count)]
+            surnames = [rng.randrange(len(EXTERNAL_SURNAMES)) for _ in range(count)]
+            health = [rng.randint(60, 95) for _ in range(count)]
+
+        batch = []
+        for i in range(count):
+            gender = "F" if female[i] else "M"
+            first_name, _ = Family.generate_name(gender, rng)
+            # Cédula y año de nacimiento se asignan al agregar a la persona a una familia
+            person = Person(
+                cedula="",
+                first_name=first_name,
+                last_name=EXTERNAL_SURNAMES[surnames[i]],
+                birth_date=f"2000-{months[i]:02d}-{days[i]:02d}",
+                gender=gender,
+                province=PROVINCES[provinces[i]],
+                marital_status="Soltero/a"
+            )
+            person.virtual_age = ages[i]
+            person.emotional_health = health[i]
+            batch.append(person)
+        return batch
+
+    def refill(self) -> None:
+        """Rellena la reserva hasta el tamaño objetivo"""
+        try:
+            missing = self.target_size - self._size
+            if missing <= 0:
+                return
+            batch = self._generate_batch(missing)
+            with self._lock:
+                for person in batch:
+                    key = (person.gender, self._band(person.virtual_age))
+                    self._buckets.setdefault(key, deque()).append(person)
+                self._size += len(batch)
+        finally:
+            self._refilling = False
+
+    def _request_refill(self) -> None:
+        """Pide un relleno si la reserva está baja (en segundo plano si es posible)"""
+        if self._size >= self.low_water or self._refilling:
+            return
+        self._refilling = True
+        if self.background:
+            threading.Thread(target=self.refill, daemon=True).start()
+        else:
+            self.refill()
+
+    def take(self, gender: str, min_age: int, max_age: int) -> Optional[Person]:
+        """
+        Toma una persona del género indicado con edad virtual dentro del rango
+
+        Args:
+            gender (str): 'M' o 'F'
+            min_age (int): Edad mínima aceptada
+            max_age (int): Edad máxima aceptada
+
+        Returns:
+            Person o None si la reserva no tiene a nadie en ese rango
+        """
+        min_age = max(min_age, self.MIN_AGE)
+        max_age = min(max_age, self.MAX_AGE)
+        if self._size == 0 and not self._refilling:
+            # Vacía y sin relleno en curso: un relleno de fondo llegaría tarde para esta toma
+            self._refilling = True
+            self.refill()
+
+        bands = list(range(self._band(min_age), self._band(max_age) + 1))
+        self._rng.shuffle(bands)
+        found = None
+        with self._lock:
+            for band in bands:
+                bucket = self._buckets.get((gender, band))
+                if not bucket:
+                    continue
+                for _ in range(len(bucket)):
+                    person = bucket.popleft()
+                    if min_age <= person.virtual_age <= max_age:
+                        found = person
+                        self._size -= 1
+                        break
+                    bucket.append(person)
+                if found:
+                    break
+
+        self._request_refill()
+        return found
@@ -1,15 +1,86 @@
+import copy
 import datetime
 import random
+import threading
 from typing import Optional
 from .person import Person
+from .year_index import YearIndex
+from .family_aggregates import FamilyAggregates
+from .cedula_allocator import CedulaAllocator
+from .family_components import FamilyComponents
+from .family_graph import FamilyGraph
+from .fertile_registry import FertileRegistry
 
 class Family:
+    # Se llama en cada búsqueda por cédula; los servicios lo usan para medir sin que el modelo dependa de ellos
+    on_cedula_lookup = None
+
     def __init__(self, id=None, name="Nueva Familia"):
         self.id = id
         self.name = name
         self.description = ""  # Nueva descripción para la familia
         self.members = []
         self.current_year = datetime.datetime.now().year
+        self._year_index = None  # Índice de años, se construye al primer uso
+        self._aggregates = None  # Contadores agregados, se construyen al primer uso
+        self._components = None  # Linajes independientes, se construyen al primer uso
+        self._fertile_registry = None  # Parejas en edad fértil, se construye al primer uso
+        self._graph = None  # Grafo de relaciones, se construye al primer uso
+        self.structure_version = 0  # Aumenta con cada cambio de miembros o relaciones (valida cachés de layout)
+        self._cedula_allocator = None  # Asignador de cédulas (propio o compartido por FamilyManager)
+        self._cedulas_synced = 0  # Miembros cuyas cédulas ya se registraron en el asignador
+        self.event_scheduler = None  # Planificador del modo de simulación por eventos
+        self.lock = threading.RLock()  # Lo toman la simulación al modificar y quien copia desde otro hilo
+        self.origin = None  # Familia original cuando esta es una copia hecha con snapshot()
+
+    def __getstate__(self):
+        """Al copiar la familia, los índices derivados (guardados por id() de cada persona) se descartan"""
+        state = self.__dict__.copy()
+        for key in ('_year_index', '_aggregates', '_components', '_fertile_registry', '_graph', 'event_scheduler'):
+            state[key] = None
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    def snapshot(self) -> 'Family':
+        """
+        Copia desacoplada de la familia para leerla desde otro hilo
+
+        Cada persona se copia de forma superficial y sus relaciones (padres,
+        pareja, hijos, hermanos) apuntan a las copias, así quien la lea no ve
+        los cambios que siga haciendo la simulación. La copia arma sus propios
+        índices al usarlos; los de esta familia no se tocan. O(n).
+        """
+        with self.lock:
+            copies = {id(member): copy.copy(member) for member in self.members}
+
+            def twin(person):
+                if person is None:
+                    return None
+                clone = copies.get(id(person))
+                if clone is None:
+                    # Pariente que no es miembro: se copia sin sus propias relaciones
+                    clone = copies[id(person)] = copy.copy(person)
+                    clone.spouse = clone.father = clone.mother = None
+                    clone.children, clone.siblings = [], []
+                return clone
+
+            for member in self.members:
+                clone = copies[id(member)]
+                clone.spouse, clone.father, clone.mother = twin(member.spouse), twin(member.father), twin(member.mother)
+                clone.children = [twin(child) for child in member.children]
+                clone.siblings = [twin(sibling) for sibling in member.siblings]
+
+            family = Family(id=self.id, name=self.name)
+            family.description = self.description
+            family.current_year = self.current_year
+            family.members = [copies[id(member)] for member in self.members]
+            family.structure_version = self.structure_version
+            family.origin = self.origin or self
+        return family
 
     # En models/family.py
     def undo(self):
@@ -18,14 +89,168 @@ class Family:
 
     def add_or_update_member(self, person: Person) -> None:
         """Agrega o actualiza una persona en la familia"""
+        self.structure_version += 1
         for i, p in enumerate(self.members):
             if p.cedula == person.cedula:
                 self.members[i] = person
+                # Los datos pudieron cambiar (fechas, estado): reconstruir índices al próximo uso
+                self.invalidate_indexes()
                 return
+        index_in_sync = self._in_sync(self._year_index)
+        aggregates_in_sync = self._in_sync(self._aggregates)
+        components_in_sync = self._in_sync(self._components)
+        registry_in_sync = self._in_sync(self._fertile_registry)
+        graph_in_sync = self._in_sync(self._graph)
+        cedulas_in_sync = self._cedula_allocator is not None and self._cedulas_synced == len(self.members)
         self.members.append(person)
+        if cedulas_in_sync:
+            self._cedula_allocator.register(person.cedula)
+            self._cedulas_synced += 1
+        if index_in_sync:
+            self._year_index.add_person(person)
+        if aggregates_in_sync:
+            self._aggregates.add_person(person)
+        if components_in_sync:
+            self._components.add_person(person)
+        if registry_in_sync:
+            self._fertile_registry.add_person(person)
+        if graph_in_sync:
+            self._graph.add_person(person)
+
+    def remove_member(self, person: Person) -> None:
+        """Quita una persona de la familia (los índices se reconstruyen al próximo uso)"""
+        graph_in_sync = self._in_sync(self._graph)
+        self.members.remove(person)
+        self.structure_version += 1
+        self._year_index = None
+        self._aggregates = None
+        self._components = None
+        self._fertile_registry = None
+        if graph_in_sync:
+            self._graph.remove_person(person)
+
+    def clear_members(self) -> None:
+        """Quita todos los miembros (por ejemplo, antes de volver a cargar un GEDCOM)"""
+        self.members.clear()
+        self.invalidate_indexes()
+
+    def invalidate_indexes(self) -> None:
+        """
+        Descarta los índices derivados para que se reconstruyan al próximo uso
+
+        Los índices solo se mantienen solos ante los cambios que pasan por la
+        familia (add_or_update_member, remove_member, record_*). Quien modifique
+        personas o la lista de miembros por otra vía (recarga de un GEDCOM,
+        edición de fechas o datos de una persona) debe llamar a este método.
+        """
+        self.structure_version += 1
+        self._year_index = None
+        self._aggregates = None
+        self._components = None
+        self._fertile_registry = None
+        self._graph = None
+        self._cedulas_synced = 0
+
+    def _in_sync(self, derived) -> bool:
+        """Indica si un índice derivado existe (no fue invalidado) y cubre a todos los miembros"""
+        return derived is not None and derived.size == len(self.members)
+
+    def get_year_index(self) -> YearIndex:
+        """Obtiene el índice de años de nacimiento/fallecimiento (se reconstruye si quedó desactualizado)"""
+        if not self._in_sync(self._year_index):
+            self._year_index = YearIndex.build(self.members)
+        return self._year_index
+
+    def get_aggregates(self) -> FamilyAggregates:
+        """Obtiene los contadores agregados de la familia (se reconstruyen si quedaron desactualizados)"""
+        if not self._in_sync(self._aggregates):
+            self._aggregates = FamilyAggregates.build(self.members)
+        return self._aggregates
+
+    def get_components(self) -> FamilyComponents:
+        """Obtiene la partición en linajes independientes (se reconstruye si quedó desactualizada)"""
+        if not self._in_sync(self._components):
+            self._components = FamilyComponents.build(self.members)
+        return self._components
+
+    def get_family_graph(self) -> FamilyGraph:
+        """Obtiene el grafo de relaciones de la familia (se reconstruye si quedó desactualizado)"""
+        if not self._in_sync(self._graph):
+            self._graph = FamilyGraph.build(self.members)
+        return self._graph
+
+    def get_fertile_registry(self, min_age: int = 18, max_female_age: int = 45,
+                             max_male_age: int = 65) -> FertileRegistry:
+        """Obtiene el registro de parejas en edad fértil (se reconstruye si quedó desactualizado o cambian los límites)"""
+        limits = (min_age, max_female_age, max_male_age)
+        if not self._in_sync(self._fertile_registry) or self._fertile_registry.limits != limits:
+            self._fertile_registry = FertileRegistry.build(self.members, *limits)
+        return self._fertile_registry
+
+    def record_death(self, person: Person) -> None:
+        """Actualiza índices y contadores tras el fallecimiento de un miembro"""
+        if self._in_sync(self._year_index):
+            self._year_index.record_death(person)
+        if self._in_sync(self._aggregates):
+            self._aggregates.record_death(person)
+        if self._in_sync(self._fertile_registry):
+            self._fertile_registry.remove(person)
+
+    def record_union(self, person1: Person, person2: Person) -> None:
+        """Actualiza los contadores tras registrar una pareja"""
+        self.structure_version += 1
+        if self._in_sync(self._aggregates):
+            self._aggregates.record_union(person1, person2)
+        if self._in_sync(self._components):
+            self._components.record_union(person1, person2)
+        if self._in_sync(self._graph):
+            self._graph.record_union(person1, person2)
+        if self._in_sync(self._fertile_registry):
+            self._fertile_registry.add_union(person1, person2)
+
+    def record_parents(self, child: Person) -> None:
+        """Actualiza los contadores tras registrar los padres de un miembro"""
+        self.structure_version += 1
+        if self._in_sync(self._aggregates):
+            self._aggregates.update_generation(child)
+        if self._in_sync(self._components):
+            self._components.record_parents(child)
+        if self._in_sync(self._graph):
+            self._graph.record_parents(child)
+        if self._in_sync(self._fertile_registry):
+            self._fertile_registry.record_child(child)
+
+    def record_separation(self, person: Person) -> None:
+        """Registra que un miembro quedó sin pareja (por ejemplo, al enviudar)"""
+        self.structure_version += 1
+
+    def get_cedula_allocator(self) -> CedulaAllocator:
+        """Obtiene el asignador de cédulas, registrando las cédulas de miembros agregados por otras vías"""
+        if self._cedula_allocator is None:
+            self._cedula_allocator = CedulaAllocator()
+            self._cedulas_synced = 0
+        if self._cedulas_synced != len(self.members):
+            self._cedula_allocator.register_many(member.cedula for member in self.members)
+            self._cedulas_synced = len(self.members)
+        return self._cedula_allocator
+
+    def set_cedula_allocator(self, allocator: CedulaAllocator) -> None:
+        """Usa un asignador de cédulas compartido (por ejemplo, entre todas las familias del gestor)"""
+        self._cedula_allocator = allocator
+        self._cedulas_synced = 0
+
+    def allocate_cedula(self, province: str = None) -> str:
+        """Entrega una cédula única con el dígito de la provincia indicada"""
+        return self.get_cedula_allocator().allocate(province)
+
+    def reserve_cedulas(self, count: int, province: str = None) -> list:
+        """Reserva varias cédulas únicas de una vez"""
+        return self.get_cedula_allocator().reserve(count, province)
 
     def get_member_by_cedula(self, cedula: str) -> Optional[Person]:
         """Obtiene una persona por su cédula"""
+        if self.on_cedula_lookup is not None:
+            self.on_cedula_lookup()
         for member in self.members:
             if member.cedula == cedula:
                 return member
@@ -76,18 +301,18 @@ class Family:
         return str(random.randint(100000000, 999999999))
 
     @staticmethod
-    def generate_name(gender: str) -> tuple:
-        """Genera un nombre aleatorio según el género"""
+    def generate_name(gender: str, rng=random) -> tuple:
+        """Genera un nombre aleatorio según el género (rng permite usar un generador propio)"""
         male_names = ["Juan", "Carlos", "José", "Luis", "Miguel", "Pedro", "Ricardo", "Fernando", "Andrés", "Diego", "Mario", "Oscar", "Raúl", "Víctor", "Alberto"]
         female_names = ["María", "Ana", "Laura", "Sofía", "Isabel", "Carmen", "Elena", "Patricia", "Claudia", "Verónica", "Gabriela", "Daniela", "Carolina", "Mónica", "Paula"]
         surnames = ["Gómez", "Rodríguez", "Fernández", "Martínez", "Pérez", "López", "Sánchez", "García", "Díaz", "Hernández", "Jiménez", "Torres", "Ruiz", "Moreno", "Álvarez"]
         
         if gender == "M" or gender == "Masculino":
-            first_name = random.choice(male_names)
+            first_name = rng.choice(male_names)
         else:
-            first_name = random.choice(female_names)
+            first_name = rng.choice(female_names)
         
-        last_name = random.choice(surnames)
+        last_name = rng.choice(surnames)
         return first_name, last_name
 
     def add_relationship(self, parent_cedula: str, child_cedula: str) -> None:
@@ -99,6 +324,7 @@ class Family:
             child.father = parent if parent.gender == "Masculino" else child.father
             child.mother = parent if parent.gender == "Femenino" else child.mother
             parent.children.append(child)
+            self.record_parents(child)
         else:
             raise ValueError("Uno o ambos miembros no existen en la familia.")
 
@@ -0,0 +1,116 @@
+# models/family_aggregates.py
+from __future__ import annotations
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:
+    from models.person import Person
+
+
+class FamilyAggregates:
+    """Contadores agregados de una familia mantenidos de forma incremental.
+
+    Los paneles de estadísticas leen estos valores directamente en lugar de
+    recorrer todos los miembros en cada actualización.
+    """
+
+    def __init__(self):
+        self.size = 0              # Total de miembros contados
+        self.deceased = 0          # Miembros fallecidos
+        self.by_generation = {}    # nivel generacional (0 = sin padres) -> cantidad
+        self.by_province = {}      # provincia -> cantidad
+        self.by_gender = {}        # 'M'/'F' -> cantidad
+        self.by_surname = {}       # apellido -> cantidad
+        self.births_by_decade = {}  # década (1970, 1980, ...) -> nacimientos
+        self._generation = {}      # id(persona) -> nivel generacional asignado
+        self._dead = set()         # id() de las personas contadas como fallecidas
+        self._couples = set()      # pares (id, id) de parejas con ambos miembros vivos
+
+    @classmethod
+    def build(cls, members: Iterable['Person']) -> 'FamilyAggregates':
+        """Calcula todos los contadores a partir de la lista de miembros"""
+        aggregates = cls()
+        for person in members:
+            aggregates.add_person(person)
+            if person.alive and person.spouse and person.spouse.alive and person.spouse.spouse is person:
+                aggregates._couples.add(cls._pair_key(person, person.spouse))
+        return aggregates
+
+    @staticmethod
+    def _pair_key(person1: 'Person', person2: 'Person') -> tuple:
+        return tuple(sorted((id(person1), id(person2))))
+
+    @staticmethod
+    def _increment(counter: dict, key, amount: int = 1) -> None:
+        value = counter.get(key, 0) + amount
+        if value:
+            counter[key] = value
+        else:
+            counter.pop(key, None)
+
+    @property
+    def living(self) -> int:
+        """Cantidad de miembros vivos"""
+        return self.size - self.deceased
+
+    @property
+    def couples(self) -> int:
+        """Cantidad de parejas con ambos miembros vivos"""
+        return len(self._couples)
+
+    def add_person(self, person: 'Person') -> None:
+        """Cuenta un miembro nuevo"""
+        self.size += 1
+        self._increment(self.by_province, person.province)
+        self._increment(self.by_gender, person.gender)
+        self._increment(self.by_surname, person.last_name)
+        if person.birth_year is not None:
+            self._increment(self.births_by_decade, person.birth_year // 10 * 10)
+        self._generation[id(person)] = 0
+        self._increment(self.by_generation, 0)
+        # Su nivel depende de sus padres y el de sus hijos ya contados, del suyo
+        self.update_generation(person)
+        if not person.alive:
+            self.record_death(person)
+
+    def _level_of(self, person: 'Person') -> int:
+        parent = person.father if person.father else person.mother
+        if parent is None:
+            return 0
+        # Un padre de fuera de la familia cuenta como nivel 0
+        return self._generation.get(id(parent), 0) + 1
+
+    def update_generation(self, person: 'Person') -> None:
+        """Recalcula el nivel generacional de una persona y lo propaga a sus descendientes"""
+        if id(person) not in self._generation:
+            return
+        pending = [person]
+        visited = set()  # Evita ciclos en datos malformados
+        while pending:
+            current = pending.pop()
+            key = id(current)
+            if key in visited:
+                continue
+            visited.add(key)
+            level = self._level_of(current)
+            old_level = self._generation[key]
+            if level == old_level and current is not person:
+                continue
+            if level != old_level:
+                self._increment(self.by_generation, old_level, -1)
+                self._increment(self.by_generation, level)
+                self._generation[key] = level
+            pending.extend(child for child in current.children if id(child) in self._generation)
+
+    def record_death(self, person: 'Person') -> None:
+        """Registra un fallecimiento (idempotente) y disuelve su pareja viva"""
+        if id(person) in self._dead:
+            return
+        self._dead.add(id(person))
+        self.deceased += 1
+        if person.spouse is not None:
+            self._couples.discard(self._pair_key(person, person.spouse))
+
+    def record_union(self, person1: 'Person', person2: 'Person') -> None:
+        """Registra una nueva pareja entre dos miembros vivos"""
+        if person1.alive and person2.alive:
+            self._couples.add(self._pair_key(person1, person2))
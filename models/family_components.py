@@ -0,0 +1,95 @@
+# models/family_components.py
+from __future__ import annotations
+from typing import TYPE_CHECKING, Iterable, List
+
+if TYPE_CHECKING:
+    from models.person import Person
+
+
+class FamilyComponents:
+    """Partición de la familia en linajes independientes (componentes conexos).
+
+    Dos miembros quedan en el mismo componente si están unidos por una relación
+    padre/hijo o de pareja. Se mantiene con union-find: registrar una pareja o
+    unos padres solo une componentes, así que la partición se actualiza sin
+    recorrer a toda la familia.
+    """
+
+    def __init__(self):
+        self.size = 0        # Miembros registrados
+        self._parent = {}    # id(persona) -> id del representante
+        self._people = {}    # id(persona) -> persona
+
+    @classmethod
+    def build(cls, members: Iterable['Person']) -> 'FamilyComponents':
+        """Calcula los componentes a partir de la lista de miembros"""
+        components = cls()
+        members = list(members)
+        for person in members:
+            components._register(person)
+        for person in members:
+            components._link_relatives(person)
+        return components
+
+    def _register(self, person: 'Person') -> None:
+        key = id(person)
+        if key not in self._people:
+            self.size += 1
+            self._people[key] = person
+            self._parent[key] = key
+
+    def _find(self, key: int) -> int:
+        root = key
+        while self._parent[root] != root:
+            root = self._parent[root]
+        # Compresión de caminos
+        while self._parent[key] != root:
+            self._parent[key], key = root, self._parent[key]
+        return root
+
+    def _union(self, person1: 'Person', person2: 'Person') -> None:
+        # Los familiares que no son miembros (por ejemplo padres externos) no cuentan
+        if id(person1) not in self._people or id(person2) not in self._people:
+            return
+        root1, root2 = self._find(id(person1)), self._find(id(person2))
+        if root1 != root2:
+            self._parent[root2] = root1
+
+    def _link_relatives(self, person: 'Person') -> None:
+        for relative in (person.father, person.mother, person.spouse):
+            if relative is not None:
+                self._union(person, relative)
+
+    def add_person(self, person: 'Person') -> None:
+        """Registra un miembro nuevo y lo une con sus familiares directos"""
+        self._register(person)
+        self._link_relatives(person)
+
+    def record_union(self, person1: 'Person', person2: 'Person') -> None:
+        """Une los componentes de una pareja nueva"""
+        self._union(person1, person2)
+
+    def record_parents(self, child: 'Person') -> None:
+        """Une el componente de un miembro con el de sus padres"""
+        self._link_relatives(child)
+
+    def same_component(self, person1: 'Person', person2: 'Person') -> bool:
+        """Indica si dos miembros pertenecen al mismo linaje"""
+        if id(person1) not in self._people or id(person2) not in self._people:
+            return False
+        return self._find(id(person1)) == self._find(id(person2))
+
+    def groups(self) -> List[List['Person']]:
+        """
+        Devuelve los componentes como listas de miembros
+
+        Los componentes se ordenan por la menor cédula de cada uno y los miembros
+        conservan el orden de registro, así el resultado no depende de id().
+        """
+        grouped = {}
+        for key, person in self._people.items():
+            grouped.setdefault(self._find(key), []).append(person)
+        return sorted(grouped.values(), key=lambda group: min(str(p.cedula) for p in group))
+
+    def __len__(self):
+        return len({self._find(key) for key in self._people})
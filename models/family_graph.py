@@ -0,0 +1,158 @@
+# models/family_graph.py
+from __future__ import annotations
+import threading
+from typing import TYPE_CHECKING, Callable, Iterable, List, Optional, Set
+
+if TYPE_CHECKING:
+    import networkx as nx
+    from models.person import Person
+
+
+class FamilyGraph:
+    """Grafo dirigido de la familia mantenido con cambios incrementales.
+
+    Los nodos son las cédulas de los miembros; las aristas son padre/madre →
+    hijo (relationship="parent") y una por pareja (relationship="spouse"). En
+    lugar de reconstruirse en cada dibujo, el grafo recibe los cambios de
+    relaciones que la familia le notifica (miembro nuevo o eliminado, pareja,
+    padres) y los aplica como altas y bajas de nodos y aristas. Los oyentes
+    registrados con subscribe() reciben cada cambio como una tupla:
+    ('add_node', cedula), ('remove_node', cedula),
+    ('add_edge', origen, destino, relación) o ('remove_edge', origen, destino).
+
+    networkx se importa al crear el grafo, no al importar el módulo: el resto
+    del paquete models no depende de él.
+    """
+
+    def __init__(self):
+        import networkx as nx
+        self.size = 0              # Miembros registrados
+        self.graph = nx.DiGraph()  # Estructura mantenida (nodo -> atributo 'person')
+        self._listeners: List[Callable[[tuple], None]] = []
+        self._lock = threading.RLock()  # La simulación y el dibujo corren en hilos distintos
+
+    @classmethod
+    def build(cls, members: Iterable['Person']) -> 'FamilyGraph':
+        """Construye el grafo a partir de la lista de miembros"""
+        family_graph = cls()
+        members = list(members)
+        for person in members:
+            family_graph._add_node(person)
+        for person in members:
+            family_graph._link_relatives(person)
+        return family_graph
+
+    def subscribe(self, listener: Callable[[tuple], None]) -> None:
+        """Registra una función que recibe cada cambio aplicado al grafo"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[tuple], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, delta: tuple) -> None:
+        for listener in self._listeners:
+            listener(delta)
+
+    def _add_node(self, person: 'Person') -> None:
+        if person.cedula in self.graph:
+            return
+        self.graph.add_node(person.cedula, person=person)
+        self.size += 1
+        self._notify(('add_node', person.cedula))
+
+    def _add_edge(self, source: str, target: str, relationship: str) -> None:
+        if source not in self.graph or target not in self.graph or self.graph.has_edge(source, target):
+            return
+        self.graph.add_edge(source, target, relationship=relationship)
+        self._notify(('add_edge', source, target, relationship))
+
+    def _link_spouses(self, person1: 'Person', person2: 'Person') -> None:
+        # Una sola arista por pareja, en la dirección en que se registró primero
+        if not self.graph.has_edge(person2.cedula, person1.cedula):
+            self._add_edge(person1.cedula, person2.cedula, "spouse")
+
+    def _link_relatives(self, person: 'Person') -> None:
+        """Agrega las aristas de un miembro hacia sus padres, su pareja y sus hijos"""
+        for parent in (person.father, person.mother):
+            if parent is not None:
+                self._add_edge(parent.cedula, person.cedula, "parent")
+        if person.spouse is not None:
+            self._link_spouses(person, person.spouse)
+        # Hijos que ya eran miembros antes que este padre o madre
+        for child in person.children:
+            if child.father is person or child.mother is person:
+                self._add_edge(person.cedula, child.cedula, "parent")
+
+    def add_person(self, person: 'Person') -> None:
+        """Registra un miembro nuevo y lo conecta con sus familiares directos"""
+        with self._lock:
+            self._add_node(person)
+            self._link_relatives(person)
+
+    def remove_person(self, person: 'Person') -> None:
+        """Quita un miembro y todas sus aristas"""
+        with self._lock:
+            if person.cedula not in self.graph:
+                return
+            edges = list(self.graph.in_edges(person.cedula)) + list(self.graph.out_edges(person.cedula))
+            self.graph.remove_node(person.cedula)
+            self.size -= 1
+            for source, target in edges:
+                self._notify(('remove_edge', source, target))
+            self._notify(('remove_node', person.cedula))
+
+    def record_union(self, person1: 'Person', person2: 'Person') -> None:
+        """Agrega la arista de una pareja nueva"""
+        with self._lock:
+            self._link_spouses(person1, person2)
+
+    def record_parents(self, child: 'Person') -> None:
+        """Agrega las aristas desde los padres de un miembro"""
+        with self._lock:
+            for parent in (child.father, child.mother):
+                if parent is not None:
+                    self._add_edge(parent.cedula, child.cedula, "parent")
+
+    def snapshot(self, nodes: Iterable[str] = None) -> nx.DiGraph:
+        """
+        Copia del grafo con los atributos actuales de cada persona
+
+        Los atributos (nombre, vivo, género, estado civil) se leen de las personas
+        al copiar, así reflejan cambios que no alteran la estructura. O(n + m).
+
+        Args:
+            nodes: Cédulas a incluir (por defecto todas); solo se copian las
+                aristas entre ellas
+        """
+        import networkx as nx
+        with self._lock:
+            graph = self.graph if nodes is None else self.graph.subgraph(nodes)
+            snapshot = nx.DiGraph()
+            for cedula, data in graph.nodes(data=True):
+                person = data['person']
+                snapshot.add_node(
+                    cedula,
+                    label=f"{person.first_name} {person.last_name}",
+                    alive=person.alive,
+                    gender=person.gender,
+                    marital_status=person.marital_status
+                )
+            snapshot.add_edges_from(graph.edges(data=True))
+        return snapshot
+
+    def shortest_path(self, cedula1: str, cedula2: str) -> Optional[List[str]]:
+        """Camino más corto entre dos miembros por cualquier relación (None si no están conectados)"""
+        import networkx as nx
+        with self._lock:
+            try:
+                return nx.shortest_path(self.graph.to_undirected(as_view=True), cedula1, cedula2)
+            except (nx.NetworkXNoPath, nx.NodeNotFound):
+                return None
+
+    def components(self) -> List[Set[str]]:
+        """Cédulas de cada grupo de miembros conectados, del más grande al más chico"""
+        import networkx as nx
+        with self._lock:
+            return sorted((set(group) for group in nx.weakly_connected_components(self.graph)),
+                          key=len, reverse=True)
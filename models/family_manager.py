@@ -1,6 +1,7 @@
 # models/family_manager.py
 from typing import Dict, List, Optional
 from .family import Family
+from .cedula_allocator import CedulaAllocator
 
 class FamilyManager:
     """Gestor de familias con IDs autoincrementales y recuperación de IDs eliminados"""
@@ -10,6 +11,7 @@ class FamilyManager:
         self.deleted_ids: List[int] = []  # IDs disponibles para reutilizar
         self.next_id: int = 1  # Próximo ID a asignar
         self.current_family_id: Optional[int] = None  # Familia actualmente seleccionada
+        self.cedula_allocator = CedulaAllocator()  # Cédulas únicas entre todas las familias
     
     def create_family(self, name: str, description: str = "") -> int:
         """
@@ -33,7 +35,7 @@ class FamilyManager:
         family.id = family_id
         
         # Almacenar en el diccionario
-        self.families[family_id] = family
+        self.register_family(family_id, family)
         
         # Si es la primera familia, establecerla como actual
         if self.current_family_id is None:
@@ -41,6 +43,11 @@ class FamilyManager:
         
         return family_id
     
+    def register_family(self, family_id: int, family: Family) -> None:
+        """Guarda una familia bajo un ID y le asigna el asignador de cédulas compartido"""
+        family.set_cedula_allocator(self.cedula_allocator)
+        self.families[family_id] = family
+    
     def delete_family(self, family_id: int) -> bool:
         """
         Elimina una familia y compacta los IDs posteriores
@@ -145,11 +152,14 @@ class FamilyManager:
     def get_stats(self) -> dict:
         """Obtiene estadísticas del gestor de familias"""
         total_families = len(self.families)
-        total_members = sum(len(family.members) for family in self.families.values())
+        aggregates = [family.get_aggregates() for family in self.families.values()]
+        total_members = sum(a.size for a in aggregates)
+        living_members = sum(a.living for a in aggregates)
         
         return {
             'total_families': total_families,
             'total_members': total_members,
+            'living_members': living_members,
             'available_ids': 0,  # Ya no hay IDs disponibles, siempre se compacta
             'next_id': self.next_id,
             'current_family_id': self.current_family_id
@@ -0,0 +1,94 @@
+# models/fertile_registry.py
+from __future__ import annotations
+from typing import TYPE_CHECKING, Iterable, List, Tuple
+
+if TYPE_CHECKING:
+    from models.person import Person
+
+
+class FertileRegistry:
+    """Registro de parejas activas que todavía pueden tener hijos.
+
+    Cada pareja se guarda por la madre con sus hijos en común ya contados y la
+    edad de la madre a la que se cierra su ventana fértil. Las parejas entran al
+    registrarse la unión y salen al fallecer uno de los dos o al superar la
+    ventana, así que procesar nacimientos solo recorre las parejas activas.
+    """
+
+    def __init__(self, min_age: int = 18, max_female_age: int = 45, max_male_age: int = 65):
+        self.size = 0  # Miembros de la familia considerados
+        self.limits = (min_age, max_female_age, max_male_age)
+        self._couples = {}  # id(madre) -> [madre, padre, ids de hijos en común, edad de cierre de la madre]
+
+    @classmethod
+    def build(cls, members: Iterable['Person'], min_age: int = 18, max_female_age: int = 45,
+              max_male_age: int = 65) -> 'FertileRegistry':
+        """Registra todas las parejas vivas de la lista de miembros"""
+        registry = cls(min_age, max_female_age, max_male_age)
+        for person in members:
+            registry.add_person(person)
+        return registry
+
+    def add_person(self, person: 'Person') -> None:
+        """Cuenta un miembro nuevo (su pareja entra al registrarse la unión)"""
+        self.size += 1
+        if person.gender == "F" and person.spouse is not None:
+            self.add_union(person, person.spouse)
+
+    def add_union(self, person1: 'Person', person2: 'Person') -> None:
+        """Registra una pareja nueva si todavía está dentro de la ventana fértil"""
+        mother, father = (person1, person2) if person1.gender == "F" else (person2, person1)
+        if mother.gender != "F" or father.gender != "M" or not (mother.alive and father.alive):
+            return
+        _, max_female_age, max_male_age = self.limits
+        woman_age = mother.calculate_virtual_age()
+        closing_age = woman_age + min(max_female_age - woman_age, max_male_age - father.calculate_virtual_age())
+        if woman_age > closing_age:
+            return
+        children = {id(child) for child in mother.children if child.father is father}
+        self._couples[id(mother)] = [mother, father, children, closing_age]
+
+    def remove(self, person: 'Person') -> None:
+        """Quita la pareja de una persona (por fallecimiento o separación)"""
+        entry = self._couples.get(id(person))
+        if entry is None and person.spouse is not None:
+            entry = self._couples.get(id(person.spouse))
+            if entry is not None and entry[1] is not person:
+                entry = None
+        if entry is not None:
+            del self._couples[id(entry[0])]
+
+    def record_child(self, child: 'Person') -> None:
+        """Cuenta un hijo en común de una pareja registrada (idempotente)"""
+        if child.mother is None:
+            return
+        entry = self._couples.get(id(child.mother))
+        if entry is not None and child.father is entry[1]:
+            entry[2].add(id(child))
+
+    def common_children(self, mother: 'Person') -> int:
+        """Hijos en común ya contados de la pareja de una madre (0 si no está registrada)"""
+        entry = self._couples.get(id(mother))
+        return len(entry[2]) if entry is not None else 0
+
+    def active_couples(self) -> List[Tuple['Person', 'Person', int]]:
+        """
+        Devuelve las parejas en edad fértil como (madre, padre, hijos en común)
+
+        Las parejas que ya no están juntas, con algún miembro fallecido o fuera de
+        la ventana fértil se eliminan del registro al recorrerlo.
+        """
+        min_age = self.limits[0]
+        active = []
+        for key, (mother, father, children, closing_age) in list(self._couples.items()):
+            woman_age = mother.calculate_virtual_age()
+            if (not mother.alive or not father.alive or mother.spouse is not father or
+                    woman_age > closing_age):
+                del self._couples[key]
+                continue
+            if woman_age >= min_age and father.calculate_virtual_age() >= min_age:
+                active.append((mother, father, len(children)))
+        return active
+
+    def __len__(self):
+        return len(self._couples)
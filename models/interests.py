@@ -0,0 +1,40 @@
+# models/interests.py
+"""Vocabulario global de intereses.
+
+Cada interés recibe un número de bit la primera vez que aparece, de modo que
+los intereses de una persona se representan como una máscara entera y los
+intereses en común se cuentan con un AND y un conteo de bits.
+"""
+from typing import Iterable, List
+
+_VOCABULARY = {}  # interés -> número de bit
+_NAMES = []       # número de bit -> interés
+
+
+def interest_bit(interest: str) -> int:
+    """Devuelve el número de bit de un interés, registrándolo si es nuevo"""
+    bit = _VOCABULARY.get(interest)
+    if bit is None:
+        bit = _VOCABULARY[interest] = len(_NAMES)
+        _NAMES.append(interest)
+    return bit
+
+
+def encode_interests(interests: Iterable[str]) -> int:
+    """Convierte una lista de intereses en una máscara de bits"""
+    mask = 0
+    for interest in interests:
+        mask |= 1 << interest_bit(interest)
+    return mask
+
+
+def decode_interests(mask: int) -> List[str]:
+    """Convierte una máscara de bits en la lista de intereses que representa"""
+    names = []
+    bit = 0
+    while mask:
+        if mask & 1:
+            names.append(_NAMES[bit])
+        mask >>= 1
+        bit += 1
+    return names
@@ -0,0 +1,204 @@
+# models/life_event.py
+from __future__ import annotations
+import datetime
+import sys
+from enum import Enum
+from functools import lru_cache
+from typing import Optional
+
+
+class EventCategory(Enum):
+    """Categorías de eventos de vida (el valor coincide con los tipos usados en la app)"""
+    BIRTH = 'birth'
+    MARRIAGE = 'marriage'
+    DIVORCE = 'divorce'
+    DEATH = 'death'
+    CHILDBIRTH = 'childbirth'
+    GRADUATION = 'graduation'
+    RETIREMENT = 'retirement'
+    WIDOWHOOD = 'widowhood'
+    TRAUMA = 'trauma'
+    GUARDIANSHIP = 'guardianship'
+    HEALTH_DECLINE = 'health_decline'
+    EMOTIONAL_CRISIS = 'emotional_crisis'
+    BIRTHDAY = 'birthday'
+    OTHER = 'other'
+
+    @property
+    def emoji(self) -> str:
+        return _CATEGORY_EMOJIS.get(self, '📝')
+
+    @classmethod
+    def from_type(cls, event_type: Optional[str]) -> 'EventCategory':
+        """Convierte un tipo de evento en texto a su categoría (desconocidos -> OTHER)"""
+        return _CATEGORY_BY_VALUE.get(event_type, cls.OTHER)
+
+
+_CATEGORY_EMOJIS = {
+    EventCategory.BIRTH: '👶',
+    EventCategory.MARRIAGE: '💍',
+    EventCategory.DIVORCE: '💔',
+    EventCategory.DEATH: '⚰️',
+    EventCategory.CHILDBIRTH: '👶',
+    EventCategory.GRADUATION: '🎓',
+    EventCategory.RETIREMENT: '🏖️',
+    EventCategory.WIDOWHOOD: '🕯️',
+    EventCategory.TRAUMA: '😢',
+    EventCategory.GUARDIANSHIP: '🏠',
+    EventCategory.HEALTH_DECLINE: '😷',
+    EventCategory.EMOTIONAL_CRISIS: '💔',
+    EventCategory.BIRTHDAY: '🎂',
+    EventCategory.OTHER: '📝',
+}
+
+_CATEGORY_BY_VALUE = {category.value: category for category in EventCategory}
+
+# Orden usado al reconocer eventos guardados con el formato antiguo "<emoji> Texto"
+_LEGACY_EMOJI_ORDER = [
+    EventCategory.BIRTH, EventCategory.MARRIAGE, EventCategory.DIVORCE, EventCategory.DEATH,
+    EventCategory.GRADUATION, EventCategory.RETIREMENT, EventCategory.WIDOWHOOD,
+    EventCategory.TRAUMA, EventCategory.GUARDIANSHIP, EventCategory.HEALTH_DECLINE,
+]
+
+_FALLBACK_ORDINAL = datetime.date(1900, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_string(value: str) -> Optional[int]:
+    """Convierte 'YYYY-MM-DD' (con o sin hora) a ordinal; None si no se puede"""
+    # Limpiar formato ISO con T y hora, o con espacio y hora
+    if 'T' in value:
+        value = value.split('T')[0]
+    elif ' ' in value and ':' in value:
+        value = value.split(' ')[0]
+    for fmt in ('%Y-%m-%d', '%Y/%m/%d'):
+        try:
+            return datetime.datetime.strptime(value, fmt).toordinal()
+        except ValueError:
+            continue
+    return None
+
+
+def date_to_ordinal(value) -> Optional[int]:
+    """Convierte una fecha (str, date o datetime) a su ordinal gregoriano"""
+    if value is None:
+        return None
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.toordinal()
+    if isinstance(value, str):
+        return _parse_date_string(value)
+    return None
+
+
+def ordinal_to_str(ordinal: int) -> str:
+    """Convierte un ordinal a texto 'YYYY-MM-DD'"""
+    return datetime.date.fromordinal(ordinal).isoformat()
+
+
+class LifeEvent:
+    """Registro compacto de un evento de vida.
+
+    Guarda la categoría, la fecha como ordinal y el detalle internado; el texto
+    que se muestra en pantalla se genera solo cuando se pide.
+    """
+    __slots__ = ('category', 'ordinal', 'detail', 'titled', 'in_history', 'history_index')
+
+    def __init__(self, category: EventCategory, ordinal: int, detail: str = "",
+                 titled: bool = False, in_history: bool = False, history_index: Optional[int] = None):
+        """
+        Args:
+            category (EventCategory): Categoría del evento
+            ordinal (int): Fecha del evento como ordinal gregoriano
+            detail (str): Texto libre o detalle del evento
+            titled (bool): Si se muestra como "<emoji> Categoría: detalle"
+            in_history (bool): Si aparece en el historial de la persona
+            history_index (int, optional): Entradas manuales del historial que había al
+                registrarlo (ubica el evento entre ellas; None lo deja al final)
+        """
+        self.category = category
+        self.ordinal = ordinal
+        self.detail = sys.intern(detail) if detail else ""
+        self.titled = titled
+        self.in_history = in_history
+        self.history_index = history_index
+
+    @classmethod
+    def create(cls, event_type: str, details: str = "", date=None) -> 'LifeEvent':
+        """Crea un evento mayor (con categoría y título) a partir de un tipo en texto"""
+        category = EventCategory.from_type(event_type)
+        ordinal = cls.resolve_ordinal(date)
+        if category is EventCategory.OTHER and event_type != 'other':
+            # Tipo desconocido: conservar el nombre original dentro del detalle
+            detail = f"{category.emoji} {str(event_type).capitalize()}"
+            if details:
+                detail += f": {details}"
+            return cls(category, ordinal, detail, titled=False, in_history=True)
+        return cls(category, ordinal, details, titled=True, in_history=True)
+
+    @staticmethod
+    def resolve_ordinal(date) -> int:
+        """Convierte una fecha a ordinal (hoy si es None, 1900-01-01 si no se puede leer)"""
+        if date is None:
+            return datetime.date.today().toordinal()
+        ordinal = date_to_ordinal(date)
+        return ordinal if ordinal is not None else _FALLBACK_ORDINAL
+
+    @property
+    def date_str(self) -> str:
+        return ordinal_to_str(self.ordinal)
+
+    @property
+    def year(self) -> int:
+        return datetime.date.fromordinal(self.ordinal).year
+
+    def plain_text(self) -> str:
+        """Texto del evento sin emoji"""
+        if self.titled:
+            label = self.category.value.capitalize()
+            return f"{label}: {self.detail}" if self.detail else label
+        return self.detail
+
+    def display_text(self) -> str:
+        """Texto del evento tal como se mostraba en el formato antiguo"""
+        if self.titled:
+            return f"{self.category.emoji} {self.plain_text()}"
+        return self.detail
+
+    def to_dict(self) -> dict:
+        """Convierte el evento al formato serializable {'evento', 'fecha', 'categoria', 'en_historial', 'pos_historial'}"""
+        data = {'evento': self.display_text(), 'fecha': self.date_str,
+                'categoria': self.category.value, 'en_historial': self.in_history}
+        if self.history_index is not None:
+            data['pos_historial'] = self.history_index
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LifeEvent':
+        """Reconstruye un evento desde un diccionario (incluye el formato antiguo sin categoría)"""
+        text = data.get('evento', '')
+        ordinal = cls.resolve_ordinal(data.get('fecha'))
+        category = _CATEGORY_BY_VALUE.get(data.get('categoria'))
+        # En el formato antiguo el historial ya traía su propia copia del texto
+        in_history = bool(data.get('en_historial', False))
+        history_index = data.get('pos_historial')
+        candidates = [category] if category is not None else list(EventCategory)
+
+        # Los eventos mayores se guardaban como "<emoji> Categoría[: detalle]"
+        for candidate in candidates:
+            if candidate is EventCategory.OTHER:
+                continue
+            prefix = f"{candidate.emoji} {candidate.value.capitalize()}"
+            if text == prefix or text.startswith(prefix + ': '):
+                return cls(candidate, ordinal, text[len(prefix) + 2:], titled=True,
+                           in_history=in_history, history_index=history_index)
+
+        if category is None:
+            category = EventCategory.OTHER
+            for candidate in _LEGACY_EMOJI_ORDER:
+                if candidate.emoji in text:
+                    category = candidate
+                    break
+        return cls(category, ordinal, text, in_history=in_history, history_index=history_index)
+
+    def __repr__(self):
+        return f"LifeEvent({self.category.value}, {self.date_str}, {self.detail!r})"
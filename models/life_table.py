@@ -0,0 +1,157 @@
+# models/life_table.py
+from __future__ import annotations
+import csv
+import math
+from typing import TYPE_CHECKING, Dict, Iterable, List
+
+if TYPE_CHECKING:
+    from models.person import Person
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional: sin él la consulta se hace persona por persona
+    np = None
+
+
+# Tramos de salud emocional: (límite superior exclusivo, multiplicador). El tramo
+# normal llega hasta 80 inclusive (la regla original es "> 80"), así que su límite
+# exclusivo es el float siguiente a 80: 80.5 ya cae en el tramo 0.8
+DEFAULT_HEALTH_BANDS = ((30, 1.5), (50, 1.2), (math.nextafter(80, math.inf), 1.0), (None, 0.8))
+
+
+class LifeTable:
+    """Tabla de vida con la probabilidad anual de muerte por edad.
+
+    La probabilidad de cada persona es hazard[edad] multiplicado por el factor de
+    su tramo de salud emocional y el de su estado civil a esa edad, con un tope.
+    Todas las tablas se calculan al crearla, así que evaluar a la población es
+    una consulta por índices (vectorizada con NumPy si está disponible).
+    """
+
+    MAX_AGE = 150
+
+    def __init__(self, hazard: Iterable[float], marital: Dict[str, Iterable[float]] = None,
+                 health_bands=DEFAULT_HEALTH_BANDS, cap: float = 0.3):
+        """
+        Args:
+            hazard: Probabilidad base por edad (la última se repite hasta MAX_AGE)
+            marital (dict): Estado civil -> multiplicador por edad
+            health_bands: Tramos (límite superior, multiplicador) de salud emocional
+            cap (float): Probabilidad máxima
+        """
+        self.hazard = self._by_age(hazard)
+        self.marital = {status: self._by_age(values) for status, values in (marital or {}).items()}
+        self.health_bands = tuple(health_bands)
+        self.cap = cap
+        self.source = None  # Ruta del CSV de origen (None = tabla generada)
+        if np is not None:
+            self._np_hazard = np.array(self.hazard)
+            self._np_marital = np.array([[1.0] * (self.MAX_AGE + 1)] + list(self.marital.values()))
+            self._np_health_limits = np.array([limit for limit, _ in self.health_bands if limit is not None])
+            self._np_health = np.array([factor for _, factor in self.health_bands])
+        self._marital_index = {status: i + 1 for i, status in enumerate(self.marital)}
+
+    @classmethod
+    def _by_age(cls, values: Iterable[float]) -> List[float]:
+        values = [float(v) for v in values]
+        if not values:
+            values = [0.0]
+        values = values[:cls.MAX_AGE + 1]
+        return values + [values[-1]] * (cls.MAX_AGE + 1 - len(values))
+
+    @classmethod
+    def default(cls) -> 'LifeTable':
+        """Tabla equivalente a las reglas originales de la simulación"""
+        def base(age):
+            if age < 1:
+                return 0.005  # Mortalidad infantil
+            if age < 18:
+                return 0.0001  # Muy baja en jóvenes
+            if age < 50:
+                return 0.001
+            if age < 70:
+                return 0.005
+            if age < 80:
+                return 0.02
+            if age < 90:
+                return 0.08
+            return 0.15
+
+        ages = range(cls.MAX_AGE + 1)
+        return cls(
+            [base(age) for age in ages],
+            marital={
+                "Viudo/a": [1.3 if age > 65 else 1.0 for age in ages],
+                "Soltero/a": [1 + (age - 25) * 0.01 if age > 40 else 1.0 for age in ages],
+            }
+        )
+
+    @classmethod
+    def linear(cls, base_probability: float, start_age: int = 60, slope: float = 0.01) -> 'LifeTable':
+        """Tabla lineal sin modificadores: base + pendiente por cada año sobre la edad de inicio"""
+        hazard = [base_probability + slope * max(0, age - start_age) for age in range(cls.MAX_AGE + 1)]
+        return cls(hazard, health_bands=((None, 1.0),), cap=1.0)
+
+    @classmethod
+    def from_csv(cls, path: str, cap: float = 0.3) -> 'LifeTable':
+        """
+        Carga una tabla de vida desde un CSV
+
+        El archivo debe tener las columnas 'edad' y 'probabilidad'. Cualquier otra
+        columna se toma como multiplicador por edad para el estado civil que da
+        nombre a la columna (por ejemplo 'Viudo/a'). Las edades que falten usan el
+        valor de la edad anterior.
+        """
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        if not rows or 'edad' not in rows[0] or 'probabilidad' not in rows[0]:
+            raise ValueError("La tabla de vida debe tener las columnas 'edad' y 'probabilidad'")
+
+        columns = [c for c in rows[0] if c not in ('edad', 'probabilidad')]
+        by_age = {int(row['edad']): row for row in rows}
+        hazard, marital = [], {c: [] for c in columns}
+        last = by_age[min(by_age)]
+        for age in range(cls.MAX_AGE + 1):
+            last = by_age.get(age, last)
+            hazard.append(float(last['probabilidad']))
+            for column in columns:
+                marital[column].append(float(last[column] or 1.0))
+        table = cls(hazard, marital, cap=cap)
+        table.source = path
+        return table
+
+    def health_band(self, emotional_health: float) -> int:
+        """Índice del tramo de salud emocional en que cae un valor"""
+        for band, (limit, _) in enumerate(self.health_bands):
+            if limit is None or emotional_health < limit:
+                return band
+        return len(self.health_bands)
+
+    def _health_factor(self, emotional_health: float) -> float:
+        band = self.health_band(emotional_health)
+        return self.health_bands[band][1] if band < len(self.health_bands) else 1.0
+
+    def probability(self, person: 'Person', age: int = None) -> float:
+        """Probabilidad anual de muerte de una persona (opcionalmente a otra edad)"""
+        if age is None:
+            age = person.calculate_virtual_age()
+        age = min(max(age, 0), self.MAX_AGE)
+        value = self.hazard[age] * self._health_factor(person.emotional_health)
+        marital = self.marital.get(person.marital_status)
+        if marital is not None:
+            value *= marital[age]
+        return min(self.cap, value)
+
+    def probabilities(self, people: List['Person']) -> list:
+        """Probabilidades anuales de muerte de varias personas en una sola consulta"""
+        if np is None or not people:
+            return [self.probability(person) for person in people]
+
+        ages = np.clip(np.fromiter((p.calculate_virtual_age() for p in people), dtype=np.int64,
+                                   count=len(people)), 0, self.MAX_AGE)
+        health = np.fromiter((p.emotional_health for p in people), dtype=np.float64, count=len(people))
+        status = np.fromiter((self._marital_index.get(p.marital_status, 0) for p in people),
+                             dtype=np.int64, count=len(people))
+        bands = np.searchsorted(self._np_health_limits, health, side='right')
+        values = self._np_hazard[ages] * self._np_health[bands] * self._np_marital[status, ages]
+        return np.minimum(values, self.cap).tolist()
@@ -0,0 +1,83 @@
+# models/matching_index.py
+from __future__ import annotations
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+if TYPE_CHECKING:
+    from models.person import Person
+
+
+class MatchingIndex:
+    """Índice de solteros disponibles agrupados por género y franja de edad virtual.
+
+    La búsqueda de pareja solo revisa las franjas del género opuesto que caen
+    dentro de la diferencia de edad permitida, y las coincidencias de intereses
+    se cuentan con la máscara de bits de cada persona.
+    """
+
+    BAND_WIDTH = 5  # Años por franja de edad
+
+    def __init__(self, max_age_diff: int = 15):
+        self.max_age_diff = max_age_diff
+        self._buckets = {}     # (género, franja) -> {id(persona): persona}
+        self._location = {}    # id(persona) -> (género, franja)
+        self._masks = {}       # id(persona) -> máscara de intereses
+
+    @classmethod
+    def build(cls, people: Iterable['Person'], max_age_diff: int = 15) -> 'MatchingIndex':
+        """Construye el índice con las personas indicadas"""
+        index = cls(max_age_diff)
+        for person in people:
+            index.add(person)
+        return index
+
+    def __len__(self):
+        return len(self._location)
+
+    def __contains__(self, person: 'Person') -> bool:
+        return id(person) in self._location
+
+    def add(self, person: 'Person') -> None:
+        """Agrega (o reubica) a una persona disponible"""
+        self.remove(person)
+        key = (person.gender, person.calculate_virtual_age() // self.BAND_WIDTH)
+        self._buckets.setdefault(key, {})[id(person)] = person
+        self._location[id(person)] = key
+        self._masks[id(person)] = person.interest_mask
+
+    def remove(self, person: 'Person') -> None:
+        """Quita a una persona del índice (por ejemplo, al formar pareja)"""
+        key = self._location.pop(id(person), None)
+        if key is None:
+            return
+        bucket = self._buckets[key]
+        bucket.pop(id(person), None)
+        if not bucket:
+            del self._buckets[key]
+        self._masks.pop(id(person), None)
+
+    def candidates(self, person: 'Person', min_common_interests: int = 0) -> Iterator['Person']:
+        """
+        Genera los candidatos del género opuesto dentro de la diferencia de edad permitida
+
+        Args:
+            person (Person): Persona que busca pareja
+            min_common_interests (int): Intereses en común mínimos para considerar al candidato
+        """
+        age = person.calculate_virtual_age()
+        target_gender = 'F' if person.gender == 'M' else 'M'
+        first_band = (age - self.max_age_diff) // self.BAND_WIDTH
+        last_band = (age + self.max_age_diff) // self.BAND_WIDTH
+        mask = person.interest_mask
+
+        for band in range(first_band, last_band + 1):
+            bucket = self._buckets.get((target_gender, band))
+            if not bucket:
+                continue
+            for key, candidate in list(bucket.items()):
+                if candidate is person:
+                    continue
+                if abs(candidate.calculate_virtual_age() - age) > self.max_age_diff:
+                    continue
+                if (self._masks[key] & mask).bit_count() < min_common_interests:
+                    continue
+                yield candidate
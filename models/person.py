@@ -3,6 +3,8 @@ import datetime
 import random
 import re
 from typing import TYPE_CHECKING
+from .life_event import EventCategory, LifeEvent, date_to_ordinal, ordinal_to_str
+from .interests import encode_interests
 
 if TYPE_CHECKING:
     from models.family import Family
@@ -48,6 +50,7 @@ class Person:
         self.children = []
         self.siblings = []
         self.events = []
+        self.event_rollups = {}  # categoría -> [cantidad, primer ordinal, último ordinal]
         self.alive = death_date is None
         self.history = [f"Nació el {birth_date}"]
         
@@ -61,33 +64,76 @@ class Person:
         # === Edad virtual para la simulación ===
         self.virtual_age = self.calculate_age()  # Inicializar con la edad real
 
+    @staticmethod
+    def _normalize_date(value):
+        """Convierte una fecha (str, date o datetime) a (date, 'YYYY-MM-DD'); si no se reconoce conserva el valor"""
+        ordinal = date_to_ordinal(value)
+        if ordinal is None:
+            return None, value
+        parsed = datetime.date.fromordinal(ordinal)
+        return parsed, parsed.isoformat()
+
+    @property
+    def birth_date(self):
+        """Fecha de nacimiento normalizada como 'YYYY-MM-DD'"""
+        return self._birth_date
+
+    @birth_date.setter
+    def birth_date(self, value):
+        # Se interpreta una sola vez; edad y año se calculan desde la fecha ya parseada
+        self._birth, self._birth_date = Person._normalize_date(value)
+
+    @property
+    def death_date(self):
+        """Fecha de fallecimiento normalizada como 'YYYY-MM-DD' (None si está vivo)"""
+        return self._death_date
+
+    @death_date.setter
+    def death_date(self, value):
+        self._death, self._death_date = Person._normalize_date(value)
+
+    @property
+    def birth_year(self):
+        """Año de nacimiento (None si la fecha no es válida)"""
+        return self._birth.year if self._birth else None
+
+    @property
+    def death_year(self):
+        """Año de fallecimiento (None si no tiene o no es válida)"""
+        return self._death.year if self._death else None
+
+    def get_age_at_death(self):
+        """Edad cumplida al fallecer (None si falta alguna de las fechas)"""
+        if not self._birth or not self._death:
+            return None
+        return (self._death.year - self._birth.year
+                - ((self._death.month, self._death.day) < (self._birth.month, self._birth.day)))
+
+    @property
+    def interests(self) -> tuple:
+        """Intereses de la persona (tupla inmutable; para cambiarlos se reasigna)"""
+        return self._interests
+
+    @interests.setter
+    def interests(self, value):
+        self._interests = tuple(value)
+        self._interest_mask = None
+
+    @property
+    def interest_mask(self) -> int:
+        """Intereses codificados como máscara de bits del vocabulario global"""
+        # Los intereses solo cambian por el setter, que invalida la máscara
+        if self._interest_mask is None:
+            self._interest_mask = encode_interests(self._interests)
+        return self._interest_mask
+
     def calculate_age(self) -> int:
         """Calcula la edad real basada en la fecha de nacimiento"""
-        if not self.birth_date:
-            return 20  # Edad por defecto si no hay fecha de nacimiento
-        
-        try:
-            # Manejar tanto datetime objects como strings
-            if isinstance(self.birth_date, datetime.datetime):
-                birth = self.birth_date
-            elif isinstance(self.birth_date, str):
-                # Limpiar formato ISO con T y hora: "2006-11-09T00:00:00"
-                if 'T' in self.birth_date:
-                    clean_date = self.birth_date.split('T')[0]
-                # Limpiar formato con espacio y hora: "2006-11-09 00:00:00"
-                elif ' ' in self.birth_date and ':' in self.birth_date:
-                    clean_date = self.birth_date.split(' ')[0]
-                else:
-                    clean_date = self.birth_date
-                birth = datetime.datetime.strptime(clean_date, "%Y-%m-%d")
-            else:
-                return 20  # Tipo no reconocido
-                
-            today = datetime.datetime.now()
-            return today.year - birth.year - ((today.month, today.day) < (birth.month, birth.day))
-        except (ValueError, TypeError) as e:
-            print(f"Error al calcular edad para {self.get_full_name()}: {e}")
-            return 20
+        if not self._birth:
+            return 20  # Edad por defecto si no hay fecha de nacimiento válida
+        
+        today = datetime.date.today()
+        return today.year - self._birth.year - ((today.month, today.day) < (self._birth.month, self._birth.day))
 
     def calculate_virtual_age(self) -> int:
         """Calcula la edad virtual considerando el ciclo de simulación"""
@@ -167,6 +213,33 @@ class Person:
         date = datetime.datetime.now().strftime("%Y-%m-%d")
         self.history.append(f"{event} ({date})")
 
+    def get_history(self) -> list:
+        """Devuelve el historial completo: entradas manuales y eventos mayores en el orden en que se registraron"""
+        merged = []
+        manual = 0  # Entradas manuales ya agregadas
+        for event in self.events:
+            if not event.in_history:
+                continue
+            position = len(self.history) if event.history_index is None else event.history_index
+            if position > manual:
+                merged.extend(self.history[manual:position])
+                manual = position
+            merged.append(f"{event.display_text()} ({event.date_str})")
+        merged.extend(self.history[manual:])
+        return merged
+
+    def _record_event(self, event: LifeEvent) -> None:
+        """Agrega un evento; si va al historial, recuerda su lugar entre las entradas manuales"""
+        if event.in_history:
+            event.history_index = len(self.history)
+        self.events.append(event)
+
+    def clear_history(self):
+        """Limpia el historial visible sin borrar los eventos de la línea de tiempo"""
+        self.history.clear()
+        for event in self.events:
+            event.in_history = False
+
     def add_major_life_event(self, event_type: str, details: str = "", date: str = None):
         """
         Agrega un evento mayor de la vida con categorización
@@ -176,33 +249,66 @@ class Person:
             details (str, optional): Detalles adicionales del evento
             date (str, optional): Fecha específica del evento
         """
-        if not date:
-            date = datetime.datetime.now().strftime("%Y-%m-%d")
+        self._record_event(LifeEvent.create(event_type, details, date))
         
-        # Categorías de eventos
-        event_categories = {
-            'birth': '👶',
-            'marriage': '💍',
-            'divorce': '💔',
-            'death': '⚰️',
-            'childbirth': '👶',
-            'graduation': '🎓',
-            'retirement': '🏖️',
-            'widowhood': '🕯️',
-            'other': '📝'
-        }
+    def add_event(self, event: str, date: str, category: str = 'other'):
+        """
+        Agrega un evento de texto libre a la lista de eventos
+        
+        Args:
+            event (str): Texto del evento
+            date (str): Fecha del evento en formato YYYY-MM-DD
+            category (str, optional): Tipo de evento ('birthday', 'death', 'other', etc.)
+        """
+        self.events.append(LifeEvent(EventCategory.from_type(category), LifeEvent.resolve_ordinal(date), event))
         
-        category_emoji = event_categories.get(event_type, '📝')
-        event_str = f"{category_emoji} {event_type.capitalize()}"
-        if details:
-            event_str += f": {details}"
+    def compact_events(self, routine_categories, max_routine: int) -> list:
+        """
+        Resume los eventos rutinarios antiguos en contadores por categoría
         
-        self.events.append({"evento": event_str, "fecha": date})
-        self.history.append(f"{event_str} ({date})")
+        Los eventos mayores se conservan siempre; de cada categoría rutinaria solo
+        se mantienen los últimos max_routine eventos y el resto se acumula en
+        event_rollups (cantidad y rango de fechas).
         
-    def add_event(self, event: str, date: str):
-        """Agrega un evento a la lista de eventos"""
-        self.events.append({"evento": event, "fecha": date})
+        Args:
+            routine_categories: Categorías consideradas rutinarias (ej. 'birthday')
+            max_routine (int): Eventos rutinarios recientes a conservar por categoría
+            
+        Returns:
+            list: Eventos retirados de la lista (para guardarlos en disco si se desea)
+        """
+        routine = {EventCategory.from_type(category) for category in routine_categories}
+        routine.discard(EventCategory.OTHER)
+        if not routine:
+            return []
+        
+        # Contar desde el final para conservar los más recientes
+        seen = {}
+        kept = []
+        removed = []
+        for event in reversed(self.events):
+            if event.category in routine and not event.in_history:
+                seen[event.category] = seen.get(event.category, 0) + 1
+                if seen[event.category] > max_routine:
+                    removed.append(event)
+                    continue
+            kept.append(event)
+        
+        if not removed:
+            return []
+        
+        removed.reverse()
+        kept.reverse()
+        self.events = kept
+        for event in removed:
+            rollup = self.event_rollups.get(event.category.value)
+            if rollup is None:
+                self.event_rollups[event.category.value] = [1, event.ordinal, event.ordinal]
+            else:
+                rollup[0] += 1
+                rollup[1] = min(rollup[1], event.ordinal)
+                rollup[2] = max(rollup[2], event.ordinal)
+        return removed
         
     def register_life_event(self, event_type: str, details: str = "", date: str = None):
         """
@@ -216,31 +322,8 @@ class Person:
         if date is None:
             date = datetime.datetime.now().strftime("%Y-%m-%d")
             
-        # Categorías de eventos con emojis
-        event_categories = {
-            'birth': '👶',
-            'marriage': '💍', 
-            'divorce': '💔',
-            'childbirth': '👶',
-            'widowhood': '🕯️',
-            'death': '⚰️',
-            'graduation': '🎓',
-            'retirement': '🏖️',
-            'trauma': '😢',
-            'guardianship': '🏠',
-            'health_decline': '😷',
-            'emotional_crisis': '💔',
-            'other': '📝'
-        }
-        
-        emoji = event_categories.get(event_type, '📝')
-        event_text = f"{emoji} {event_type.capitalize()}"
-        if details:
-            event_text += f": {details}"
-            
-        # Agregar a eventos y historial
-        self.events.append({"evento": event_text, "fecha": date})
-        self.history.append(f"{event_text} ({date})")
+        # Un único registro compacto; el texto con emoji se genera al mostrarlo
+        self._record_event(LifeEvent.create(event_type, details, date))
         
         # Registrar eventos específicos con efectos adicionales
         if event_type == 'marriage':
@@ -586,16 +669,7 @@ class Person:
             # Si hay cónyuge pero no fecha de matrimonio, estimarla
             estimated_marriage_year = self.calculate_age() - 25  # Estimar matrimonio a los 25 años
             if estimated_marriage_year > 0:
-                # Extraer año de nacimiento de manera segura
-                birth_year = 2000  # Valor por defecto
-                if self.birth_date:
-                    try:
-                        if isinstance(self.birth_date, str):
-                            birth_year = int(self.birth_date.split('-')[0])
-                        elif hasattr(self.birth_date, 'year'):
-                            birth_year = self.birth_date.year
-                    except (ValueError, AttributeError):
-                        birth_year = 2000
+                birth_year = self.birth_year or 2000  # Valor por defecto
                 
                 marriage_year = birth_year + 25
                 timeline.append({
@@ -624,24 +698,23 @@ class Person:
                 'categoria': 'widowhood'
             })
             
-        # Agregar eventos registrados manualmente
+        # Agregar eventos registrados (la categoría ya viene en el registro)
         for event in self.events:
-            # Extraer la categoría del evento
-            category = 'other'
-            for cat, emoji in [('birth', '👶'), ('marriage', '💍'), ('divorce', '💔'), 
-                              ('death', '⚰️'), ('childbirth', '👶'), ('graduation', '🎓'),
-                              ('retirement', '🏖️'), ('widowhood', '🕯️')]:
-                if emoji in event['evento']:
-                    category = cat
-                    break
-            
-            # Extraer el texto del evento
-            event_text = event['evento'].replace('👶', '').replace('💍', '').replace('💔', '').replace('⚰️', '') \
-                             .replace('🎓', '').replace('🏖️', '').replace('🕯️', '').strip()
-            
             timeline.append({
-                'fecha': event['fecha'],
-                'evento': event_text,
+                'fecha': event.date_str,
+                'evento': event.plain_text(),
+                'categoria': event.category.value
+            })
+        
+        # Agregar eventos rutinarios resumidos (un registro por categoría)
+        for category, (count, first, last) in self.event_rollups.items():
+            first_year = ordinal_to_str(first)[:4]
+            last_year = ordinal_to_str(last)[:4]
+            label = 'Cumpleaños' if category == 'birthday' else category.capitalize()
+            timeline.append({
+                'fecha': ordinal_to_str(first),
+                'evento': f"{label} x{count} ({first_year}-{last_year})",
+                'descripcion': f"{count} eventos resumidos entre {first_year} y {last_year}",
                 'categoria': category
             })
         
@@ -654,35 +727,12 @@ class Person:
                 'categoria': 'death'
             })
             
-        # Ordenar por fecha - convertir todas las fechas a datetime para comparación
-        def parse_date_for_sorting(date_value):
-            """Convierte fecha a datetime para ordenamiento seguro"""
-            if isinstance(date_value, datetime.datetime):
-                return date_value
-            elif isinstance(date_value, str):
-                try:
-                    # Limpiar formato ISO con T y hora: "2006-11-09T00:00:00"
-                    if 'T' in date_value:
-                        clean_date = date_value.split('T')[0]
-                    # Limpiar formato con espacio y hora: "2006-11-09 00:00:00"
-                    elif ' ' in date_value and ':' in date_value:
-                        clean_date = date_value.split(' ')[0]
-                    else:
-                        clean_date = date_value
-                    # Intentar parsear string de fecha en formato YYYY-MM-DD
-                    return datetime.datetime.strptime(clean_date, '%Y-%m-%d')
-                except ValueError:
-                    try:
-                        # Intentar parsear otros formatos comunes
-                        return datetime.datetime.strptime(clean_date, '%Y/%m/%d')
-                    except ValueError:
-                        # Si no se puede parsear, usar una fecha muy antigua
-                        return datetime.datetime(1900, 1, 1)
-            else:
-                # Si no es ni datetime ni string, usar fecha muy antigua
-                return datetime.datetime(1900, 1, 1)
+        # Ordenar por fecha usando ordinales (fechas no reconocidas van al inicio)
+        def sort_key(entry):
+            ordinal = date_to_ordinal(entry['fecha'])
+            return ordinal if ordinal is not None else datetime.date(1900, 1, 1).toordinal()
         
-        timeline.sort(key=lambda x: parse_date_for_sorting(x['fecha']))
+        timeline.sort(key=sort_key)
         return timeline
     
     def get_statistics(self) -> dict:
@@ -700,7 +750,7 @@ class Person:
             'num_hermanos': len(self.siblings),
             'salud_emocional': self.emotional_health,
             'num_eventos': len(self.events),
-            'intereses_principales': self.interests[:3],
+            'intereses_principales': list(self.interests[:3]),
             'estado_civil': self.marital_status,
             'provincia': self.province,
             'genero': 'Masculino' if self.gender == 'M' else 'Femenino'
@@ -807,14 +857,15 @@ class Person:
             'marital_status': self.marital_status,
             'alive': self.alive,
             'emotional_health': self.emotional_health,
-            'interests': self.interests,
+            'interests': list(self.interests),
             'virtual_age': self.virtual_age,
             'father_cedula': self.father.cedula if self.father else None,
             'mother_cedula': self.mother.cedula if self.mother else None,
             'spouse_cedula': self.spouse.cedula if self.spouse else None,
             'children_cedulas': [child.cedula for child in self.children],
             'siblings_cedulas': [sibling.cedula for sibling in self.siblings],
-            'events': self.events,
+            'events': [event.to_dict() for event in self.events],
+            'event_rollups': self.event_rollups,
             'history': self.history
         }
     
@@ -846,7 +897,8 @@ class Person:
         person.emotional_health = data['emotional_health']
         person.interests = data['interests']
         person.virtual_age = data['virtual_age']
-        person.events = data['events']
+        person.events = [LifeEvent.from_dict(event) for event in data['events']]
+        person.event_rollups = {category: list(values) for category, values in data.get('event_rollups', {}).items()}
         person.history = data['history']
         
         # Las relaciones se establecerán después al cargar toda la familia
@@ -7,6 +7,7 @@ class SimulationConfig:
         # Probabilidades balanceadas
         self.birth_probability = 0.25  # 25% por ciclo para parejas compatibles
         self.death_probability_base = 0.002  # Base muy baja
+        self.life_table_path = None  # CSV con la tabla de vida (None = tabla por defecto)
         self.find_partner_probability = 0.08  # 8% por ciclo para solteros elegibles
         self.remarriage_probability = 0.05  # 5% para viudos
         
@@ -17,4 +18,30 @@ class SimulationConfig:
         # Edades críticas
         self.min_marriage_age = 18
         self.max_female_fertility = 45
-        self.max_male_fertility = 65
\ No newline at end of file
+        self.max_male_fertility = 65
+        
+        # Retención de eventos por persona
+        self.routine_event_categories = ('birthday',)  # Se resumen en contadores
+        self.max_routine_events = 5  # Eventos rutinarios recientes que se conservan completos
+        self.event_spill_path = None  # Archivo JSONL opcional para guardar los eventos resumidos
+        
+        # Mercado matrimonial: las parejas internas del ciclo se forman con emparejamiento estable
+        self.use_marriage_market = False
+        self.random_seed = None  # Semilla para repetir una simulación (None = aleatoria)
+        
+        # Reserva de personas externas (parejas que llegan de fuera de la familia)
+        self.external_pool_size = 200  # Personas pre-generadas que se mantienen listas
+        self.external_pool_low_water = 50  # Bajo esta cantidad se rellena la reserva
+        
+        # Simulación por linajes: cada componente conexo de la familia se procesa por separado
+        self.use_component_parallelism = False
+        self.component_workers = 4  # Hilos para decidir fallecimientos y nacimientos por linaje
+        
+        # Simulación por eventos: solo se procesan los fallecimientos, búsquedas de pareja
+        # y nacimientos que vencen en el año (tiene prioridad sobre la simulación por linajes)
+        self.use_event_scheduler = False
+        
+        # Medición de ciclos: destinos de las métricas por fase (ver utils/simulation_metrics.py)
+        self.metrics_sinks = []  # Por ejemplo [LoggingSink()], [JsonlSink("metricas.jsonl")] o [RingBufferSink(100)]
+        self.profile_cycles = False  # Capturar un perfil con cProfile en cada ciclo
+        self.profile_path = None  # Archivo donde guardar el perfil del último ciclo (formato pstats)
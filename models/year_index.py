@@ -0,0 +1,82 @@
+# models/year_index.py
+from __future__ import annotations
+from bisect import bisect_left, bisect_right, insort
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:
+    from models.person import Person
+
+
+class YearIndex:
+    """Índice ordenado de años de nacimiento y edades de fallecimiento de una familia.
+
+    Permite responder consultas por rango ("nacidos en los últimos N años",
+    "fallecidos antes de los X años") con búsqueda binaria en lugar de
+    recorrer todos los miembros.
+    """
+
+    def __init__(self):
+        self.birth_years = []  # Años de nacimiento ordenados
+        self.death_ages = []   # Edad (en años) al fallecer, ordenada
+        self.size = 0          # Personas indexadas (tengan o no fecha válida)
+        self._deceased = set()  # id() de las personas ya registradas como fallecidas
+
+    @classmethod
+    def build(cls, members: Iterable['Person']) -> 'YearIndex':
+        """Construye el índice completo a partir de la lista de miembros"""
+        index = cls()
+        for person in members:
+            index.size += 1
+            if person.birth_year is not None:
+                index.birth_years.append(person.birth_year)
+            if not person.alive:
+                index._register_death(person)
+        index.birth_years.sort()
+        index.death_ages.sort()
+        return index
+
+    def add_person(self, person: 'Person') -> None:
+        """Agrega una persona nueva al índice"""
+        self.size += 1
+        if person.birth_year is not None:
+            insort(self.birth_years, person.birth_year)
+        if not person.alive:
+            self.record_death(person)
+
+    def record_death(self, person: 'Person') -> None:
+        """Registra el fallecimiento de una persona ya indexada (idempotente)"""
+        if id(person) in self._deceased:
+            return
+        self._register_death(person, keep_sorted=True)
+
+    def _register_death(self, person: 'Person', keep_sorted: bool = False) -> None:
+        self._deceased.add(id(person))
+        if person.birth_year is None or person.death_year is None:
+            return
+        age = person.death_year - person.birth_year
+        if keep_sorted:
+            insort(self.death_ages, age)
+        else:
+            self.death_ages.append(age)
+
+    @property
+    def deceased_count(self) -> int:
+        """Cantidad de personas fallecidas"""
+        return len(self._deceased)
+
+    @property
+    def living_count(self) -> int:
+        """Cantidad de personas vivas"""
+        return self.size - len(self._deceased)
+
+    def count_born_since(self, year: int) -> int:
+        """Cuenta las personas nacidas en el año indicado o después"""
+        return len(self.birth_years) - bisect_left(self.birth_years, year)
+
+    def count_born_between(self, start_year: int, end_year: int) -> int:
+        """Cuenta las personas nacidas entre dos años (ambos incluidos)"""
+        return bisect_right(self.birth_years, end_year) - bisect_left(self.birth_years, start_year)
+
+    def count_died_before_age(self, age: int) -> int:
+        """Cuenta las personas que fallecieron antes de cumplir la edad indicada"""
+        return bisect_left(self.death_ages, age)
@@ -225,7 +225,7 @@ class PersistenceService:
             for family_id_str, family_data in families_data.items():
                 family_id = int(family_id_str)
                 family = self.dict_to_family(family_data)
-                family_manager.families[family_id] = family
+                family_manager.register_family(family_id, family)
             
             return family_manager
             
@@ -133,8 +133,9 @@ class PersonaService:
         return family.get_deceased_members()
     
     @staticmethod
-    def actualizar_persona(person: Person, **kwargs) -> Tuple[bool, Optional[str]]:
-        """Actualiza los datos de una persona"""
+    def actualizar_persona(person: Person, family: Optional[Family] = None,
+                           **kwargs) -> Tuple[bool, Optional[str]]:
+        """Actualiza los datos de una persona (con family, invalida sus índices derivados)"""
         campos_permitidos = ['first_name', 'last_name', 'birth_date', 'death_date', 
                            'gender', 'province', 'marital_status', 'emotional_health']
         
@@ -146,6 +147,10 @@ class PersonaService:
         if 'death_date' in kwargs:
             person.alive = not bool(kwargs['death_date'])
         
+        # Fechas, género, provincia o apellido alimentan los índices de la familia
+        if family is not None:
+            family.invalidate_indexes()
+        
         return True, "Persona actualizada exitosamente"
     
     @staticmethod
@@ -176,7 +181,7 @@ class PersonaService:
             person.father.children.remove(person)
         
         # Eliminar de la familia
-        family.members.remove(person)
+        family.remove_member(person)
         
         return True, "Persona eliminada exitosamente"
     
@@ -192,8 +197,8 @@ class PersonaService:
             'provincia': person.province,
             'estado_civil': person.marital_status,
             'salud_emocional': person.emotional_health,
-            'intereses': person.interests,
-            'historial': person.history,
+            'intereses': list(person.interests),
+            'historial': person.get_history(),
             'madre': person.mother.get_full_name() if person.mother else None,
             'padre': person.father.get_full_name() if person.father else None,
             'pareja': person.spouse.get_full_name() if person.spouse else None,
@@ -218,13 +223,14 @@ class PersonaService:
     @staticmethod
     def obtener_estadisticas_familia(family: Family) -> dict:
         """Obtiene estadísticas de la familia"""
-        total = len(family.members)
-        vivos = len(family.get_living_members())
-        fallecidos = len(family.get_deceased_members())
+        aggregates = family.get_aggregates()
+        total = aggregates.size
+        vivos = aggregates.living
+        fallecidos = aggregates.deceased
         
         # Contar por género
-        hombres = sum(1 for p in family.members if p.gender == 'M')
-        mujeres = sum(1 for p in family.members if p.gender == 'F')
+        hombres = aggregates.by_gender.get('M', 0)
+        mujeres = aggregates.by_gender.get('F', 0)
         
         # Contar por estado civil
         estados = {}
@@ -243,5 +249,9 @@ class PersonaService:
             'mujeres': mujeres,
             'estados_civiles': estados,
             'edad_promedio': round(edad_promedio, 1),
-            'porcentaje_vivos': round((vivos / total * 100), 1) if total > 0 else 0
+            'porcentaje_vivos': round((vivos / total * 100), 1) if total > 0 else 0,
+            'parejas': aggregates.couples,
+            'por_generacion': dict(aggregates.by_generation),
+            'por_provincia': dict(aggregates.by_province),
+            'nacimientos_por_decada': dict(aggregates.births_by_decade)
         }
\ No newline at end of file
@@ -587,6 +587,7 @@ class RelacionService:
         # Establecer relación
         person1.spouse = person2
         person2.spouse = person1
+        family.record_union(person1, person2)
         
         # Actualizar estado civil
         person1.marital_status = "Casado/a"
@@ -739,6 +740,7 @@ class RelacionService:
         
         # Actualizar hermanos automáticamente
         RelacionService._actualizar_hermanos(child, family)
+        family.record_parents(child)
         
         return True, "Relación de padres registrada exitosamente"
     
@@ -796,13 +798,7 @@ class RelacionService:
     @staticmethod
     def obtener_nacimientos_ultimos_10_años(family: Family) -> int:
         """Obtiene cuántas personas nacieron en los últimos 10 años"""
-        count = 0
-        for person in family.members:
-            if person.birth_date:
-                birth_year = int(person.birth_date[:4])
-                if family.current_year - birth_year <= 10:
-                    count += 1
-        return count
+        return family.get_year_index().count_born_since(family.current_year - 10)
 
     @staticmethod
     def obtener_parejas_con_hijos(family: Family, min_hijos: int = 2) -> list:
@@ -818,17 +814,7 @@ class RelacionService:
     @staticmethod
     def obtener_fallecidos_antes_50(family: Family) -> int:
         """Obtiene cuántas personas fallecieron antes de cumplir 50 años"""
-        count = 0
-        for person in family.members:
-            if person.death_date and person.birth_date:
-                try:
-                    birth_year = int(person.birth_date[:4])
-                    death_year = int(person.death_date[:4])
-                    if death_year - birth_year < 50:
-                        count += 1
-                except (ValueError, TypeError):
-                    continue
-        return count
+        return family.get_year_index().count_died_before_age(50)
 
     @staticmethod
     def buscar_personas_por_nombre(family: Family, nombre: str) -> list:
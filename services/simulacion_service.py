@@ -1,12 +1,32 @@
 from asyncio.log import logger
+import json
+import math
 import logging
 import random
 import datetime
+from collections import deque
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from typing import Tuple, Optional
 from models.family import Family
 from models.person import Person
 from models.simulation_config import SimulationConfig
+from models.matching_index import MatchingIndex
+from models.event_scheduler import EventScheduler
+from models.life_table import LifeTable
+from models.interests import decode_interests
+from models.external_pool import ExternalPool, EXTERNAL_SURNAMES, PROVINCES
 from services.persona_service import PersonaService
+from utils import simulation_metrics
+
+# Cada búsqueda por cédula se suma al ciclo medido (fuera de un ciclo medido no cuesta nada)
+Family.on_cedula_lookup = staticmethod(lambda: simulation_metrics.count('busquedas_cedula'))
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional: el puntaje por lotes devuelve una lista
+    np = None
 
 class SimulacionService:
     """Servicio para gestionar la simulación de eventos familiares"""
@@ -15,15 +35,15 @@ class SimulacionService:
     def simular_cumpleaños(person: Person, family: Family) -> None:
         """Simula un cumpleaños para una persona"""
         sim_date = f"{family.current_year}-01-01"
-        person.add_event("Cumpleaños", sim_date)
+        person.add_event("Cumpleaños", sim_date, 'birthday')
         
         # Si la persona está viuda, la salud emocional puede disminuir
         if person.marital_status == "Viudo/a" and person.emotional_health > 20:
             person.emotional_health -= random.randint(1, 5)
         
         # Si está soltero/a por mucho tiempo, la salud emocional disminuye
-        if person.marital_status == "Soltero/a" and person.calculate_virtual_age() > 30:
-            years_single = family.current_year - int(person.birth_date.split('-')[0]) - 30
+        if person.marital_status == "Soltero/a" and person.calculate_virtual_age() > 30 and person.birth_year:
+            years_single = family.current_year - person.birth_year - 30
             if years_single > 0:
                 person.emotional_health = max(10, person.emotional_health - (years_single * 2))
                 
@@ -48,13 +68,14 @@ class SimulacionService:
         person.alive = False
         person.death_date = datetime.datetime.now().strftime("%Y-%m-%d")
         person.marital_status = "Viudo/a" if person.spouse else "Fallecido/a"
-        person.add_event("Fallecimiento", person.death_date)
+        person.add_event("Fallecimiento", person.death_date, 'death')
+        family.record_death(person)
         
         # Si tiene pareja, actualizar estado de la pareja
         if person.spouse and person.spouse.alive:
             person.spouse.marital_status = "Viudo/a"
             person.spouse.emotional_health = max(10, person.spouse.emotional_health - 30)
-            person.spouse.add_event("Viudez", person.death_date)
+            person.spouse.add_event("Viudez", person.death_date, 'widowhood')
         
         # Manejar hijos menores de edad
         SimulacionService.manejar_hijos_menores(person, family)
@@ -108,14 +129,12 @@ class SimulacionService:
         mother_surname = mother.last_name.split()[0] if mother.last_name else "Desconocida"
         last_name = f"{father_surname} {mother_surname}"
         
-        # Generar cédula única
-        cedula = Family.generate_cedula()
-        while not Family.validate_cedula_unique(cedula, family):
-            cedula = Family.generate_cedula()
-        
         # Provincia: Hereda principalmente del padre (60%) o madre (40%)
         province = father.province if random.random() < 0.6 else mother.province
         
+        # Cédula única con el dígito de la provincia
+        cedula = family.allocate_cedula(province)
+        
         # Crear bebé con fecha de nacimiento realista
         birth_month = random.randint(1, 12)
         birth_day = random.randint(1, 28)  # Usar 28 para evitar problemas con febrero
@@ -144,7 +163,7 @@ class SimulacionService:
         if parent_interests and random.random() < 0.1:
             inherited_interest = random.choice(parent_interests)
             if inherited_interest not in baby.interests:
-                baby.interests.append(inherited_interest)
+                baby.interests += (inherited_interest,)
         
         # Establecer salud emocional inicial alta
         baby.emotional_health = random.randint(85, 100)
@@ -190,21 +209,20 @@ class SimulacionService:
         
         # Crear una copia de la lista de miembros para evitar problemas de modificación durante iteración
         members_copy = family.members.copy()
+        indice_parejas = None
+        
+        # Probabilidad de fallecimiento: base más 1% por año sobre los 60 (una consulta para todos)
+        tabla = SimulacionService.obtener_tabla_lineal(config)
+        death_probabilities = tabla.probabilities(members_copy)
         
         # Procesar eventos para cada persona
-        for person in members_copy:
+        for person, death_probability in zip(members_copy, death_probabilities):
             if not person.alive:
                 continue
                 
             # Cumpleaños
-            person.add_event("Cumpleaños", sim_date)
+            person.add_event("Cumpleaños", sim_date, 'birthday')
             
-            # Probabilidad de fallecimiento
-            age = person.calculate_virtual_age()
-            death_probability = config.death_probability_base
-            if age > 60:
-                death_probability += 0.01 * (age - 60)
-                
             if random.random() < death_probability:
                 success, message = SimulacionService.simular_fallecimiento(person, family)
                 if success:
@@ -216,18 +234,18 @@ class SimulacionService:
                 person.marital_status == "Soltero/a" and 
                 random.random() < config.find_partner_probability and 
                 not person.has_partner()):
-                pareja_encontrada = SimulacionService.intentar_encontrar_pareja(person, family)
+                if indice_parejas is None:
+                    indice_parejas = SimulacionService.construir_indice_parejas(family, 18)
+                pareja_encontrada = SimulacionService.intentar_encontrar_pareja(person, family, indice_parejas)
                 if pareja_encontrada:
                     eventos.append(f"{person.first_name} {person.last_name} encontró pareja")
         
         # Probabilidad de nacimientos (separado del ciclo principal para evitar problemas con nuevos miembros)
-        for person in members_copy:
-            # Verificar que la persona esté viva, pueda tener hijos y tenga pareja viva
-            if (person.alive and 
-                person.can_have_children() and 
-                person.has_partner() and 
-                person.spouse and  # Asegurar que spouse no sea None
-                person.spouse.alive):
+        # Solo se revisan las parejas activas del registro de parejas fértiles
+        registro = SimulacionService.obtener_registro_fertil(family, config)
+        for person, _, _ in registro.active_couples():
+            # Verificar que la persona pueda tener hijos (límites por generación)
+            if person.can_have_children():
                 
                 # Calcular probabilidad ajustada por generación y número de hijos
                 age = person.calculate_virtual_age()
@@ -263,14 +281,17 @@ class SimulacionService:
             if person.spouse and person.spouse.spouse != person:
                 # Corregir relación recíproca
                 person.spouse.spouse = person
+                family.record_union(person, person.spouse)
                 if "Casado" not in person.spouse.marital_status:
                     person.spouse.marital_status = "Casado/a"
         
+        SimulacionService.aplicar_retencion_eventos(family, config)
         return eventos
 
     @staticmethod
     def calcular_compatibilidad_total(person1: Person, person2: Person) -> dict:
         """Sistema completo de compatibilidad con 4 factores principales"""
+        simulation_metrics.count('compatibilidades')
         scores = {}
         
         # 1. Edad (30 puntos) - Diferencia máxima 15 años
@@ -285,7 +306,8 @@ class SimulacionService:
             scores['age'] = 0
         
         # 2. Intereses (25 puntos) - REDUCIDO: Mínimo 1 en común
-        common_interests = len(set(person1.interests) & set(person2.interests))
+        common_mask = person1.interest_mask & person2.interest_mask
+        common_interests = common_mask.bit_count()
         scores['interests'] = min(25, common_interests * 12)  # 12 puntos por interés común (más generoso)
         
         # 3. Salud emocional (25 puntos) - Similar nivel
@@ -304,10 +326,55 @@ class SimulacionService:
             'total': total,
             'compatible': total >= 50,  # Reducido de 70% a 50% para más parejas viables
             'breakdown': scores,
-            'common_interests': list(set(person1.interests) & set(person2.interests)),
+            'common_interests': decode_interests(common_mask),
             'recommendation': SimulacionService.get_compatibility_message(total)
         }
 
+    @staticmethod
+    def calcular_compatibilidad_lote(person: Person, candidatos: list, desglose: bool = False):
+        """
+        Calcula la compatibilidad de una persona con varios candidatos a la vez
+        
+        Usa las mismas reglas que calcular_compatibilidad_total (edad, intereses,
+        salud emocional y genética).
+        
+        Args:
+            person (Person): Persona de referencia
+            candidatos (list): Lista de posibles parejas
+            desglose (bool): Si es True devuelve una matriz (n, 4) con los puntajes
+                             de edad, intereses, emocional y genética en ese orden
+            
+        Returns:
+            Vector NumPy con el puntaje total de cada candidato (lista si NumPy no está instalado)
+        """
+        simulation_metrics.count('compatibilidades', len(candidatos))
+        age = person.calculate_virtual_age()
+        mask = person.interest_mask
+        emotional = person.emotional_health
+        
+        # Lo que requiere recorrer relaciones se calcula por candidato; el resto se vectoriza
+        ages = [c.calculate_virtual_age() for c in candidatos]
+        common = [(mask & c.interest_mask).bit_count() for c in candidatos]
+        emotions = [c.emotional_health for c in candidatos]
+        genetic = [20 if SimulacionService.es_compatible_geneticamente(person, c) else 0 for c in candidatos]
+        
+        if np is None:
+            rows = []
+            for cand_age, cand_common, cand_emotional, cand_genetic in zip(ages, common, emotions, genetic):
+                age_diff = abs(age - cand_age)
+                age_score = 30 if age_diff <= 3 else 20 if age_diff <= 8 else 10 if age_diff <= 15 else 0
+                rows.append((age_score, min(25, cand_common * 12),
+                             max(0, 25 - abs(emotional - cand_emotional) // 4), cand_genetic))
+            return rows if desglose else [sum(row) for row in rows]
+        
+        age_diff = np.abs(np.asarray(ages, dtype=np.int64) - age)
+        age_scores = np.select([age_diff <= 3, age_diff <= 8, age_diff <= 15], [30, 20, 10], default=0)
+        interest_scores = np.minimum(25, np.asarray(common, dtype=np.int64) * 12)
+        emotional_scores = np.maximum(0, 25 - np.abs(np.asarray(emotions, dtype=np.int64) - emotional) // 4)
+        scores = np.column_stack([age_scores, interest_scores, emotional_scores,
+                                  np.asarray(genetic, dtype=np.int64)])
+        return scores if desglose else scores.sum(axis=1)
+
     @staticmethod
     def get_compatibility_message(score):
         """Genera un mensaje descriptivo basado en el puntaje de compatibilidad"""
@@ -388,9 +455,9 @@ class SimulacionService:
             return False, "Incompatibilidad genética detectada. No se recomienda la unión por riesgos en descendencia"
         
         # 5. Verificar compatibilidad emocional (intereses en común) - REQUISITO REDUCIDO
-        common_interests = set(person1.interests) & set(person2.interests)
-        if len(common_interests) < 1:  # Reducido de 2 a 1 interés en común
-            return False, f"Se requiere al menos 1 interés en común. Tienen {len(common_interests)} interés(es) compartido(s)"
+        common_interests = (person1.interest_mask & person2.interest_mask).bit_count()
+        if common_interests < 1:  # Reducido de 2 a 1 interés en común
+            return False, f"Se requiere al menos 1 interés en común. Tienen {common_interests} interés(es) compartido(s)"
         
         # 6. Verificar índice de compatibilidad - UMBRAL REDUCIDO
         compatibility = SimulacionService.calcular_compatibilidad_total(person1, person2)
@@ -409,15 +476,30 @@ class SimulacionService:
         for person in family.members:
             # Regenerar intereses solo si tiene muy pocos
             if len(person.interests) < 4:
-                old_interests = person.interests.copy()
+                old_interests = person.interests
                 person.interests = person.generate_interests()
                 eventos.append(f"🎯 {person.first_name} desarrolló nuevos intereses: {', '.join(person.interests[:3])}...")
         
         return eventos
 
     @staticmethod
-    def intentar_encontrar_pareja(person: Person, family: Family) -> bool:
-        """Intenta encontrar una pareja para una persona soltera, priorizando generar personas externas"""
+    def construir_indice_parejas(family: Family, min_age: int) -> MatchingIndex:
+        """Construye el índice de miembros vivos sin pareja con edad mínima para unirse"""
+        return MatchingIndex.build(
+            p for p in family.members
+            if p.alive and not p.has_partner() and p.calculate_virtual_age() >= min_age
+        )
+
+    @staticmethod
+    def intentar_encontrar_pareja(person: Person, family: Family, indice: MatchingIndex = None) -> bool:
+        """
+        Intenta encontrar una pareja para una persona soltera, priorizando generar personas externas
+        
+        Args:
+            person (Person): Persona que busca pareja
+            family (Family): Familia de la persona
+            indice (MatchingIndex, optional): Índice de solteros ya construido para el ciclo
+        """
         if not person.alive or person.has_partner():
             return False
         
@@ -426,33 +508,31 @@ class SimulacionService:
             return SimulacionService.generar_persona_externa_para_pareja(person, family)
         
         # PRIORIDAD 2: Buscar dentro de la familia existente (20% de probabilidad)
-        possible_partners = []
-        for potential in family.members:
-            if (potential != person and 
-                potential.alive and 
-                not potential.has_partner() and 
-                potential.gender != person.gender and
-                potential.calculate_virtual_age() >= 18):
-                
-                # Verificar compatibilidad completa
-                compatibility = SimulacionService.calcular_compatibilidad_total(person, potential)
-                
-                # Requisitos mínimos para pareja interna
-                age_diff = abs(person.calculate_virtual_age() - potential.calculate_virtual_age())
-                if (age_diff <= 15 and 
-                    compatibility['total'] >= 60 and  # Umbral más bajo para familia existente
-                    SimulacionService.es_compatible_geneticamente(person, potential)):
-                    possible_partners.append((potential, compatibility['total']))
+        if indice is None:
+            indice = SimulacionService.construir_indice_parejas(family, 18)
+        simulation_metrics.count('consultas_indice_parejas')
+        possible_partners = [p for p in indice.candidates(person) if p.alive and not p.has_partner()]
+        scores = SimulacionService.calcular_compatibilidad_lote(person, possible_partners, desglose=True)
+        
+        # Requisitos mínimos para pareja interna: 60 puntos (umbral más bajo para familia existente)
+        # y compatibilidad genética (el índice ya limita la diferencia de edad a 15 años)
+        best, best_total = None, None
+        for i, row in enumerate(scores):
+            total = sum(row)
+            if total >= 60 and row[3] > 0 and (best_total is None or total > best_total):
+                best, best_total = i, total
         
         # Si hay parejas compatibles dentro de la familia, elegir la mejor
-        if possible_partners:
-            partner, compatibility_score = max(possible_partners, key=lambda x: x[1])
+        if best is not None:
+            partner, compatibility_score = possible_partners[best], float(best_total)
             
             # ✅ CORRECCIÓN: Importar RelacionService LOCALMENTE para evitar importación circular
             from services.relacion_service import RelacionService
             
             success, _ = RelacionService.registrar_pareja(family, person.cedula, partner.cedula, es_simulacion=True)
             if success:
+                indice.remove(person)
+                indice.remove(partner)
                 current_date = f"{family.current_year}-01-01"
                 person.add_event(f"Formó pareja con {partner.first_name} {partner.last_name}", current_date)
                 partner.add_event(f"Formó pareja con {person.first_name} {person.last_name}", current_date)
@@ -462,74 +542,64 @@ class SimulacionService:
         # Si no hay parejas internas compatibles, generar persona externa como respaldo
         return SimulacionService.generar_persona_externa_para_pareja(person, family)
     
+    _pool_externo = None  # Reserva compartida de personas externas
+
+    @staticmethod
+    def obtener_pool_externo(config: SimulationConfig = None) -> ExternalPool:
+        """Obtiene (o crea) la reserva compartida de personas externas"""
+        if SimulacionService._pool_externo is None:
+            config = config or SimulationConfig()
+            SimulacionService._pool_externo = ExternalPool(
+                target_size=config.external_pool_size,
+                low_water=config.external_pool_low_water,
+                seed=config.random_seed
+            )
+        return SimulacionService._pool_externo
+
+    @staticmethod
+    def _ajustar_persona_externa(new_person: Person, family: Family) -> None:
+        """Adapta una persona de la reserva a la familia: cédula, apellido nuevo y año de nacimiento simulado"""
+        # Cédula única con el dígito de su provincia (salvo que ya tenga una reservada)
+        if not new_person.cedula:
+            new_person.cedula = family.allocate_cedula(new_person.province)
+        
+        # Evitar apellidos que ya existen en la familia (si quedan disponibles)
+        existing_surnames = family.get_aggregates().by_surname
+        if new_person.last_name in existing_surnames:
+            available_surnames = [s for s in EXTERNAL_SURNAMES if s not in existing_surnames]
+            if available_surnames:
+                new_person.last_name = random.choice(available_surnames)
+        
+        # La reserva guarda solo mes y día; el año depende del año simulado actual
+        month_day = (new_person.birth_date or "2000-01-01")[4:]
+        new_person.birth_date = f"{family.current_year - new_person.virtual_age}{month_day}"
+        new_person.history = [f"Nació el {new_person.birth_date}"]
+
     @staticmethod
     def generar_persona_externa_para_pareja(person: Person, family: Family) -> bool:
         """Genera una persona externa compatible para formar pareja con alguien de la familia"""
         # Determinar género de la pareja
         target_gender = "F" if person.gender == "M" else "M"
-    
-        # Generar cédula única
-        cedula = Family.generate_cedula()
-        while not Family.validate_cedula_unique(cedula, family):
-            cedula = Family.generate_cedula()
-    
-        # Generar nombre y apellido únicos (evitar apellidos existentes en la familia)
-        first_name, _ = Family.generate_name(target_gender)
         
-        # Generar apellido único no usado en la familia
-        existing_surnames = set(member.last_name for member in family.members)
-        all_surnames = ["González", "Vargas", "Morales", "Castro", "Rojas", "Herrera", "Vega", "Ramírez", 
-                       "Aguilar", "Solano", "Mora", "Araya", "Villalobos", "Cordero", "Chaves", "Monge", 
-                       "Quesada", "Carballo", "Mendez", "Esquivel", "Segura", "Trejos", "Salas", "Picado"]
-        
-        available_surnames = [s for s in all_surnames if s not in existing_surnames]
-        last_name = random.choice(available_surnames) if available_surnames else random.choice(all_surnames)
-    
-        # Generar edad compatible con la persona original
+        # Tomar de la reserva a alguien con edad compatible (diferencia de hasta 8 años)
         person_age = person.calculate_virtual_age()
-        age_diff = random.randint(-8, 8)  # Diferencia de hasta 8 años
-        age = max(18, min(85, person_age + age_diff))
-    
-        # Calcular fecha de nacimiento con mes y día aleatorios
-        current_year = family.current_year
-        birth_year = current_year - age
-        birth_month = random.randint(1, 12)
-        birth_day = random.randint(1, 28)  # Usar 28 para evitar problemas con febrero
-        birth_date = f"{birth_year}-{birth_month:02d}-{birth_day:02d}"
-    
+        new_partner = SimulacionService.obtener_pool_externo().take(target_gender, person_age - 8, person_age + 8)
+        if new_partner is None:
+            # La reserva no tiene a nadie en ese rango: crear una persona en el momento
+            new_partner = SimulacionService._crear_persona_externa(target_gender, person_age)
+        
         # Determinar provincia (60% misma provincia, 40% diferente)
-        provinces = ["San José", "Alajuela", "Cartago", "Heredia", "Guanacaste", "Puntarenas", "Limón"]
         if random.random() < 0.6:
-            province = person.province
-        else:
-            province = random.choice([p for p in provinces if p != person.province])
-    
-        # Crear la persona externa
-        new_partner = Person(
-            cedula=cedula,
-            first_name=first_name,
-            last_name=last_name,
-            birth_date=birth_date,
-            gender=target_gender,
-            province=province,
-            marital_status="Soltero/a"
-        )
-    
-        # Establecer edad virtual
-        new_partner.virtual_age = age
+            new_partner.province = person.province
+        elif new_partner.province == person.province:
+            new_partner.province = random.choice([p for p in PROVINCES if p != person.province])
+        
+        SimulacionService._ajustar_persona_externa(new_partner, family)
     
         # Generar intereses compatibles (al menos 2 en común con la persona original)
-        person_interests = set(person.interests) if person.interests else set()
-        base_interests = ["Trabajo", "Familia", "Deportes", "Lectura", "Música", "Viajes", "Arte", 
-                         "Cocina", "Tecnología", "Cine", "Naturaleza", "Fotografía"]
-        
-        # Asegurar al menos 2 intereses comunes
-        common_interests = random.sample(list(person_interests), min(2, len(person_interests)))
-        
-        # Agregar intereses adicionales únicos
-        remaining_interests = [i for i in base_interests if i not in common_interests and i not in person_interests]
-        additional_interests = random.sample(remaining_interests, min(2, len(remaining_interests)))
-        
+        person_interests = list(person.interests) if person.interests else []
+        common_interests = random.sample(person_interests, min(2, len(person_interests)))
+        additional_interests = [i for i in new_partner.interests if i not in person_interests][:2]
         new_partner.interests = common_interests + additional_interests
     
         # Establecer salud emocional compatible
@@ -577,7 +647,7 @@ class SimulacionService:
             return True
         else:
             # Si falla el registro de pareja, remover la persona de la familia
-            family.members = [m for m in family.members if m.cedula != new_partner.cedula]
+            family.remove_member(new_partner)
             logger.error(f"❌ Error registrando pareja externa: {message}")
             return False
             logger.info(f"Intereses comunes: {common_interests}")
@@ -585,72 +655,55 @@ class SimulacionService:
     
         return False
 
+    @staticmethod
+    def _crear_persona_externa(gender: str, reference_age: int) -> Person:
+        """Crea una persona externa cuando la reserva no tiene a nadie de la edad buscada"""
+        first_name, _ = Family.generate_name(gender)
+        age = max(18, min(85, reference_age + random.randint(-8, 8)))
+        new_person = Person(
+            cedula="",  # Se asigna al agregarla a la familia
+            first_name=first_name,
+            last_name=random.choice(EXTERNAL_SURNAMES),
+            birth_date=f"2000-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",
+            gender=gender,
+            province=random.choice(PROVINCES),
+            marital_status="Soltero/a"
+        )
+        new_person.virtual_age = age
+        return new_person
+
     @staticmethod
     def generar_poblacion_externa(family: Family, cantidad: int = 5) -> list:
-        """Genera múltiples personas externas para enriquecer el pool de candidatos a pareja"""
+        """Agrega a la familia personas externas tomadas de la reserva para enriquecer el pool de candidatos a pareja"""
         personas_generadas = []
+        pool = SimulacionService.obtener_pool_externo()
+        current_date = f"{family.current_year}-01-01"
         
-        # Diversificar edades y géneros
+        # Diversificar edades y géneros: alternar géneros, edad adulta (20-60 años)
+        nuevas = []
         for i in range(cantidad):
-            # Alternar géneros
             gender = "M" if i % 2 == 0 else "F"
-            
-            # Generar cédula única
-            cedula = Family.generate_cedula()
-            while not Family.validate_cedula_unique(cedula, family):
-                cedula = Family.generate_cedula()
-            
-            # Generar nombre y apellido únicos
-            first_name, _ = Family.generate_name(gender)
-            existing_surnames = set(member.last_name.split()[0] for member in family.members if member.last_name)
-            
-            all_surnames = ["González", "Vargas", "Morales", "Castro", "Rojas", "Herrera", "Vega", "Ramírez", 
-                           "Aguilar", "Solano", "Mora", "Araya", "Villalobos", "Cordero", "Chaves", "Monge", 
-                           "Quesada", "Carballo", "Mendez", "Esquivel", "Segura", "Trejos", "Salas", "Picado",
-                           "Mena", "Fallas", "Alfaro", "Ulate", "Zúñiga", "Calderón", "Matarrita", "Elizondo"]
-            
-            available_surnames = [s for s in all_surnames if s not in existing_surnames]
-            last_name = random.choice(available_surnames) if available_surnames else random.choice(all_surnames)
-            
-            # Generar edad adulta (20-60 años) y fecha de nacimiento realista
-            age = random.randint(20, 60)
-            birth_year = family.current_year - age
-            birth_month = random.randint(1, 12)
-            birth_day = random.randint(1, 28)  # Usar 28 para evitar problemas con febrero
-            birth_date = f"{birth_year}-{birth_month:02d}-{birth_day:02d}"
-            
-            # Provincia aleatoria
-            provinces = ["San José", "Alajuela", "Cartago", "Heredia", "Guanacaste", "Puntarenas", "Limón"]
-            province = random.choice(provinces)
-            
-            # Crear persona
-            new_person = Person(
-                cedula=cedula,
-                first_name=first_name,
-                last_name=last_name,
-                birth_date=birth_date,
-                gender=gender,
-                province=province,
-                marital_status="Soltero/a"
-            )
-            
-            # Establecer edad virtual
-            new_person.virtual_age = age
-            
-            # Intereses variados
-            base_interests = ["Trabajo", "Familia", "Deportes", "Lectura", "Música", "Viajes", "Arte", 
-                             "Cocina", "Tecnología", "Cine", "Naturaleza", "Fotografía", "Baile", "Estudio"]
-            new_person.interests = random.sample(base_interests, random.randint(3, 6))
-            
-            # Salud emocional variada pero generalmente buena
-            new_person.emotional_health = random.randint(60, 95)
+            new_person = pool.take(gender, 20, 60)
+            if new_person is None:
+                new_person = SimulacionService._crear_persona_externa(gender, random.randint(28, 52))
+            nuevas.append(new_person)
+        
+        # Reservar las cédulas por provincia en bloque
+        por_provincia = {}
+        for new_person in nuevas:
+            por_provincia.setdefault(new_person.province, []).append(new_person)
+        for province, personas in por_provincia.items():
+            for new_person, cedula in zip(personas, family.reserve_cedulas(len(personas), province)):
+                new_person.cedula = cedula
+        
+        for new_person in nuevas:
+            SimulacionService._ajustar_persona_externa(new_person, family)
             
             # Agregar a la familia
             family.add_or_update_member(new_person)
             personas_generadas.append(new_person)
             
             # Registrar evento
-            current_date = f"{family.current_year}-01-01"
             new_person.add_event("Se unió a la comunidad", current_date)
         
         return personas_generadas
@@ -666,7 +719,7 @@ class SimulacionService:
             person.incrementar_edad_virtual(1)
             
             # Registrar evento
-            person.add_event(f"Cumpleaños #{person.virtual_age}", current_date)
+            person.add_event(f"Cumpleaños #{person.virtual_age}", current_date, 'birthday')
             eventos.append(f"🎂 {person.first_name} {person.last_name} cumple {person.virtual_age} años")
             
             # Efectos del envejecimiento
@@ -683,78 +736,463 @@ class SimulacionService:
         if edad == 18:
             eventos.append(f"✨ {person.first_name} alcanza la mayoría de edad")
         elif edad == 65:
-            person.add_event("Jubilación", datetime.datetime.now().strftime("%Y-%m-%d"))
+            person.add_event("Jubilación", datetime.datetime.now().strftime("%Y-%m-%d"), 'retirement')
             eventos.append(f"🏆 {person.first_name} se jubila")
         
         # Deterioro de salud emocional con la edad
         if edad > 70 and random.random() < 0.3:
             person.emotional_health = max(10, person.emotional_health - random.randint(1, 3))
 
+    @staticmethod
+    @contextmanager
+    def _contar_reintentos_cedula(family: Family, metricas):
+        """Suma al ciclo medido las cédulas que el asignador tuvo que saltar"""
+        if metricas is None:
+            yield
+            return
+        asignador = family.get_cedula_allocator()
+        inicio = asignador.retries
+        try:
+            yield
+        finally:
+            if asignador.retries > inicio:
+                metricas.add('reintentos_cedula', asignador.retries - inicio)
+    
     @staticmethod
     def ejecutar_ciclo_completo(family: Family, config: SimulationConfig) -> list:
-        """Ejecuta todos los eventos del ciclo de simulación"""
+        """Ejecuta todos los eventos del ciclo de simulación (midiendo cada fase si la configuración lo pide)"""
+        if config.use_event_scheduler:
+            modo = 'eventos'
+        elif config.use_component_parallelism:
+            modo = 'linajes'
+        else:
+            modo = 'anual'
+        
+        with simulation_metrics.measure_cycle(config, family.current_year, modo) as metricas, \
+                SimulacionService._contar_reintentos_cedula(family, metricas):
+            SimulacionService.obtener_tabla_vida(config)
+            if config.use_event_scheduler:
+                return SimulacionService.ejecutar_ciclo_por_eventos(family, config)
+            if config.use_component_parallelism:
+                return SimulacionService.ejecutar_ciclo_por_componentes(family, config)
+            
+            eventos = []
+            vivos = family.get_aggregates().living
+            
+            # 1. Cumpleaños automáticos
+            with simulation_metrics.phase('cumpleanos', vivos):
+                birthday_events = SimulacionService.ejecutar_ciclo_cumpleanos(family)
+            eventos.extend(birthday_events)
+            
+            # 2. Fallecimientos probabilísticos
+            with simulation_metrics.phase('fallecimientos', vivos):
+                death_events = SimulacionService.procesar_fallecimientos(family)
+            eventos.extend(death_events)
+            
+            # 3. Búsqueda de parejas
+            with simulation_metrics.phase('parejas', family.get_aggregates().living):
+                romance_events = SimulacionService.procesar_busqueda_parejas(family, config)
+            eventos.extend(romance_events)
+            
+            # 4. Nacimientos
+            with simulation_metrics.phase('nacimientos', len(SimulacionService.obtener_registro_fertil(family, config))):
+                birth_events = SimulacionService.procesar_nacimientos(family, config)
+            eventos.extend(birth_events)
+            
+            # 5. Efectos colaterales
+            with simulation_metrics.phase('efectos', family.get_aggregates().living):
+                side_effects = SimulacionService.procesar_efectos_colaterales(family)
+            eventos.extend(side_effects)
+            
+            # 6. Resumir eventos rutinarios para que el historial no crezca sin límite
+            with simulation_metrics.phase('retencion', len(family.members)):
+                SimulacionService.aplicar_retencion_eventos(family, config)
+            
+            return eventos
+    
+    @staticmethod
+    def _decidir_eventos_componente(miembros: list, config: SimulationConfig, rng: random.Random) -> tuple:
+        """
+        Decide quién fallece y qué parejas tienen un hijo dentro de un linaje
+        
+        Solo lee el estado de las personas, así que varios linajes pueden decidirse
+        a la vez en distintos hilos. Cada linaje usa su propio generador.
+        
+        Returns:
+            tuple: (personas que fallecen, parejas (madre, padre) que tienen un hijo)
+        """
+        vivos = [p for p in miembros if p.alive]
+        probabilidades = SimulacionService.obtener_tabla_vida().probabilities(vivos)
+        fallecen = [p for p, prob in zip(vivos, probabilidades) if rng.random() < prob]
+        
+        muertos = set(map(id, fallecen))
+        nacimientos = []
+        for mother, father in SimulacionService.obtener_parejas_fertiles(vivos, config):
+            if id(mother) in muertos or id(father) in muertos:
+                continue
+            effective_prob = config.birth_probability * SimulacionService.penalizacion_por_hijos(mother, father)
+            if rng.random() < effective_prob:
+                nacimientos.append((mother, father))
+        return fallecen, nacimientos
+    
+    @staticmethod
+    def ejecutar_ciclo_por_componentes(family: Family, config: SimulationConfig) -> list:
+        """
+        Ejecuta el ciclo completo procesando cada linaje independiente por separado
+        
+        Los fallecimientos y nacimientos de cada componente conexo se deciden en un
+        grupo de hilos con un generador propio (derivado del generador global y de la
+        menor cédula del componente) y luego se aplican en orden de componente. La
+        búsqueda de pareja, que puede unir linajes, corre después en una fase común;
+        las uniones nuevas juntan los componentes para el ciclo siguiente. Con una
+        semilla fija el resultado no depende de la cantidad de hilos.
+        
+        Args:
+            family (Family): Familia simulada
+            config (SimulationConfig): Configuración de la simulación
+            
+        Returns:
+            list: Mensajes de los eventos del ciclo
+        """
         eventos = []
         
+        vivos = family.get_aggregates().living
+        
         # 1. Cumpleaños automáticos
-        birthday_events = SimulacionService.ejecutar_ciclo_cumpleanos(family)
-        eventos.extend(birthday_events)
+        with simulation_metrics.phase('cumpleanos', vivos):
+            eventos.extend(SimulacionService.ejecutar_ciclo_cumpleanos(family))
+        
+        # 2. Decidir fallecimientos y nacimientos por linaje
+        with simulation_metrics.phase('linajes', len(family.members)):
+            componentes = [grupo for grupo in family.get_components().groups()
+                           if any(p.alive for p in grupo)]
+        semilla_ciclo = random.getrandbits(64)
+        generadores = [random.Random(f"{semilla_ciclo}:{min(str(p.cedula) for p in grupo)}")
+                       for grupo in componentes]
+        
+        with simulation_metrics.phase('decisiones', vivos):
+            workers = min(config.component_workers, len(componentes))
+            if workers > 1:
+                # Cada tarea corre en una copia del contexto para que sus métricas cuenten en este ciclo
+                contextos = [contextvars.copy_context() for _ in componentes]
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    decisiones = list(pool.map(
+                        lambda args: args[0].run(SimulacionService._decidir_eventos_componente,
+                                                 args[1], config, args[2]),
+                        zip(contextos, componentes, generadores)))
+            else:
+                decisiones = [SimulacionService._decidir_eventos_componente(grupo, config, rng)
+                              for grupo, rng in zip(componentes, generadores)]
+        
+        # 3. Aplicar las decisiones en orden de componente
+        with simulation_metrics.phase('aplicacion', sum(len(f) + len(n) for f, n in decisiones)):
+            for fallecen, nacimientos in decisiones:
+                for person in fallecen:
+                    if person.alive:
+                        eventos.extend(SimulacionService._registrar_fallecimiento(person, family))
+                for mother, father in nacimientos:
+                    success, message = SimulacionService.simular_nacimiento_mejorado(mother, father, family)
+                    if success:
+                        eventos.append(message)
         
-        # 2. Fallecimientos probabilísticos
-        death_events = SimulacionService.procesar_fallecimientos(family)
-        eventos.extend(death_events)
+        # 4. Búsqueda de parejas entre linajes (fase común)
+        with simulation_metrics.phase('parejas', family.get_aggregates().living):
+            eventos.extend(SimulacionService.procesar_busqueda_parejas(family, config))
         
-        # 3. Búsqueda de parejas
-        romance_events = SimulacionService.procesar_busqueda_parejas(family, config)
-        eventos.extend(romance_events)
+        # 5. Efectos colaterales
+        with simulation_metrics.phase('efectos', family.get_aggregates().living):
+            eventos.extend(SimulacionService.procesar_efectos_colaterales(family))
         
-        # 4. Nacimientos
-        birth_events = SimulacionService.procesar_nacimientos(family, config)
-        eventos.extend(birth_events)
+        # 6. Resumir eventos rutinarios
+        with simulation_metrics.phase('retencion', len(family.members)):
+            SimulacionService.aplicar_retencion_eventos(family, config)
+        
+        return eventos
+    
+    # Edades donde cambia la probabilidad de muerte (tramos de edad y modificadores por estado civil)
+    CORTES_EDAD_MUERTE = (1, 18, 40, 50, 65, 70, 80, 90)
+    EDAD_MAXIMA_SIMULADA = 150
+    
+    @staticmethod
+    def _salto_geometrico(probabilidad: float) -> int:
+        """Años sin evento antes del primero, si cada año ocurre con la probabilidad indicada"""
+        if probabilidad >= 1:
+            return 0
+        return int(math.log(1.0 - random.random()) / math.log(1.0 - probabilidad))
+    
+    @staticmethod
+    def muestrear_edad_evento(edad: int, probabilidad, cortes: tuple, edad_maxima: int) -> Optional[int]:
+        """
+        Muestrea la primera edad (desde `edad`) en que ocurre un evento anual
+        
+        Equivale a tirar un dado cada año con probabilidad `probabilidad(edad)`, pero
+        salta los años sin evento: dentro de cada tramo entre cortes se avanza con un
+        salto geométrico usando la cota del tramo y se acepta con probabilidad
+        `probabilidad(edad) / cota`. La probabilidad debe ser monótona en cada tramo.
+        
+        Args:
+            edad (int): Edad desde la que se muestrea (inclusive)
+            probabilidad (callable): Probabilidad anual del evento según la edad
+            cortes (tuple): Edades donde cambia la forma de la probabilidad
+            edad_maxima (int): Última edad considerada
+            
+        Returns:
+            int o None si el evento no ocurre antes de la edad máxima
+        """
+        limites = sorted({c for c in cortes if edad < c <= edad_maxima} | {edad_maxima + 1})
+        inicio = edad
+        for fin in limites:
+            cota = max(probabilidad(inicio), probabilidad(fin - 1))
+            actual = inicio
+            while cota > 0:
+                actual += SimulacionService._salto_geometrico(cota)
+                if actual >= fin:
+                    break
+                if random.random() * cota < probabilidad(actual):
+                    return actual
+                actual += 1
+            inicio = fin
+        return None
+    
+    @staticmethod
+    def _programar_fallecimiento(planificador: EventScheduler, person: Person, year: int) -> None:
+        """Programa el año de fallecimiento de una persona a partir del año indicado"""
+        # El muestreo usa el tramo de salud actual: si cambia de tramo, se vuelve a programar
+        planificador.death_bands[id(person)] = SimulacionService.obtener_tabla_vida().health_band(
+            person.emotional_health)
+        age = person.calculate_virtual_age() + (year - planificador.current_year)
+        edad = SimulacionService.muestrear_edad_evento(
+            age, lambda a: SimulacionService.calcular_probabilidad_muerte(person, a),
+            SimulacionService.CORTES_EDAD_MUERTE, SimulacionService.EDAD_MAXIMA_SIMULADA)
+        if edad is None:
+            planificador.cancel('fallecimiento', person)
+        else:
+            planificador.schedule('fallecimiento', year + edad - age, person)
+    
+    @staticmethod
+    def _programar_busqueda_pareja(planificador: EventScheduler, person: Person, year: int,
+                                   config: SimulationConfig) -> None:
+        """Programa el próximo año en que un soltero sale a buscar pareja"""
+        age = person.calculate_virtual_age() + (year - planificador.current_year)
+        desde = max(age, config.min_marriage_age)
+        edad = SimulacionService.muestrear_edad_evento(
+            desde, lambda a: min(1.0, config.find_partner_probability * SimulacionService.factor_edad_busqueda(a)),
+            (25, 30, 35, 45), SimulacionService.EDAD_MAXIMA_SIMULADA)
+        if edad is None:
+            planificador.cancel('pareja', person)
+        else:
+            planificador.schedule('pareja', year + edad - age, person)
+    
+    @staticmethod
+    def _programar_nacimiento(planificador: EventScheduler, mother: Person, year: int,
+                              config: SimulationConfig) -> None:
+        """Programa el próximo nacimiento de una pareja (la clave es la madre) dentro de su ventana fértil"""
+        father = mother.spouse
+        offset = year - planificador.current_year
+        woman_age = mother.calculate_virtual_age() + offset
+        man_age = father.calculate_virtual_age() + offset
+        inicio = max(0, config.min_marriage_age - woman_age, config.min_marriage_age - man_age)
+        fin = min(config.max_female_fertility - woman_age, config.max_male_fertility - man_age)
+        probabilidad = min(1.0, config.birth_probability * SimulacionService.penalizacion_por_hijos(mother, father))
+        anios = SimulacionService.muestrear_edad_evento(inicio, lambda a: probabilidad, (), fin) if inicio <= fin else None
+        if anios is None:
+            planificador.cancel('nacimiento', mother)
+        else:
+            planificador.schedule('nacimiento', year + anios, mother)
+    
+    @staticmethod
+    def _programar_miembro(planificador: EventScheduler, person: Person, year: int, config: SimulationConfig) -> None:
+        """Programa los eventos iniciales de un miembro que entra al planificador"""
+        if not person.alive:
+            return
+        SimulacionService._programar_fallecimiento(planificador, person, year)
+        if person.marital_status == "Soltero/a" and not person.has_partner():
+            SimulacionService._programar_busqueda_pareja(planificador, person, year, config)
+        elif person.gender == "F" and person.has_partner():
+            SimulacionService._programar_nacimiento(planificador, person, year, config)
+    
+    @staticmethod
+    def obtener_planificador(family: Family, config: SimulationConfig) -> EventScheduler:
+        """Obtiene el planificador de eventos de la familia y programa a los miembros nuevos"""
+        planificador = family.event_scheduler
+        if planificador is None:
+            planificador = family.event_scheduler = EventScheduler()
+        planificador.current_year = family.current_year
+        
+        # Se compara por identidad y no por posición: pueden quitarse miembros de cualquier lugar
+        current = {id(person) for person in family.members}
+        for key in planificador.scheduled.keys() - current:
+            planificador.forget(planificador.scheduled[key])
+        for person in family.members:
+            if id(person) not in planificador.scheduled:
+                SimulacionService._programar_miembro(planificador, person, family.current_year, config)
+                planificador.scheduled[id(person)] = person
+        return planificador
+    
+    @staticmethod
+    def ejecutar_ciclo_por_eventos(family: Family, config: SimulationConfig) -> list:
+        """
+        Ejecuta el ciclo completo procesando solo los eventos que vencen este año
+        
+        En lugar de revisar cada año a todas las personas, se muestrea de antemano el
+        año del fallecimiento, de la próxima búsqueda de pareja y del próximo nacimiento
+        de cada pareja, y se guardan en una cola de prioridad. Al vencer, cada evento
+        se valida contra el estado actual (sigue vivo, sigue soltero...) y se
+        reprograma lo que haya cambiado: la viudez, las uniones y los cambios de tramo
+        de salud emocional vuelven a muestrear el fallecimiento y una unión nueva abre
+        la ventana de nacimientos.
+        
+        Args:
+            family (Family): Familia simulada
+            config (SimulationConfig): Configuración de la simulación
+            
+        Returns:
+            list: Mensajes de los eventos del ciclo
+        """
+        eventos = []
+        year = family.current_year
+        
+        # 1. Cumpleaños automáticos
+        with simulation_metrics.phase('cumpleanos', family.get_aggregates().living):
+            eventos.extend(SimulacionService.ejecutar_ciclo_cumpleanos(family))
+        with simulation_metrics.phase('planificacion', len(family.members) - (len(family.event_scheduler.scheduled)
+                                                                                if family.event_scheduler else 0)):
+            planificador = SimulacionService.obtener_planificador(family, config)
+        
+        # 2. Fallecimientos que vencen este año
+        vencidos = planificador.pop_due('fallecimiento', year)
+        with simulation_metrics.phase('fallecimientos', len(vencidos)):
+            for person in vencidos:
+                if not person.alive:
+                    continue
+                spouse = person.spouse if person.has_partner() else None
+                eventos.extend(SimulacionService._registrar_fallecimiento(person, family))
+                if spouse is not None:
+                    # La viudez cambia la probabilidad de muerte del cónyuge
+                    SimulacionService._programar_fallecimiento(planificador, spouse, year + 1)
+        
+        # 3. Búsquedas de pareja que vencen este año
+        vencidos = planificador.pop_due('pareja', year)
+        with simulation_metrics.phase('parejas', len(vencidos)):
+            candidatos = [p for p in vencidos
+                          if p.alive and p.marital_status == "Soltero/a" and not p.has_partner() and
+                          p.calculate_virtual_age() >= config.min_marriage_age]
+            if candidatos:
+                eventos.extend(SimulacionService._procesar_candidatos_pareja(family, config, candidatos))
+            for person in candidatos:
+                if not person.has_partner():
+                    SimulacionService._programar_busqueda_pareja(planificador, person, year + 1, config)
+                    continue
+                # El estado civil cambia la probabilidad de muerte de ambos
+                for member in (person, person.spouse):
+                    planificador.cancel('pareja', member)
+                    SimulacionService._programar_fallecimiento(planificador, member, year + 1)
+                mother = person if person.gender == "F" else person.spouse
+                SimulacionService._programar_nacimiento(planificador, mother, year, config)
+        
+        # 4. Nacimientos que vencen este año
+        vencidos = planificador.pop_due('nacimiento', year)
+        with simulation_metrics.phase('nacimientos', len(vencidos)):
+            for mother in vencidos:
+                father = mother.spouse
+                if not (mother.alive and father is not None and father.alive and father.spouse is mother):
+                    continue
+                success, message = SimulacionService.simular_nacimiento_mejorado(mother, father, family)
+                if success:
+                    eventos.append(message)
+                SimulacionService._programar_nacimiento(planificador, mother, year + 1, config)
+        
+        # Las personas agregadas durante el ciclo se programan al sincronizar en el ciclo siguiente
         
         # 5. Efectos colaterales
-        side_effects = SimulacionService.procesar_efectos_colaterales(family)
-        eventos.extend(side_effects)
+        with simulation_metrics.phase('efectos', family.get_aggregates().living):
+            eventos.extend(SimulacionService.procesar_efectos_colaterales(family))
+        
+        # 6. La salud emocional cambió en los cumpleaños y efectos: reprogramar a quien cambió de tramo
+        tabla = SimulacionService.obtener_tabla_vida()
+        with simulation_metrics.phase('salud', family.get_aggregates().living):
+            for person in family.members:
+                band = planificador.death_bands.get(id(person))
+                if band is None:
+                    continue
+                if not person.alive:
+                    del planificador.death_bands[id(person)]
+                elif tabla.health_band(person.emotional_health) != band:
+                    SimulacionService._programar_fallecimiento(planificador, person, year + 1)
+        
+        # 7. Resumir eventos rutinarios
+        with simulation_metrics.phase('retencion', len(family.members)):
+            SimulacionService.aplicar_retencion_eventos(family, config)
         
         return eventos
     
     @staticmethod
-    def calcular_probabilidad_muerte(person: Person) -> float:
-        """Calcula probabilidad de muerte basada en edad y salud"""
-        age = person.calculate_virtual_age()
+    def aplicar_retencion_eventos(family: Family, config: SimulationConfig) -> int:
+        """
+        Aplica la política de retención de eventos de la configuración
         
-        # Probabilidad base por edad
-        if age < 1:
-            base_prob = 0.005  # Mortalidad infantil
-        elif age < 18:
-            base_prob = 0.0001  # Muy baja en jóvenes
-        elif age < 50:
-            base_prob = 0.001
-        elif age < 70:
-            base_prob = 0.005
-        elif age < 80:
-            base_prob = 0.02
-        elif age < 90:
-            base_prob = 0.08
-        else:
-            base_prob = 0.15
+        Args:
+            family (Family): Familia cuyos miembros se compactan
+            config (SimulationConfig): Configuración con la política de retención
+            
+        Returns:
+            int: Cantidad de eventos resumidos en este ciclo
+        """
+        spilled = []
+        for person in family.members:
+            removed = person.compact_events(config.routine_event_categories, config.max_routine_events)
+            if removed and config.event_spill_path:
+                spilled.extend((person.cedula, event) for event in removed)
+        
+        if spilled:
+            try:
+                with open(config.event_spill_path, 'a', encoding='utf-8') as f:
+                    for cedula, event in spilled:
+                        f.write(json.dumps({'cedula': cedula, **event.to_dict()}, ensure_ascii=False) + "\n")
+            except OSError as e:
+                logger.warning(f"No se pudieron guardar los eventos resumidos: {e}")
+        
+        return len(spilled)
+    
+    _tabla_vida = None  # Tabla de vida en uso (por defecto reproduce las reglas originales)
+    
+    @staticmethod
+    def obtener_tabla_vida(config: SimulationConfig = None) -> LifeTable:
+        """
+        Obtiene la tabla de vida de la simulación
         
-        # Modificadores por salud emocional
-        health_modifier = 1.0
-        if person.emotional_health < 30:
-            health_modifier = 1.5  # 50% más probabilidad
-        elif person.emotional_health < 50:
-            health_modifier = 1.2  # 20% más probabilidad
-        elif person.emotional_health > 80:
-            health_modifier = 0.8  # 20% menos probabilidad
-        
-        # Modificador por estado civil
-        if person.marital_status == "Viudo/a" and age > 65:
-            health_modifier *= 1.3
-        elif person.marital_status == "Soltero/a" and age > 40:
-            years_single = age - 25
-            health_modifier *= (1 + years_single * 0.01)
-        
-        return min(0.3, base_prob * health_modifier)  # Máximo 30%
+        Si la configuración indica un CSV (config.life_table_path) se carga esa tabla;
+        si no, se usa la tabla por defecto con los tramos de edad y modificadores originales.
+        """
+        ruta = config.life_table_path if config is not None else None
+        tabla = SimulacionService._tabla_vida
+        if tabla is None or (config is not None and tabla.source != ruta):
+            tabla = LifeTable.default()
+            if ruta:
+                try:
+                    tabla = LifeTable.from_csv(ruta)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"No se pudo cargar la tabla de vida {ruta}: {e}")
+                    tabla.source = ruta  # No reintentar en cada ciclo
+            SimulacionService._tabla_vida = tabla
+        return tabla
+    
+    _tablas_lineales = {}  # probabilidad base -> tabla lineal de ejecutar_ciclo_simulacion
+    
+    @staticmethod
+    def obtener_tabla_lineal(config: SimulationConfig) -> LifeTable:
+        """Tabla lineal (base más 1% por año sobre los 60) de la configuración, creada una sola vez"""
+        tablas = SimulacionService._tablas_lineales
+        tabla = tablas.get(config.death_probability_base)
+        if tabla is None:
+            tabla = tablas[config.death_probability_base] = LifeTable.linear(
+                config.death_probability_base, start_age=60, slope=0.01)
+        return tabla
+    
+    @staticmethod
+    def calcular_probabilidad_muerte(person: Person, age: int = None) -> float:
+        """Calcula probabilidad de muerte basada en edad y salud (opcionalmente a otra edad)"""
+        return SimulacionService.obtener_tabla_vida().probability(person, age)
 
     @staticmethod
     def encontrar_tutor_legal_avanzado(child: Person, family: Family) -> tuple:
@@ -883,6 +1321,7 @@ class SimulacionService:
         # 1. Viudez del cónyuge
         if deceased.spouse and deceased.spouse.alive:
             viudez_events = SimulacionService.procesar_efectos_viudez(deceased.spouse, deceased)
+            family.record_separation(deceased.spouse)
             eventos.extend(viudez_events)
         
         # 2. Huérfanos menores de edad
@@ -914,43 +1353,55 @@ class SimulacionService:
         """Procesa fallecimientos probabilísticos"""
         eventos = []
         
-        for person in family.get_living_members().copy():
-            death_prob = SimulacionService.calcular_probabilidad_muerte(person)
-            
-            if random.random() < death_prob:
-                # Procesar fallecimiento
-                person.alive = False
-                person.death_date = datetime.datetime.now().strftime("%Y-%m-%d")
-                person.register_life_event('death', f'a los {person.calculate_virtual_age()} años', person.death_date)
-                
-                # Registrar en eventos
-                eventos.append(f"⚰️ {person.first_name} {person.last_name} ha fallecido a los {person.calculate_virtual_age()} años")
-                
-                # Procesar efectos colaterales
-                if person.spouse and person.spouse.alive:
-                    viudez_events = SimulacionService.procesar_efectos_viudez(person.spouse, person)
-                    eventos.extend(viudez_events)
+        vivos = family.get_living_members()
+        probabilidades = SimulacionService.obtener_tabla_vida().probabilities(vivos)
+        
+        for person, death_prob in zip(vivos, probabilidades):
+            if person.alive and random.random() < death_prob:
+                eventos.extend(SimulacionService._registrar_fallecimiento(person, family))
+        
+        return eventos
+    
+    @staticmethod
+    def _registrar_fallecimiento(person: Person, family: Family) -> list:
+        """Registra un fallecimiento del ciclo y procesa viudez y menores huérfanos"""
+        eventos = []
+        
+        # Procesar fallecimiento
+        person.alive = False
+        person.death_date = datetime.datetime.now().strftime("%Y-%m-%d")
+        person.register_life_event('death', f'a los {person.calculate_virtual_age()} años', person.death_date)
+        family.record_death(person)
+        
+        # Registrar en eventos
+        eventos.append(f"⚰️ {person.first_name} {person.last_name} ha fallecido a los {person.calculate_virtual_age()} años")
+        
+        # Procesar efectos colaterales
+        if person.spouse and person.spouse.alive:
+            viudez_events = SimulacionService.procesar_efectos_viudez(person.spouse, person)
+            family.record_separation(person.spouse)
+            eventos.extend(viudez_events)
+        
+        # Manejar hijos menores - SISTEMA MEJORADO
+        menores_huerfanos = []
+        for child in person.children:
+            if child.alive and child.calculate_virtual_age() < 18:
+                # Verificar si ambos padres han fallecido
+                padre_muerto = not child.father or not child.father.alive
+                madre_muerta = not child.mother or not child.mother.alive
                 
-                # Manejar hijos menores - SISTEMA MEJORADO
-                menores_huerfanos = []
-                for child in person.children:
-                    if child.alive and child.calculate_virtual_age() < 18:
-                        # Verificar si ambos padres han fallecido
-                        padre_muerto = not child.father or not child.father.alive
-                        madre_muerta = not child.mother or not child.mother.alive
-                        
-                        if padre_muerto and madre_muerta:
-                            menores_huerfanos.append(child)
-                            
-                # Procesar reasignación de tutores para todos los menores huérfanos
-                for menor in menores_huerfanos:
-                    tutor_success, tutor_msg = SimulacionService.encontrar_tutor_legal_avanzado(menor, family)
-                    eventos.append(tutor_msg)
+                if padre_muerto and madre_muerta:
+                    menores_huerfanos.append(child)
                     
-                    # Registrar impacto emocional en el menor
-                    impacto_emocional = random.randint(30, 50)
-                    menor.emotional_health = max(10, menor.emotional_health - impacto_emocional)
-                    menor.register_life_event('trauma', 'pérdida de ambos padres', datetime.datetime.now().strftime("%Y-%m-%d"))
+        # Procesar reasignación de tutores para todos los menores huérfanos
+        for menor in menores_huerfanos:
+            tutor_success, tutor_msg = SimulacionService.encontrar_tutor_legal_avanzado(menor, family)
+            eventos.append(tutor_msg)
+            
+            # Registrar impacto emocional en el menor
+            impacto_emocional = random.randint(30, 50)
+            menor.emotional_health = max(10, menor.emotional_health - impacto_emocional)
+            menor.register_life_event('trauma', 'pérdida de ambos padres', datetime.datetime.now().strftime("%Y-%m-%d"))
         
         return eventos
         
@@ -969,28 +1420,48 @@ class SimulacionService:
         candidatos_activos = []
         for person in solteros:
             age = person.calculate_virtual_age()
-            # Probabilidad aumenta con la edad hasta cierto punto
-            age_factor = 1.0
-            if age >= 25:
-                age_factor = 1.5
-            if age >= 30:
-                age_factor = 2.0
-            if age >= 35:
-                age_factor = 2.5
-            if age >= 45:
-                age_factor = 1.5  # Disminuye después de 45
-            
-            adjusted_probability = config.find_partner_probability * age_factor
+            adjusted_probability = config.find_partner_probability * SimulacionService.factor_edad_busqueda(age)
             
             if random.random() < adjusted_probability:
                 candidatos_activos.append(person)
         
+        return SimulacionService._procesar_candidatos_pareja(family, config, candidatos_activos)
+    
+    @staticmethod
+    def factor_edad_busqueda(age: int) -> float:
+        """Multiplicador de la probabilidad de buscar pareja según la edad"""
+        # Probabilidad aumenta con la edad hasta cierto punto
+        age_factor = 1.0
+        if age >= 25:
+            age_factor = 1.5
+        if age >= 30:
+            age_factor = 2.0
+        if age >= 35:
+            age_factor = 2.5
+        if age >= 45:
+            age_factor = 1.5  # Disminuye después de 45
+        return age_factor
+    
+    @staticmethod
+    def _procesar_candidatos_pareja(family: Family, config: SimulationConfig, candidatos_activos: list) -> list:
+        """Intenta formar pareja (externa o interna) para los solteros que buscan en este ciclo"""
+        eventos = []
+        
+        # Índice de personas disponibles por género y franja de edad
+        indice = SimulacionService.construir_indice_parejas(family, config.min_marriage_age)
+        
+        # Personas que buscarán pareja interna en el mercado matrimonial (si está activo)
+        buscando_pareja_interna = []
+        
         # Procesar cada candidato
         for person in candidatos_activos:
+            if person.has_partner():
+                continue
             # Priorizar generación de personas externas (85% probabilidad)
             if random.random() < 0.85:
                 success = SimulacionService.generar_persona_externa_para_pareja(person, family)
                 if success:
+                    indice.remove(person)
                     partner = person.spouse
                     compatibility = SimulacionService.calcular_compatibilidad_total(person, partner)
                     current_date = f"{family.current_year}-01-01"
@@ -1001,22 +1472,22 @@ class SimulacionService:
                     eventos.append(f"💍 {person.first_name} se casó con {partner.first_name} {partner.last_name} (persona externa, compatibilidad: {compatibility['total']:.1f}%)")
                     continue
             
+            # Con mercado matrimonial, las parejas internas se resuelven juntas al final
+            if config.use_marriage_market:
+                buscando_pareja_interna.append(person)
+                continue
+            
             # Buscar pareja dentro de la familia (15% probabilidad)
-            possible_partners = []
-            for potential in family.get_living_members():
-                if (potential != person and 
-                    not potential.has_partner() and
-                    potential.gender != person.gender and
-                    potential.calculate_virtual_age() >= config.min_marriage_age):
-                    
-                    compatibility = SimulacionService.calcular_compatibilidad_total(person, potential)
-                    if compatibility['compatible']:
-                        possible_partners.append((potential, compatibility['total']))
+            # Solo se revisan las franjas de edad compatibles con al menos 2 intereses en común
+            simulation_metrics.count('consultas_indice_parejas')
+            possible_partners = [p for p in indice.candidates(person, min_common_interests=2)
+                                 if p.alive and not p.has_partner()]
+            scores = SimulacionService.calcular_compatibilidad_lote(person, possible_partners)
+            best = max(range(len(possible_partners)), key=lambda i: scores[i], default=None)
             
-            if possible_partners:
-                # Elegir al más compatible
-                possible_partners.sort(key=lambda x: x[1], reverse=True)
-                partner, compatibility_score = possible_partners[0]
+            # Elegir al más compatible (mínimo 50 puntos)
+            if best is not None and scores[best] >= 50:
+                partner, compatibility_score = possible_partners[best], float(scores[best])
                 
                 # ✅ CORRECCIÓN: Importar RelacionService LOCALMENTE para evitar importación circular
                 from services.relacion_service import RelacionService
@@ -1024,22 +1495,124 @@ class SimulacionService:
                 # Registrar pareja
                 success, message = RelacionService.registrar_pareja(family, person.cedula, partner.cedula, es_simulacion=True)
                 if success:
+                    indice.remove(person)
+                    indice.remove(partner)
                     current_date = f"{family.current_year}-01-01"
                     person.register_life_event('marriage', f'con {partner.first_name} {partner.last_name}', current_date)
                     partner.register_life_event('marriage', f'con {person.first_name} {person.last_name}', current_date)
                     eventos.append(f"💍 {person.first_name} y {partner.first_name} se casaron (familia interna, compatibilidad: {compatibility_score:.1f}%)")
         
+        if buscando_pareja_interna:
+            eventos.extend(SimulacionService.procesar_mercado_matrimonial(family, buscando_pareja_interna, indice))
+        
         return eventos
     
     @staticmethod
-    def procesar_nacimientos(family: Family, config: SimulationConfig) -> list:
-        """Procesa nacimientos de parejas"""
+    def procesar_mercado_matrimonial(family: Family, buscando: list, indice: MatchingIndex) -> list:
+        """
+        Forma las parejas internas del ciclo con emparejamiento estable (Gale-Shapley)
+        
+        Una pareja es posible si al menos uno de los dos está buscando en este ciclo,
+        ambos están disponibles en el índice y cumplen las reglas de compatibilidad
+        (50 puntos o más, compatibles genéticamente y 2 intereses en común). Los
+        empates se resuelven por cédula, así que el resultado no depende del orden
+        en que llegaron las personas.
+        
+        Args:
+            family (Family): Familia donde se registran las parejas
+            buscando (list): Personas que buscan pareja interna en este ciclo
+            indice (MatchingIndex): Índice de personas disponibles
+            
+        Returns:
+            list: Mensajes de las uniones registradas
+        """
+        # 1. Grafo disperso de compatibilidad: (hombre, mujer) -> puntaje
+        aristas = {}
+        personas = {}
+        for person in buscando:
+            if person.has_partner() or person not in indice:
+                continue
+            simulation_metrics.count('consultas_indice_parejas')
+            candidatos = [c for c in indice.candidates(person, min_common_interests=2)
+                          if c.alive and not c.has_partner()]
+            puntajes = SimulacionService.calcular_compatibilidad_lote(person, candidatos, desglose=True)
+            for candidato, fila in zip(candidatos, puntajes):
+                total = int(sum(fila))
+                if total < 50 or fila[3] <= 0:
+                    continue
+                hombre, mujer = (person, candidato) if person.gender == 'M' else (candidato, person)
+                personas[id(hombre)] = hombre
+                personas[id(mujer)] = mujer
+                aristas[(id(hombre), id(mujer))] = total
+        
+        if not aristas:
+            return []
+        
+        # 2. Listas de preferencias ordenadas por puntaje (desempate por cédula)
+        preferencias = {}
+        for (id_hombre, id_mujer), total in aristas.items():
+            preferencias.setdefault(id_hombre, []).append((-total, personas[id_mujer].cedula, id_mujer))
+        for opciones in preferencias.values():
+            opciones.sort()
+        
+        def rango_para_mujer(id_mujer, id_hombre):
+            return (-aristas[(id_hombre, id_mujer)], personas[id_hombre].cedula)
+        
+        # 3. Gale-Shapley: los hombres proponen en orden de preferencia
+        libres = deque(sorted(preferencias, key=lambda i: personas[i].cedula))
+        siguiente = {id_hombre: 0 for id_hombre in preferencias}
+        comprometida_con = {}  # id(mujer) -> id(hombre)
+        while libres:
+            id_hombre = libres.popleft()
+            opciones = preferencias[id_hombre]
+            if siguiente[id_hombre] >= len(opciones):
+                continue
+            _, _, id_mujer = opciones[siguiente[id_hombre]]
+            siguiente[id_hombre] += 1
+            actual = comprometida_con.get(id_mujer)
+            if actual is None:
+                comprometida_con[id_mujer] = id_hombre
+            elif rango_para_mujer(id_mujer, id_hombre) < rango_para_mujer(id_mujer, actual):
+                comprometida_con[id_mujer] = id_hombre
+                libres.append(actual)
+            else:
+                libres.append(id_hombre)
+        
+        # 4. Registrar las uniones en orden estable
+        from services.relacion_service import RelacionService
+        
         eventos = []
+        current_date = f"{family.current_year}-01-01"
+        uniones = sorted(((personas[h], personas[m]) for m, h in comprometida_con.items()),
+                         key=lambda pareja: pareja[0].cedula)
+        for hombre, mujer in uniones:
+            success, _ = RelacionService.registrar_pareja(family, hombre.cedula, mujer.cedula, es_simulacion=True)
+            if not success:
+                continue
+            indice.remove(hombre)
+            indice.remove(mujer)
+            hombre.register_life_event('marriage', f'con {mujer.first_name} {mujer.last_name}', current_date)
+            mujer.register_life_event('marriage', f'con {hombre.first_name} {hombre.last_name}', current_date)
+            puntaje = aristas[(id(hombre), id(mujer))]
+            eventos.append(f"💍 {hombre.first_name} y {mujer.first_name} se casaron (mercado matrimonial, compatibilidad: {puntaje:.1f}%)")
         
-        # Obtener parejas fértiles
+        return eventos
+    
+    @staticmethod
+    def inicializar_semilla(config: SimulationConfig) -> None:
+        """Fija la semilla aleatoria de la simulación si la configuración define una"""
+        if config.random_seed is not None:
+            random.seed(config.random_seed)
+            # La reserva externa se recrea con la misma semilla (relleno síncrono)
+            SimulacionService._pool_externo = None
+            SimulacionService.obtener_pool_externo(config)
+    
+    @staticmethod
+    def obtener_parejas_fertiles(personas: list, config: SimulationConfig) -> list:
+        """Devuelve las parejas (madre, padre) vivas y en edad fértil entre las personas indicadas"""
         parejas_fertiles = []
-        for person in family.get_living_members():
-            if (person.has_partner() and person.spouse and person.spouse.alive and
+        for person in personas:
+            if (person.alive and person.has_partner() and person.spouse and person.spouse.alive and
                 person.gender == "F"):  # Solo procesar desde la mujer para evitar duplicados
                 
                 woman_age = person.calculate_virtual_age()
@@ -1048,23 +1621,37 @@ class SimulacionService:
                 if (config.min_marriage_age <= woman_age <= config.max_female_fertility and
                     config.min_marriage_age <= man_age <= config.max_male_fertility):
                     parejas_fertiles.append((person, person.spouse))
-        
-        def penalizacion_por_hijos(mother: Person, father: Person) -> float:
-            """Devuelve un multiplicador (0-1) que reduce la probabilidad de tener más hijos a medida que ya tienen más."""
-            # Contar hijos en común
-            hijos_comunes = 0
-            for child in mother.children:
-                if child in father.children:
-                    hijos_comunes += 1
-
-            # Penalización progresiva: 0 hijos -> 1.0, 1 hijo -> 0.8, 2 -> 0.6, 3 -> 0.4, >=4 -> 0.2
-            mapping = {0: 1.0, 1: 0.8, 2: 0.6, 3: 0.4}
-            factor = mapping.get(hijos_comunes, 0.2)
-            # No bajar de un piso mínimo para permitir rare births
-            return max(0.05, factor)
+        return parejas_fertiles
+    
+    @staticmethod
+    def obtener_registro_fertil(family: Family, config: SimulationConfig):
+        """Obtiene el registro de parejas fértiles de la familia con los límites de edad de la configuración"""
+        return family.get_fertile_registry(config.min_marriage_age, config.max_female_fertility,
+                                           config.max_male_fertility)
+    
+    @staticmethod
+    def penalizacion_por_hijos(mother: Person, father: Person, hijos_comunes: int = None) -> float:
+        """Devuelve un multiplicador (0-1) que reduce la probabilidad de tener más hijos a medida que ya tienen más."""
+        # Contar hijos en común (si no vienen ya contados del registro de parejas)
+        if hijos_comunes is None:
+            hijos_comunes = sum(1 for child in mother.children if child.father is father)
 
-        for mother, father in parejas_fertiles:
-            factor = penalizacion_por_hijos(mother, father)
+        # Penalización progresiva: 0 hijos -> 1.0, 1 hijo -> 0.8, 2 -> 0.6, 3 -> 0.4, >=4 -> 0.2
+        mapping = {0: 1.0, 1: 0.8, 2: 0.6, 3: 0.4}
+        factor = mapping.get(hijos_comunes, 0.2)
+        # No bajar de un piso mínimo para permitir rare births
+        return max(0.05, factor)
+    
+    @staticmethod
+    def procesar_nacimientos(family: Family, config: SimulationConfig) -> list:
+        """Procesa nacimientos de parejas"""
+        eventos = []
+        
+        # Parejas fértiles del registro que se mantiene entre ciclos
+        registro = SimulacionService.obtener_registro_fertil(family, config)
+        
+        for mother, father, hijos_comunes in registro.active_couples():
+            factor = SimulacionService.penalizacion_por_hijos(mother, father, hijos_comunes)
             effective_prob = config.birth_probability * factor
             if random.random() < effective_prob:
                 success, message = SimulacionService.simular_nacimiento_mejorado(mother, father, family)
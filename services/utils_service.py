@@ -35,9 +35,9 @@ def verificar_requisitos_union(person1: Person, person2: Person, family: Family)
         return False, "Incompatibilidad genética detectada. No se recomienda la unión por riesgos en descendencia"
     
     # 5. Verificar compatibilidad emocional (intereses en común)
-    common_interests = set(person1.interests) & set(person2.interests)
-    if len(common_interests) < 2:
-        return False, f"Se requieren al menos 2 intereses en común. Tienen {len(common_interests)} interés(es) compartido(s)"
+    common_interests = (person1.interest_mask & person2.interest_mask).bit_count()
+    if common_interests < 2:
+        return False, f"Se requieren al menos 2 intereses en común. Tienen {common_interests} interés(es) compartido(s)"
     
     # 6. Verificar índice de compatibilidad
     compatibility = SimulacionService.calcular_compatibilidad_total(person1, person2)
@@ -0,0 +1,173 @@
+# utils/canvas_renderer.py
+"""Dibujo incremental (modo retenido) sobre un canvas de Tkinter.
+
+En lugar de borrar y volver a crear todo el canvas en cada cuadro, el dibujo se
+describe como una lista de ítems con una clave estable (por ejemplo la cédula
+de la persona y la parte de la tarjeta). El renderizador recuerda qué ítem del
+canvas corresponde a cada clave y, al aplicar un cuadro nuevo, solo crea, mueve
+(canvas.coords) o actualiza (itemconfigure) los ítems que cambiaron, y elimina
+los que ya no están.
+"""
+from typing import Dict, Hashable, Tuple
+
+# Capas de dibujo, de abajo hacia arriba
+LAYERS = ("conexion", "tarjeta", "leyenda")
+
+
+class RenderList:
+    """Lista de dibujo de un cuadro: clave -> (tipo, coordenadas, opciones)"""
+
+    def __init__(self):
+        self.items: Dict[Hashable, Tuple[str, tuple, dict]] = {}
+
+    def add(self, key: Hashable, kind: str, coords, **options) -> None:
+        self.items[key] = (kind, tuple(coords), options)
+
+    def create_line(self, key: Hashable, *coords, **options) -> None:
+        self.add(key, "line", coords, **options)
+
+    def create_rectangle(self, key: Hashable, *coords, **options) -> None:
+        self.add(key, "rectangle", coords, **options)
+
+    def create_oval(self, key: Hashable, *coords, **options) -> None:
+        self.add(key, "oval", coords, **options)
+
+    def create_text(self, key: Hashable, *coords, **options) -> None:
+        self.add(key, "text", coords, **options)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class ItemGrid:
+    """Índice espacial de claves por celda para consultar lo que cae en una región"""
+
+    def __init__(self, cell_size: float = 400.0):
+        self.cell_size = cell_size
+        self._cells = {}  # (columna, fila) -> [claves]
+
+    def _cells_in(self, x1, y1, x2, y2):
+        size = self.cell_size
+        for col in range(int(x1 // size), int(x2 // size) + 1):
+            for row in range(int(y1 // size), int(y2 // size) + 1):
+                yield col, row
+
+    def add(self, key: Hashable, x1: float, y1: float, x2: float, y2: float) -> None:
+        for cell in self._cells_in(min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)):
+            self._cells.setdefault(cell, []).append(key)
+
+    def query(self, x1: float, y1: float, x2: float, y2: float) -> list:
+        """Claves de las celdas que tocan la región, sin repetir y en orden de registro"""
+        found = {}
+        for cell in self._cells_in(x1, y1, x2, y2):
+            for key in self._cells.get(cell, ()):
+                found[key] = None
+        return list(found)
+
+
+def item_bbox(spec: Tuple[str, tuple, dict]) -> Tuple[float, float, float, float]:
+    """Rectángulo aproximado que ocupa un ítem de la lista de dibujo"""
+    _, coords, _ = spec
+    xs, ys = coords[0::2], coords[1::2]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+class RetainedCanvasRenderer:
+    """Aplica listas de dibujo a un canvas tocando solo los ítems que cambiaron"""
+
+    def __init__(self):
+        self.canvas = None
+        self.zoom = 1.0          # Escala aplicada a las coordenadas del canvas
+        self.last_changes = {}   # Resumen del último cuadro aplicado
+        self._items = {}         # clave -> id del ítem en el canvas
+        self._specs = {}         # clave -> (tipo, coordenadas, opciones) ya dibujado
+        self._sentinel = None    # Ítem oculto para detectar si alguien limpió el canvas
+
+    def attach(self, canvas) -> bool:
+        """
+        Prepara el canvas para dibujar sobre él
+
+        Returns:
+            bool: True si se empezó de cero (canvas nuevo o limpiado desde afuera)
+        """
+        if (self.canvas is canvas and self._sentinel is not None
+                and canvas.type(self._sentinel)):
+            return False
+        canvas.delete("all")
+        self.canvas = canvas
+        self._items.clear()
+        self._specs.clear()
+        self._sentinel = canvas.create_line(0, 0, 0, 0, state="hidden")
+        return True
+
+    def clear(self) -> None:
+        """Elimina todos los ítems dibujados por el renderizador"""
+        if self.canvas is None:
+            return
+        for item in self._items.values():
+            self.canvas.delete(item)
+        self._items.clear()
+        self._specs.clear()
+
+    def item(self, key: Hashable):
+        """Id del ítem del canvas que corresponde a una clave (None si no está dibujado)"""
+        return self._items.get(key)
+
+    def set_zoom(self, zoom: float) -> None:
+        """Cambia la escala y reubica los ítems materializados (no todo el canvas)"""
+        if zoom <= 0 or abs(zoom - self.zoom) < 1e-9:
+            return
+        self.zoom = zoom
+        if self.canvas is not None:
+            for key, item in self._items.items():
+                self.canvas.coords(item, *self._scaled(self._specs[key][1]))
+
+    def _scaled(self, coords: tuple) -> tuple:
+        if self.zoom == 1.0:
+            return coords
+        return tuple(c * self.zoom for c in coords)
+
+    def apply(self, render: RenderList) -> Dict[str, int]:
+        """
+        Lleva el canvas al estado descrito por la lista de dibujo
+
+        Returns:
+            dict: Cantidad de ítems creados, movidos, actualizados y eliminados
+        """
+        canvas = self.canvas
+        created = moved = restyled = deleted = 0
+
+        for key, spec in render.items.items():
+            old = self._specs.get(key)
+            if old == spec:
+                continue
+            kind, coords, options = spec
+            item = self._items.get(key)
+            # Un ítem nuevo, de otro tipo o que perdió opciones se vuelve a crear
+            if old is None or old[0] != kind or not old[2].keys() <= options.keys():
+                if item is not None:
+                    canvas.delete(item)
+                self._items[key] = getattr(canvas, f"create_{kind}")(*self._scaled(coords), **options)
+                created += 1
+                continue
+            if old[1] != coords:
+                canvas.coords(item, *self._scaled(coords))
+                moved += 1
+            if old[2] != options:
+                canvas.itemconfigure(item, **{name: value for name, value in options.items()
+                                              if old[2].get(name) != value})
+                restyled += 1
+
+        for key in self._specs.keys() - render.items.keys():
+            canvas.delete(self._items.pop(key))
+            deleted += 1
+
+        self._specs = dict(render.items)
+        if created:
+            # Los ítems nuevos quedan arriba: restaurar el orden de las capas
+            for layer in LAYERS:
+                canvas.tag_raise(layer)
+
+        self.last_changes = {'creados': created, 'movidos': moved,
+                             'actualizados': restyled, 'eliminados': deleted}
+        return self.last_changes
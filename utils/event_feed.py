@@ -0,0 +1,60 @@
+# utils/event_feed.py
+"""Cola de eventos entre el hilo de simulación y la interfaz.
+
+El hilo de simulación no debe tocar widgets de Tkinter: deja los eventos de
+cada ciclo en esta cola (de a lote, con una sola toma del candado) y la
+interfaz la vacía a ritmo fijo con un `after`, insertando todo lo pendiente de
+una vez. La cola es un buffer circular: si la interfaz se atrasa, se descartan
+los eventos más viejos y se cuenta cuántos se perdieron.
+"""
+import datetime
+import threading
+from collections import deque
+from typing import Iterable, List, Tuple
+
+
+class EventFeed:
+    """Buffer circular de eventos pendientes, seguro entre hilos"""
+
+    def __init__(self, maxlen: int = 1000):
+        """
+        Args:
+            maxlen (int): Máximo de eventos pendientes antes de descartar los más viejos
+        """
+        self._pending = deque(maxlen=maxlen)
+        self._dropped = 0  # Eventos descartados desde el último drain()
+        self._lock = threading.Lock()
+
+    def extend(self, events: Iterable[str]) -> None:
+        """Agrega un lote de eventos con la hora actual"""
+        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+        formatted = [f"[{timestamp}] {event}" for event in events]
+        with self._lock:
+            overflow = len(self._pending) + len(formatted) - self._pending.maxlen
+            if overflow > 0:
+                self._dropped += overflow
+            self._pending.extend(formatted)
+
+    def append(self, event: str) -> None:
+        """Agrega un solo evento"""
+        self.extend((event,))
+
+    def drain(self) -> Tuple[List[str], int]:
+        """
+        Retira todos los eventos pendientes
+
+        Returns:
+            tuple: (eventos en orden de llegada, cantidad descartada por desborde)
+        """
+        with self._lock:
+            events = list(self._pending)
+            dropped = self._dropped
+            self._pending.clear()
+            self._dropped = 0
+        return events, dropped
+
+    def clear(self) -> None:
+        """Descarta los eventos pendientes"""
+        with self._lock:
+            self._pending.clear()
+            self._dropped = 0
@@ -217,4 +217,6 @@ class GedcomParser:
                 if "Casado" not in person.spouse.marital_status:
                     person.spouse.marital_status = "Casado/a"
         
+        # Las correcciones anteriores modifican personas directamente
+        family.invalidate_indexes()
         return family
\ No newline at end of file
@@ -3,630 +3,709 @@ import networkx as nx
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import tkinter as tk
-from typing import Dict, List, Tuple
+from typing import Dict, Tuple
 import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.canvas_renderer import ItemGrid, RenderList, RetainedCanvasRenderer, item_bbox
+from utils.segment_grid import SegmentGrid
+from utils.tree_layout import SubtreeLayoutCache, assign_levels, compute_layout
+
+CARD_WIDTH = 130   # Ancho de la tarjeta de una persona
+CARD_HEIGHT = 85   # Alto de la tarjeta de una persona
+
 
 class FamilyGraphVisualizer:
     def __init__(self):
         self.G = nx.DiGraph()
         self.ego_cedula = None  # Para futuras mejoras
         self.position_cache = {}  # Caché para mantener posiciones estables
-        self.family_structure_hash = None  # Para detectar cambios estructurales
-
-    def build_family_graph(self, family) -> nx.DiGraph:
-        """Construye el grafo familiar a partir de los miembros"""
-        self.G.clear()
-
-        # Agregar todos los miembros como nodos
-        for person in family.members:
-            self.G.add_node(
-                person.cedula,
-                label=f"{person.first_name} {person.last_name}",
-                alive=person.alive,
-                gender=person.gender,
-                marital_status=person.marital_status
-            )
-
-        # Agregar relaciones familiares
-        for person in family.members:
-            # Relaciones padre-hijo (SOLO una dirección: padre → hijo)
-            if person.father and person.father.cedula in [p.cedula for p in family.members]:
-                self.G.add_edge(person.father.cedula, person.cedula, relationship="parent")
-            if person.mother and person.mother.cedula in [p.cedula for p in family.members]:
-                self.G.add_edge(person.mother.cedula, person.cedula, relationship="parent")
-
-            # Relación de pareja (bidireccional, pero solo agregar una vez)
-            if person.spouse and person.spouse.cedula in [p.cedula for p in family.members]:
-                # Solo agregar si no existe ya (evita duplicados)
-                if not self.G.has_edge(person.cedula, person.spouse.cedula) and not self.G.has_edge(person.spouse.cedula, person.cedula):
-                    self.G.add_edge(person.cedula, person.spouse.cedula, relationship="spouse")
-
-
+        self._layout_key = None   # Clave (familia, versión estructural, vista) del caché de posiciones
+        self.renderer = RetainedCanvasRenderer()  # Dibujo incremental del canvas
+        self._people = {}  # cédula -> persona del último dibujo (para los eventos del canvas)
+        self._source_family = None  # Familia real del último dibujo (el cuadro puede venir de una copia)
+
+        # Dibujo según lo visible: solo se materializa la región visible más un margen
+        self.viewport_margin = 300  # Margen en píxeles de pantalla alrededor de lo visible
+        self.box_zoom = 0.7  # Bajo este zoom las tarjetas se dibujan como rectángulos sin texto
+        self.dot_zoom = 0.4  # Bajo este zoom las tarjetas se dibujan como puntos
+        self._frame = None         # Último cuadro calculado (posiciones, conexiones e índices)
+        self._materialized = None  # (región del layout, nivel de detalle) ya dibujados
+
+        # Cálculo en segundo plano (request_draw): gana siempre el pedido más reciente
+        self._executor = None
+        self._draw_lock = threading.Lock()     # Pedidos, cuadro listo y estado de la vista
+        self._compute_lock = threading.Lock()  # Un cálculo a la vez: los cachés solo se tocan dentro
+        self._draw_request = None   # (familia, canvas, on_applied) pendiente de calcular
+        self._computing = False
+        self._ready = None          # (generación, cuadro, canvas, on_applied) listo para aplicar
+        self._generation = 0
+        self._applied_generation = 0
+
+        # Vista colapsable: en familias grandes solo se muestra el vecindario del Ego
+        self.collapse_threshold = 300  # Con más miembros que esto se colapsan las ramas lejanas
+        self.focus_generations = 3     # Generaciones alrededor del Ego que se muestran
+        self._expanded = set()         # Cédulas cuyas ramas ocultas se expandieron
+        self._collapsed = set()        # Cédulas cuyos descendientes se ocultaron a pedido
+        self.layout_cache = SubtreeLayoutCache()  # Formas de subárboles ya ubicados
+        self._view_version = 0         # Aumenta al expandir o colapsar una rama
+        self._view = (0, frozenset(), frozenset())  # (versión, expandidas, colapsadas) del cálculo en curso
+        self._visible_cache = None     # (clave de la vista, resultado de _visible_members)
+        self._routing_cache = None     # (clave del layout, (conexiones, índice espacial))
+        self._redraw = None            # Repite el último dibujo (al expandir o colapsar)
+
+    def build_family_graph(self, family, members=None) -> nx.DiGraph:
+        """
+        Obtiene el grafo familiar a partir del grafo que mantiene la familia
 
+        La familia actualiza su grafo con cada cambio de relaciones; aquí solo se
+        copia con los datos actuales de cada persona (O(n + m), sin reconstruir).
+        Con members se copian solo esas personas (la parte visible del árbol).
+        """
+        nodes = None if members is None else [p.cedula for p in members]
+        self.G = family.get_family_graph().snapshot(nodes)
         return self.G
 
-    def calculate_hierarchical_layout(self, family) -> Dict[str, Tuple[float, float]]:
+    def calculate_hierarchical_layout(self, family, members=None) -> Dict[str, Tuple[float, float]]:
         """Calcula posiciones jerárquicas mejoradas con posicionamiento optimizado de cónyuges
-        MANTENIENDO POSICIONES ESTABLES que no cambian por estado de vida"""
-        
-        levels = self._assign_levels(family)
+        MANTENIENDO POSICIONES ESTABLES que no cambian por estado de vida
+
+        Con members solo se ubican esas personas (la parte visible del árbol).
+        Las posiciones se reutilizan mientras no cambien la versión estructural de
+        la familia ni la vista (comparación O(1)); al cambiar, los subárboles que
+        siguen iguales conservan su forma y solo se reubican los afectados."""
         
-        # Debug: Verificar niveles asignados
-        print("\n📊 DEPURACIÓN DE NIVELES:")
-        for person in family.members:
-            parent_info = f"Padre: {person.father.get_full_name() if person.father else 'N/A'}, Madre: {person.mother.get_full_name() if person.mother else 'N/A'}"
-            children_info = f"Hijos: {[c.get_full_name() for c in person.children] if person.children else 'N/A'}"
-            print(f"  🟦 {person.get_full_name()} (ID: {person.cedula}) - Nivel: {levels.get(person.cedula, 'SIN_NIVEL')} | {parent_info} | {children_info}")
-        print("📊 FIN DEPURACIÓN DE NIVELES\n")
+        members = family.members if members is None else members
+        layout_key = self._view_key(family)
 
+        # Si la estructura y la vista no cambiaron, usar posiciones del caché
+        if self._layout_key == layout_key and self.position_cache:
+            return self.position_cache.copy()
+
+        levels = self._assign_levels(family, members)
         if not levels:
             return {}
 
-        # Crear hash de la estructura familiar (sin considerar estado de vida)
-        structure_elements = []
-        for person in family.members:
-            # Solo incluir elementos estructurales, no el estado de vida
-            elements = [
-                person.cedula,
-                person.father.cedula if person.father else None,
-                person.mother.cedula if person.mother else None,
-                person.spouse.cedula if person.spouse else None,
-                person.gender
-            ]
-            structure_elements.append(tuple(elements))
-        
-        current_structure_hash = hash(tuple(sorted(structure_elements)))
-        
-        # Si la estructura no ha cambiado, usar posiciones del caché
-        if (self.family_structure_hash == current_structure_hash and 
-            self.position_cache and 
-            all(cedula in self.position_cache for cedula in levels.keys())):
-            print("🔄 Usando posiciones del caché para mantener estabilidad visual")
-            return self.position_cache.copy()
+        # Layout por niveles: Reingold–Tilford para árboles de descendientes y
+        # Sugiyama para linajes con uniones entre ramas (coordenadas sin límite fijo)
+        pos = compute_layout(members, levels, cache=self.layout_cache)
+
+        # Actualizar caché y su clave
+        self.position_cache = pos.copy()
+        self._layout_key = layout_key
 
-        # Ajustar niveles para que el mínimo sea 0
-        min_level = min(levels.values())
-        adjusted_levels = {cedula: level - min_level for cedula, level in levels.items()}
-        max_level = max(adjusted_levels.values()) if adjusted_levels else 0
+        return pos
 
-        # Dimensiones del canvas con espacio para la leyenda
-        canvas_width = 1200
-        canvas_height = 800
-        
-        # Reservar espacio para la leyenda (220px desde la derecha)
-        usable_width = canvas_width - 250  # Dejar 250px para la leyenda
-        margin_left = 50
-        margin_top = 80
-        margin_bottom = 100
-        
-        available_height = canvas_height - margin_top - margin_bottom
-        available_width = usable_width - margin_left
+    def _view_key(self, family) -> tuple:
+        """Clave de lo que determina el layout: familia, su versión estructural y la vista"""
+        return (family.origin or family, family.structure_version, len(family.members), self._view[0],
+                self.collapse_threshold, self.focus_generations)
 
-        # Calcular altura entre niveles (más espacio para tarjetas)
-        if max_level == 0:
-            level_height = available_height / 2
+    def _assign_levels(self, family, members=None) -> Dict[str, int]:
+        """Asigna niveles jerárquicos a cada persona"""
+        return assign_levels(family.members if members is None else members)
+
+    def _get_renderer(self, canvas) -> RetainedCanvasRenderer:
+        """Renderizador retenido del canvas (lo prepara si el canvas es nuevo o fue limpiado)"""
+        if self.renderer.attach(canvas):
+            # Los eventos se enlazan una sola vez por etiqueta y resuelven la persona al ocurrir
+            canvas.tag_bind("opciones", "<Button-1>", self._on_options_click)
+            canvas.tag_bind("opciones", "<Enter>", lambda e: self._on_options_hover(e, True))
+            canvas.tag_bind("opciones", "<Leave>", lambda e: self._on_options_hover(e, False))
+            canvas.tag_bind("expandir", "<Button-1>", self._on_expand_click)
+        return self.renderer
+
+    def set_zoom(self, canvas, zoom: float) -> None:
+        """Cambia la escala del dibujo y materializa lo que quede visible"""
+        if self.renderer.canvas is not canvas:
+            self.renderer.zoom = zoom
         else:
-            level_height = max(120, available_height / max_level) if max_level > 0 else available_height
+            self.renderer.set_zoom(zoom)
+            self.update_viewport(canvas)
+
+    def content_bbox(self):
+        """Rectángulo (en coordenadas del canvas) que ocupa el árbol completo, o None"""
+        if self._frame is None:
+            return None
+        zoom = self.renderer.zoom
+        return tuple(value * zoom for value in self._frame['bbox'])
+
+    def _visible_region(self, canvas, margin: float = 0):
+        """Región visible del canvas en coordenadas del layout, con un margen en píxeles"""
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            width, height = 1200, 800  # Canvas aún sin mostrar
+        zoom = self.renderer.zoom
+        return ((canvas.canvasx(0) - margin) / zoom, (canvas.canvasy(0) - margin) / zoom,
+                (canvas.canvasx(width) + margin) / zoom, (canvas.canvasy(height) + margin) / zoom)
+
+    def _detail_level(self) -> str:
+        """Nivel de detalle de las tarjetas según el zoom actual"""
+        zoom = self.renderer.zoom
+        if zoom < self.dot_zoom:
+            return "punto"
+        if zoom < self.box_zoom:
+            return "rectangulo"
+        return "tarjeta"
+
+    def update_viewport(self, canvas) -> None:
+        """Materializa lo que entró en la vista al desplazar o hacer zoom (si hace falta)"""
+        if self._frame is None or self.renderer.canvas is not canvas:
+            return
+        if self._materialized is not None:
+            (x1, y1, x2, y2), detail = self._materialized
+            vx1, vy1, vx2, vy2 = self._visible_region(canvas)
+            if (detail == self._detail_level() and x1 <= vx1 and y1 <= vy1
+                    and vx2 <= x2 and vy2 <= y2):
+                return
+        self._render_viewport(canvas)
 
-        # Agrupar personas por unidades familiares (parejas + solteros)
-        family_units = self._create_family_units(family, adjusted_levels)
+    def _render_viewport(self, canvas) -> None:
+        """Dibuja las conexiones y tarjetas del último cuadro que caen cerca de la vista"""
+        region = self._visible_region(canvas, self.viewport_margin)
+        detail = self._detail_level()
+        render = self.build_render_list(self._frame, region, detail)
 
-        # Implementar layout balanceado como en la imagen objetivo
-        pos = self._calculate_balanced_layout(family_units, margin_left, margin_top, 
-                                            available_width, available_height, level_height)
+        # Agregar leyenda de colores de relaciones
+        self._draw_relationship_legend(render, canvas)
+        self.renderer.apply(render)
+        self._materialized = (region, detail)
 
-        # Actualizar caché y hash de estructura
-        self.position_cache = pos.copy()
-        self.family_structure_hash = current_structure_hash
-        print("💾 Posiciones calculadas y guardadas en caché")
+    def iter_render_items(self, frame: dict, region=None, detail: str = "tarjeta"):
+        """
+        Recorre los ítems de dibujo de un cuadro sin armar la lista completa
 
-        return pos
+        Produce (clave, (tipo, coordenadas, opciones)): primero las conexiones y
+        luego las tarjetas, una persona a la vez.
 
-    def _create_family_units(self, family, levels) -> List[Dict]:
-        """Crea unidades familiares (parejas y solteros) organizadas por nivel
-        MANTENIENDO POSICIONES ESTABLES independientemente del estado de vida"""
-        family_units = []
-        processed_persons = set()
-        
-        # Agrupar por niveles
-        level_groups = {}
-        for person in family.members:
-            level = levels.get(person.cedula, 0)
-            level_groups.setdefault(level, []).append(person)
-        
-        # Ordenar personas por cédula para mantener orden consistente
-        for level in level_groups:
-            level_groups[level].sort(key=lambda p: p.cedula)
-        
-        for level, persons in level_groups.items():
-            level_units = []
-            
-            for person in persons:
-                if person.cedula in processed_persons:
-                    continue
-                    
-                # Verificar si tiene cónyuge en el mismo nivel (INDEPENDIENTE del estado de vida)
-                if (person.spouse and 
-                    person.spouse.cedula in [p.cedula for p in family.members] and
-                    levels.get(person.spouse.cedula, 0) == level and
-                    person.spouse.cedula not in processed_persons):
-                    
-                    # Crear unidad de pareja (vivos o fallecidos, siguen siendo pareja)
-                    # Posicionar según género: mujer izquierda, hombre derecha
-                    if person.gender == 'F' and person.spouse.gender == 'M':
-                        left_cedula, right_cedula = person.cedula, person.spouse.cedula
-                    elif person.gender == 'M' and person.spouse.gender == 'F':
-                        left_cedula, right_cedula = person.spouse.cedula, person.cedula
-                    else:
-                        # Fallback para casos especiales (mismo género o sin especificar)
-                        # Usar orden consistente basado en cédula para mantener posiciones estables
-                        left_cedula, right_cedula = sorted([person.cedula, person.spouse.cedula])
-                    
-                    # Crear ID único para la pareja basado en las cédulas ordenadas
-                    couple_id = f"couple_{min(person.cedula, person.spouse.cedula)}_{max(person.cedula, person.spouse.cedula)}"
-                    
-                    unit = {
-                        'type': 'couple',
-                        'level': level,
-                        'members': [person.cedula, person.spouse.cedula],
-                        'left_cedula': left_cedula,
-                        'right_cedula': right_cedula,
-                        'width': 280,  # Más espacio para dos tarjetas lado a lado como en imagen
-                        'both_alive': person.alive and person.spouse.alive,
-                        'both_dead': not person.alive and not person.spouse.alive,
-                        'mixed_status': person.alive != person.spouse.alive,
-                        'stable_id': couple_id  # ID estable para mantener posición
-                    }
-                    level_units.append(unit)
-                    processed_persons.add(person.cedula)
-                    processed_persons.add(person.spouse.cedula)
-                    
-                else:
-                    # Crear unidad individual
-                    unit = {
-                        'type': 'single',
-                        'level': level,
-                        'members': [person.cedula],
-                        'width': 160,  # Espacio para una tarjeta como en imagen
-                        'alive': person.alive,
-                        'stable_id': f"single_{person.cedula}"  # ID estable para mantener posición
-                    }
-                    level_units.append(unit)
-                    processed_persons.add(person.cedula)
-            
-            # Ordenar unidades por ID estable para mantener orden consistente
-            level_units.sort(key=lambda u: u['stable_id'])
-            family_units.extend(level_units)
-        
-        return family_units
+        Args:
+            frame (dict): Cuadro calculado por compute_frame
+            region (tuple): (x1, y1, x2, y2) en coordenadas del layout; None para todo el árbol
+            detail (str): Nivel de detalle de las tarjetas ("tarjeta", "rectangulo" o "punto")
+        """
+        connections = frame['connections'].items
+        pos, cards = frame['pos'], frame['cards']
+        if region is None:
+            yield from connections.items()
+            cedulas = pos
+        else:
+            for key in frame['connection_grid'].query(*region):
+                yield key, connections[key]
+            cedulas = frame['person_grid'].query(*region)
+
+        for cedula in cedulas:
+            x, y = pos[cedula]
+            card = RenderList()
+            self._draw_person_card(card, cedula, x, y, cards[cedula], detail)
+            yield from card.items.items()
+
+    def build_render_list(self, frame: dict, region=None, detail: str = "tarjeta") -> RenderList:
+        """Lista de dibujo de un cuadro (o de una región de él), ver iter_render_items"""
+        render = RenderList()
+        render.items.update(self.iter_render_items(frame, region, detail))
+        return render
+
+    def _visible_members(self, family):
+        """
+        Personas que se muestran y ramas ocultas de cada una
 
-    def _calculate_balanced_layout(self, family_units, margin_left, margin_top, 
-                                 available_width, available_height, level_height):
-        """Calcula un layout balanceado y centrado como en la imagen objetivo"""
-        pos = {}
-        
-        # Organizar unidades por nivel
-        units_by_level = {}
-        for unit in family_units:
-            level = unit['level']
-            units_by_level.setdefault(level, []).append(unit)
-        
-        # Para cada nivel, calcular posiciones centradas
-        for level, level_units in units_by_level.items():
-            if not level_units:
+        Con pocos miembros se muestra todo el árbol. En familias grandes se parte
+        del vecindario del Ego (focus_generations hacia arriba y hacia abajo, con
+        get_extended_family), se agregan los padres, hijos y parejas de los hijos
+        de cada rama expandida y se quitan los descendientes de las colapsadas.
+
+        Returns:
+            tuple: (miembros visibles, {cédula: (descendientes ocultos, padres ocultos)})
+        """
+        view_key = self._view_key(family)
+        if self._visible_cache is not None and self._visible_cache[0] == view_key:
+            # Se guardan cédulas: la familia puede ser otra copia (snapshot) con los mismos miembros
+            visible, hidden = self._visible_cache[1]
+            if visible is None:
+                return family.members, hidden
+            return [p for p in family.members if p.cedula in visible], hidden
+        members, hidden = self._compute_visible_members(family)
+        visible = None if members is family.members else {p.cedula for p in members}
+        self._visible_cache = (view_key, (visible, hidden))
+        return members, hidden
+
+    def _compute_visible_members(self, family):
+        """Calcula lo que devuelve _visible_members (sin caché)"""
+        members = family.members
+        _, expanded, collapsed = self._view
+        if len(members) <= self.collapse_threshold and not collapsed:
+            return members, {}
+
+        people = {p.cedula: p for p in members}
+        if len(members) <= self.collapse_threshold:
+            visible = set(people)
+        else:
+            ego = family.get_ego()
+            if ego is None:
+                return members, {}
+            visible = {p.cedula for p in ego.get_extended_family(family, self.focus_generations)
+                       if p.cedula in people}
+
+        # Ramas expandidas (una expansión puede mostrar a otra persona expandida)
+        pending = [cedula for cedula in expanded if cedula in visible]
+        while pending:
+            person = people.get(pending.pop())
+            if person is None:
                 continue
-                
-            y = margin_top + (level * level_height)
-            
-            # Calcular ancho total necesario para este nivel
-            total_width = 0
-            for unit in level_units:
-                if unit['type'] == 'couple':
-                    total_width += 280  # Ancho para pareja
-                else:
-                    total_width += 160  # Ancho para soltero
-            
-            # Espaciado entre unidades
-            num_gaps = max(0, len(level_units) - 1)
-            gap_width = 60  # Espacio entre unidades
-            total_width_with_gaps = total_width + (num_gaps * gap_width)
-            
-            # Centrar todo el nivel en el ancho disponible
-            start_x = margin_left + (available_width - total_width_with_gaps) / 2
-            
-            # Posicionar cada unidad
-            current_x = start_x
-            
-            for unit in level_units:
-                if unit['type'] == 'couple':
-                    left_cedula = unit.get('left_cedula') or unit['members'][0]
-                    right_cedula = unit.get('right_cedula') or unit['members'][1]
-                    
-                    # Centrar la pareja en su espacio asignado
-                    couple_center = current_x + 140  # Centro del espacio de pareja
-                    couple_spacing = 150
-                    
-                    pos[left_cedula] = (couple_center - couple_spacing / 2, y)
-                    pos[right_cedula] = (couple_center + couple_spacing / 2, y)
-                    
-                    current_x += 280 + gap_width  # Avanzar al siguiente espacio
-                
-                else:
-                    person_cedula = unit['members'][0]
-                    person_center = current_x + 80  # Centro del espacio individual
-                    pos[person_cedula] = (person_center, y)
-                    
-                    current_x += 160 + gap_width  # Avanzar al siguiente espacio
-        
-        return pos
+            relatives = [person.father, person.mother] + list(person.children)
+            relatives += [child.spouse for child in person.children]
+            for relative in relatives:
+                if relative is not None and relative.cedula in people and relative.cedula not in visible:
+                    visible.add(relative.cedula)
+                    if relative.cedula in expanded:
+                        pending.append(relative.cedula)
+
+        # Ramas colapsadas: se ocultan los descendientes y sus parejas sin padres visibles
+        for cedula in collapsed:
+            if cedula not in visible:
+                continue
+            seen = set()
+            stack = list(people[cedula].children)
+            while stack:
+                child = stack.pop()
+                if child.cedula in seen:
+                    continue
+                seen.add(child.cedula)
+                visible.discard(child.cedula)
+                spouse = child.spouse
+                if spouse is not None and not any(parent is not None and parent.cedula in visible
+                                                  for parent in (spouse.father, spouse.mother)):
+                    visible.discard(spouse.cedula)
+                stack.extend(child.children)
+
+        hidden = {}
+        for cedula in visible:
+            person = people[cedula]
+            parents_hidden = any(parent is not None and parent.cedula in people and parent.cedula not in visible
+                                 for parent in (person.father, person.mother))
+            descendants = self._count_hidden_descendants(person, visible, people)
+            if descendants or parents_hidden:
+                hidden[cedula] = (descendants, parents_hidden)
+        return [p for p in members if p.cedula in visible], hidden
+
+    @staticmethod
+    def _count_hidden_descendants(person, visible, people) -> int:
+        """Descendientes distintos que quedan ocultos bajo una persona visible"""
+        seen = set()
+        stack = [child for child in person.children
+                 if child.cedula in people and child.cedula not in visible]
+        while stack:
+            child = stack.pop()
+            if child.cedula in seen:
+                continue
+            seen.add(child.cedula)
+            stack.extend(grandchild for grandchild in child.children
+                         if grandchild.cedula in people and grandchild.cedula not in visible)
+        return len(seen)
 
-    def _compute_unit_x_positions(self, family_units: List[Dict]) -> Dict[Tuple[str,...], float]:
-        """Calcula una posición X para cada unidad familiar (clave: tuple(members))
-        usando un algoritmo bottom-up que intenta centrar padres sobre sus hijos.
+    def compute_frame(self, family) -> dict:
         """
-        # Organizar unidades por nivel
-        units_by_level = {}
-        for unit in family_units:
-            units_by_level.setdefault(unit['level'], []).append(unit)
-
-        # Mapa clave->unit for easy lookup
-        unit_key_map = {tuple(u['members']): u for u in family_units}
-
-        # Construir relación unit -> children_units (niveles inferiores)
-        children_map = {tuple(u['members']): set() for u in family_units}
-
-        # Para cada unidad, buscar unidades en el siguiente nivel que contengan hijos de sus miembros
-        for unit in family_units:
-            unit_key = tuple(unit['members'])
-            for other in family_units:
-                # other es potencial unidad hija si alguno de sus miembros es hijo de alguien en unit
-                if other['level'] == unit['level'] + 1:
-                    # comprobar relaciones por cédula: si alguno de other.members tiene padre/madre en unit.members
-                    # Dado que no tenemos referencia directa a objetos aquí, asumimos que la organización de niveles
-                    # sitúa a hijos en el siguiente nivel y que la relación estará reflejada por proximidad.
-                    # Como heurística, si hay intersección de cedulas (rare), lo vinculamos; de lo contrario, usamos
-                    # proximidad temporal (no ideal). Para robustez, vinculamos si alguna cedula coincide en nombres de miembros.
-                    # Simplicidad: si el first member of other shares last name with any in unit, consider child.
-                    # (Mejoras futuras: pasar objetos en lugar de cedulas)
-                    try:
-                        # crude heuristic: if any string fragment matches
-                        if any(m in other['members'] for m in unit['members']):
-                            children_map[unit_key].add(tuple(other['members']))
-                    except Exception:
-                        continue
-
-        # Lista de niveles ordenada de abajo hacia arriba
-        levels_sorted = sorted(units_by_level.keys(), reverse=True)
-
-        x_positions = {}
-        next_x = 0
-        x_spacing = 200  # Más espacio entre unidades para tarjetas
-
-        # Asignar X para niveles más profundos (hojas)
-        if levels_sorted:
-            deepest = levels_sorted[0]
-            for unit in units_by_level.get(deepest, []):
-                key = tuple(unit['members'])
-                x_positions[key] = next_x
-                next_x += x_spacing
-
-        # Subir niveles y centrar unidades sobre sus hijos cuando sea posible
-        for level in levels_sorted[1:]:
-            level_units = units_by_level.get(level, [])
-            for unit in level_units:
-                key = tuple(unit['members'])
-                children = children_map.get(key, set())
-                if children:
-                    # Centrar sobre las posiciones de las unidades hijas
-                    child_xs = [x_positions[c] for c in children if c in x_positions]
-                    if child_xs:
-                        x_positions[key] = sum(child_xs) / len(child_xs)
-                        continue
-
-                # Si no tiene hijos posicionados, asignar siguiente X disponible
-                if key not in x_positions:
-                    x_positions[key] = next_x
-                    next_x += x_spacing
-
-        # Convertir a coordenadas centradas (mantener valores numéricos)
-        return x_positions
-
-    def _assign_levels(self, family) -> Dict[str, int]:
-        """Asigna niveles jerárquicos a cada persona"""
-        levels = {}
-        visited = set()
+        Etapa de cálculo: layout, rutas de las conexiones y estilo de cada tarjeta
 
-        def dfs(person, level):
-            if person.cedula in visited:
+        No usa Tkinter, así que puede ejecutarse en un hilo de trabajo, siempre
+        que reciba una familia que nadie más modifica (ver request_draw). El
+        cuadro resultante no depende de los objetos Person (se copian los datos
+        que se dibujan) y se indexa espacialmente para dibujar solo lo visible.
+        """
+        with self._compute_lock:
+            with self._draw_lock:
+                self._view = (self._view_version, frozenset(self._expanded), frozenset(self._collapsed))
+            return self._compute_frame(family)
+
+    def _compute_frame(self, family) -> dict:
+        # En familias grandes solo se ubica y enruta la parte visible
+        members, hidden = self._visible_members(family)
+
+        # Calcular layout (el grafo de networkx no se copia: el cuadro no lo usa)
+        pos = self.calculate_hierarchical_layout(family, members)
+        people = {p.cedula: p for p in members}
+
+        # NUEVA LÓGICA: Dibujar conexiones familiares inteligentes
+        # (las rutas dependen solo de la estructura y las posiciones: se reutilizan con la misma clave)
+        layout_key = self._layout_key
+        if self._routing_cache is not None and self._routing_cache[0] == layout_key:
+            connections, connection_grid = self._routing_cache[1]
+        else:
+            connections = RenderList()
+            self._draw_family_connections(connections, members, pos)
+            connection_grid = ItemGrid()
+            for key, spec in connections.items.items():
+                connection_grid.add(key, *item_bbox(spec))
+            self._routing_cache = (layout_key, (connections, connection_grid))
+
+        cards = {}
+        ego = family.get_ego()  # Una sola búsqueda del Ego para todas las tarjetas
+        for cedula in list(pos):
+            person = people.get(cedula)
+            if not person:
+                del pos[cedula]
+                continue
+            try:
+                cards[cedula] = self._card_style(person, ego is not None and ego.cedula == cedula)
+                if cedula in hidden:
+                    cards[cedula]['ocultos'], cards[cedula]['padres_ocultos'] = hidden[cedula]
+            except Exception as e:
+                print(f"Error dibujando tarjeta {cedula}: {e}")
+                del pos[cedula]
+
+        person_grid = ItemGrid()
+        half_width, half_height = CARD_WIDTH / 2, CARD_HEIGHT / 2
+        for cedula, (x, y) in pos.items():
+            person_grid.add(cedula, x - half_width, y - half_height, x + half_width, y + half_height)
+
+        xs = [x for x, _ in pos.values()]
+        ys = [y for _, y in pos.values()]
+        bbox = ((min(xs) - half_width, min(ys) - half_height, max(xs) + half_width, max(ys) + half_height)
+                if pos else (0, 0, 0, 0))
+        return {
+            'family': family.origin or family,
+            'people': people,
+            'pos': pos,
+            'cards': cards,
+            'connections': connections,
+            'connection_grid': connection_grid,
+            'person_grid': person_grid,
+            'bbox': bbox,
+        }
+
+    def apply_frame(self, canvas, frame: dict) -> None:
+        """Etapa de Tk: aplica un cuadro ya calculado al canvas (solo la parte visible)"""
+        if not canvas.winfo_exists():
+            return
+        self._get_renderer(canvas)
+        canvas.delete("mensaje")
+        self._people = frame['people']
+        self._source_family = frame['family']
+        self._frame = frame
+        self._render_viewport(canvas)
+
+    def request_draw(self, family, canvas, on_applied=None) -> None:
+        """
+        Pide un dibujo calculando el cuadro en un hilo de trabajo
+
+        El hilo de trabajo no calcula sobre la familia real: toma una copia
+        (Family.snapshot, con family.lock) y calcula sobre ella, así el hilo de
+        Tk no copia ni espera el candado mientras la simulación lo tiene. Si
+        llegan pedidos mientras se calcula, solo se atiende el último: el hilo
+        vuelve a calcular con el estado más reciente y los cuadros que quedaron
+        viejos antes de llegar al canvas se descartan. on_applied se llama (en el
+        hilo de Tk) después de aplicar cada cuadro.
+        """
+        self._redraw = lambda: self.request_draw(family, canvas, on_applied)
+        with self._draw_lock:
+            self._draw_request = (family, canvas, on_applied)
+            if self._computing:
                 return
-            visited.add(person.cedula)
-            levels[person.cedula] = level
-
-            # Si tiene cónyuge, asignar el mismo nivel PRIMERO
-            if person.spouse and person.spouse.cedula in [p.cedula for p in family.members]:
-                if person.spouse.cedula not in visited:
-                    visited.add(person.spouse.cedula)
-                    levels[person.spouse.cedula] = level
-
-            # Padres van un nivel arriba
-            if person.father and person.father.cedula in [p.cedula for p in family.members]:
-                dfs(person.father, level - 1)
-            if person.mother and person.mother.cedula in [p.cedula for p in family.members]:
-                dfs(person.mother, level - 1)
-
-            # Hijos van un nivel abajo - CORREGIR: usar parents para la verificación
-            for child in person.children:
-                if child.cedula in [p.cedula for p in family.members]:
-                    # Asegurar que el hijo esté correctamente conectado
-                    if child.father == person or child.mother == person:
-                        dfs(child, level + 1)
-
-            # Si tiene cónyuge, procesar también sus relaciones familiares
-            if person.spouse and person.spouse.cedula in [p.cedula for p in family.members]:
-                spouse = person.spouse
-                # Padres del cónyuge van un nivel arriba
-                if spouse.father and spouse.father.cedula in [p.cedula for p in family.members]:
-                    dfs(spouse.father, level - 1)
-                if spouse.mother and spouse.mother.cedula in [p.cedula for p in family.members]:
-                    dfs(spouse.mother, level - 1)
-                
-                # Hijos del cónyuge van un nivel abajo
-                for child in spouse.children:
-                    if child.cedula in [p.cedula for p in family.members]:
-                        # Asegurar que el hijo esté correctamente conectado
-                        if child.father == spouse or child.mother == spouse:
-                            dfs(child, level + 1)
-
+            self._computing = True
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="arbol-layout")
+        self._executor.submit(self._compute_pending)
+
+    def _compute_pending(self) -> None:
+        """Hilo de trabajo: calcula cuadros hasta que no queden pedidos"""
+        while True:
+            with self._draw_lock:
+                request, self._draw_request = self._draw_request, None
+                if request is None:
+                    self._computing = False
+                    return
+                self._generation += 1
+                generation = self._generation
+            family, canvas, on_applied = request
+            try:
+                # La copia se toma aquí: esperar el candado de la familia no traba la interfaz
+                frame = self.compute_frame(family.snapshot())
+            except Exception as e:
+                # El error se muestra en el canvas al aplicar (en el hilo de Tk)
+                print(f"Error calculando el árbol: {e}")
+                frame = e
+            with self._draw_lock:
+                self._ready = (generation, frame, canvas, on_applied)
+            try:
+                canvas.after(0, self._apply_ready)
+            except Exception as e:
+                print(f"Error programando el dibujo del árbol: {e}")
+
+    def _apply_ready(self) -> None:
+        """Hilo de Tk: aplica el cuadro más reciente (los anteriores se descartan)"""
+        with self._draw_lock:
+            ready, self._ready = self._ready, None
+        if ready is None:
+            return
+        generation, frame, canvas, on_applied = ready
+        if generation < self._applied_generation:
+            return
+        self._applied_generation = generation
         try:
-            # Empezar desde raíces (personas sin padres)
-            roots = [p for p in family.members if not p.father and not p.mother]
-            if not roots and family.members:
-                dfs(family.members[0], 0)
-            else:
-                for root in roots:
-                    dfs(root, 0)
-
-            # Verificación adicional para hijos que puedan haber quedado sin nivel
-            for person in family.members:
-                if person.cedula not in levels:
-                    # Si la persona no tiene nivel pero tiene padres en la familia, asignar nivel
-                    parent_level = None
-                    if person.father and person.father.cedula in levels:
-                        parent_level = levels[person.father.cedula]
-                    elif person.mother and person.mother.cedula in levels:
-                        parent_level = levels[person.mother.cedula]
-                    
-                    if parent_level is not None:
-                        levels[person.cedula] = parent_level + 1
-                        print(f"⚠️ Asignando nivel tardío a {person.get_full_name()}: {parent_level + 1}")
-                    else:
-                        # Si no tiene padres en la familia, asignar nivel 0
-                        levels[person.cedula] = 0
-                        print(f"⚠️ Asignando nivel por defecto a {person.get_full_name()}: 0")
-
+            if isinstance(frame, Exception):
+                raise frame
+            self.apply_frame(canvas, frame)
+            if on_applied:
+                on_applied()
         except Exception as e:
-            print(f"Error en asignación de niveles: {e}")
-            for i, person in enumerate(family.members):
-                levels[person.cedula] = i
-
-        return levels
+            self._show_error(canvas, e)
+
+    def _current_cedula(self, event):
+        """Cédula de la tarjeta sobre la que ocurrió un evento del canvas"""
+        for tag in event.widget.gettags("current"):
+            if tag.startswith("persona:"):
+                return tag[len("persona:"):]
+        return None
+
+    def _event_person(self, event):
+        """Persona real (no la copia del cuadro) de la tarjeta sobre la que ocurrió un evento"""
+        person = self._people.get(self._current_cedula(event))
+        if person is not None and self._source_family is not None:
+            return self._source_family.get_member_by_cedula(person.cedula) or person
+        return person
+
+    def _on_options_click(self, event):
+        person = self._event_person(event)
+        if person is not None:
+            self._show_menu(event, person)
+
+    def _on_expand_click(self, event):
+        person = self._event_person(event)
+        if person is not None:
+            self._toggle_expand(person)
+
+    def _on_options_hover(self, event, inside: bool):
+        """Efecto hover para indicar que los tres puntitos son clickeables"""
+        cedula = self._current_cedula(event)
+        background = self.renderer.item((cedula, "opciones_fondo"))
+        button = self.renderer.item((cedula, "opciones"))
+        if background is not None:
+            event.widget.itemconfig(background, fill="#e0e0e0" if inside else "#f0f0f0")
+        if button is not None:
+            event.widget.itemconfig(button, fill="#000" if inside else "#333")
 
     def draw_family_tree(self, family, canvas: tk.Canvas):
-        """Dibuja el árbol familiar en el canvas de tkinter"""
+        """Dibuja el árbol familiar en el canvas de tkinter
+
+        El canvas se actualiza de forma incremental: solo se crean, mueven o
+        modifican las tarjetas y conexiones que cambiaron desde el último dibujo,
+        y solo las que caen en la región visible (más un margen). El cálculo se
+        hace aquí mismo; request_draw lo hace en un hilo de trabajo.
+        """
+        self._redraw = lambda: self.draw_family_tree(family, canvas)
         try:
             # Verificar si el canvas aún existe
             if not canvas.winfo_exists():
                 return
-                
-            # Limpiar canvas solo si existe
-            canvas.delete("all")
+
+            renderer = self._get_renderer(canvas)
+            canvas.delete("mensaje")
             
             if not family.members:
-                if canvas.winfo_exists():
-                    canvas.create_text(
-                        600, 400,
-                        text="No hay personas en el árbol",
-                        font=("Arial", 16),
-                        fill="white"
-                    )
+                renderer.clear()
+                self._frame = self._materialized = None
+                canvas.create_text(
+                    600, 400,
+                    text="No hay personas en el árbol",
+                    font=("Arial", 16),
+                    fill="white",
+                    tags="mensaje"
+                )
                 return
 
-            # Construir grafo y calcular layout
-            self.build_family_graph(family)
-            pos = self.calculate_hierarchical_layout(family)
+            frame = self.compute_frame(family)
             
             # Verificar si el canvas sigue existiendo después de construir el grafo
             if not canvas.winfo_exists():
                 return
 
-            # NUEVA LÓGICA: Dibujar conexiones familiares inteligentes
-            self._draw_family_connections(canvas, family, pos)
-
-            # Dibujar nodos (personas) como tarjetas estilo imagen
-            for cedula, (x, y) in pos.items():
-                try:
-                    # Verificar que el canvas aún exista antes de dibujar
-                    if not canvas.winfo_exists():
-                        return
-                        
-                    person = next((p for p in family.members if p.cedula == cedula), None)
-                    if not person:
-                        continue
+            self.apply_frame(canvas, frame)
 
-                    # Dimensiones de la tarjeta
-                    card_width = 130
-                    card_height = 85
-                    
-                    # Identificar si es el Ego (persona principal)
-                    is_ego = family.is_ego(person)
-                    
-                    # Colores según género, estado y si es Ego
-                    if is_ego:
-                        # 👑 COLORES ESPECIALES PARA EL EGO
-                        border_color = "#FFD700"  # Dorado para el Ego
-                        header_color = "#FFF8E1"  # Fondo dorado claro
-                        border_width = 3  # Borde más grueso
-                        card_color = "#FFFDE7" if person.alive else "#F5F5DC"  # Crema
-                    else:
-                        # Colores normales según género
-                        if person.gender == "M":
-                            border_color = "#2196F3"  # Azul para hombres
-                            header_color = "#E3F2FD"
-                        else:
-                            border_color = "#E91E63"  # Rosa para mujeres
-                            header_color = "#FCE4EC"
-                        border_width = 2
-                        card_color = "#FFFFFF" if person.alive else "#F5F5F5"
-
-                    # Coordenadas de la tarjeta
-                    card_x1, card_y1 = x - card_width//2, y - card_height//2
-                    card_x2, card_y2 = x + card_width//2, y + card_height//2
-                    
-                    # Dibujar tarjeta principal
-                    card_id = canvas.create_rectangle(card_x1, card_y1, card_x2, card_y2,
-                                                    fill=card_color, outline=border_color, width=border_width)
-
-                    # Header de la tarjeta (franja superior)
-                    header_height = 25
-                    canvas.create_rectangle(card_x1, card_y1, card_x2, card_y1 + header_height,
-                                          fill=header_color, outline="", width=0)
-
-                    # Ícono de género en header
-                    icon_x = card_x1 + 12
-                    icon_y = card_y1 + 12
-                    
-                    if is_ego:
-                        # 👑 ICONO ESPECIAL PARA EL EGO
-                        gender_icon = "🤴" if person.gender == "M" else "�"  # Príncipe para hombres, princesa para mujeres
-                        ego_text = "TÚ"
-                        canvas.create_text(icon_x + 18, icon_y, text=ego_text, 
-                                         font=("Arial", 8, "bold"), fill="#B8860B", anchor="center")
-                    else:
-                        gender_icon = "👨" if person.gender == "M" else "👩"
-                    
-                    canvas.create_text(icon_x, icon_y, text=gender_icon, 
-                                     font=("Arial", 12), anchor="center")
-
-                    # Botón de opciones en header (esquina derecha)
-                    options_x = card_x2 - 12
-                    options_y = card_y1 + 12
-                    
-                    # Crear área clickeable más grande alrededor de los tres puntitos
-                    button_size = 8
-                    options_bg_id = canvas.create_oval(
-                        options_x - button_size, options_y - button_size,
-                        options_x + button_size, options_y + button_size,
-                        fill="#f0f0f0", outline="#ccc", width=1
-                    )
-                    
-                    options_button_id = canvas.create_text(options_x, options_y, text="⋮", 
-                                     font=("Arial", 12, "bold"), fill="#333", anchor="center")
-
-                    # Nombre completo (línea principal)
-                    name_y = card_y1 + 40
-                    full_name = f"{person.first_name}"
-                    surname = person.last_name
-                    canvas.create_text(x, name_y, text=full_name, 
-                                     font=("Arial", 10, "bold"), fill="#333333", anchor="center")
-                    canvas.create_text(x, name_y + 15, text=surname, 
-                                     font=("Arial", 9), fill="#666666", anchor="center")
-
-                    # Información de edad/estado en la parte inferior
-                    info_y = card_y2 - 12
-                    if person.alive:
-                        age = person.calculate_virtual_age()
-                        status_text = f"{age} años • Vivo"
-                        status_color = "#4CAF50"
-                    else:
-                        # Manejar fechas que pueden ser datetime o string
-                        if hasattr(person.death_date, 'strftime'):
-                            death_year = person.death_date.strftime("%Y")
-                        elif person.death_date:
-                            death_year = str(person.death_date).split('-')[0]
-                        else:
-                            death_year = "????"
-                            
-                        if hasattr(person.birth_date, 'strftime'):
-                            birth_year = person.birth_date.strftime("%Y")
-                        elif person.birth_date:
-                            birth_year = str(person.birth_date).split('-')[0]
-                        else:
-                            birth_year = "????"
-                            
-                        status_text = f"{birth_year}-{death_year} • Fallecido"
-                        status_color = "#F44336"
-                    
-                    canvas.create_text(x, info_y, text=status_text, 
-                                     font=("Arial", 7), fill=status_color, anchor="center")
-
-                    # 🔧 CORREGIDO: Hacer SOLO los tres puntitos clickeables para menú contextual
-                    # Binding en ambos elementos (fondo y texto) para mejor usabilidad
-                    canvas.tag_bind(options_bg_id, "<Button-1>", 
-                                  lambda e, p=person: self._show_menu(e, p))
-                    canvas.tag_bind(options_button_id, "<Button-1>", 
-                                  lambda e, p=person: self._show_menu(e, p))
-                    
-                    # Efectos hover para indicar que es clickeable
-                    def on_enter(event):
-                        canvas.itemconfig(options_bg_id, fill="#e0e0e0")
-                        canvas.itemconfig(options_button_id, fill="#000")
-                    
-                    def on_leave(event):
-                        canvas.itemconfig(options_bg_id, fill="#f0f0f0")
-                        canvas.itemconfig(options_button_id, fill="#333")
-                    
-                    canvas.tag_bind(options_bg_id, "<Enter>", on_enter)
-                    canvas.tag_bind(options_bg_id, "<Leave>", on_leave)
-                    canvas.tag_bind(options_button_id, "<Enter>", on_enter)
-                    canvas.tag_bind(options_button_id, "<Leave>", on_leave)
-
-                except Exception as e:
-                    print(f"Error dibujando tarjeta {cedula}: {e}")
-                    continue
+        except Exception as e:
+            self._show_error(canvas, e)
 
-            # Agregar leyenda de colores de relaciones
-            self._draw_relationship_legend(canvas)
+    def _show_error(self, canvas, error: Exception) -> None:
+        """Muestra en el canvas un error de cálculo o de dibujo del árbol"""
+        # Manejar errores sin intentar dibujar en un canvas inexistente
+        print(f"Error crítico al dibujar árbol: {error}")
+        try:
+            if canvas.winfo_exists():
+                canvas.delete("mensaje")
+                canvas.create_text(
+                    600, 400,
+                    text=f"Error al dibujar árbol: {str(error)}",
+                    font=("Arial", 12),
+                    fill="red",
+                    tags="mensaje"
+                )
+        except:
+            # Si no podemos dibujar en el canvas, solo imprimimos el error
+            print(f"Error crítico al dibujar árbol: {error}")
+
+    def _card_style(self, person, is_ego: bool) -> dict:
+        """Datos de la tarjeta de una persona: colores, ícono y textos"""
+        # Colores según género, estado y si es Ego
+        if is_ego:
+            # 👑 COLORES ESPECIALES PARA EL EGO
+            border_color = "#FFD700"  # Dorado para el Ego
+            header_color = "#FFF8E1"  # Fondo dorado claro
+            border_width = 3  # Borde más grueso
+            card_color = "#FFFDE7" if person.alive else "#F5F5DC"  # Crema
+            # 👑 ICONO ESPECIAL PARA EL EGO
+            gender_icon = "🤴" if person.gender == "M" else "👸"  # Príncipe para hombres, princesa para mujeres
+        else:
+            # Colores normales según género
+            if person.gender == "M":
+                border_color = "#2196F3"  # Azul para hombres
+                header_color = "#E3F2FD"
+            else:
+                border_color = "#E91E63"  # Rosa para mujeres
+                header_color = "#FCE4EC"
+            border_width = 2
+            card_color = "#FFFFFF" if person.alive else "#F5F5F5"
+            gender_icon = "👨" if person.gender == "M" else "👩"
+
+        # Información de edad/estado en la parte inferior
+        if person.alive:
+            age = person.calculate_virtual_age()
+            status_text = f"{age} años • Vivo"
+            status_color = "#4CAF50"
+        else:
+            death_year = person.death_year or "????"
+            birth_year = person.birth_year or "????"
+                
+            status_text = f"{birth_year}-{death_year} • Fallecido"
+            status_color = "#F44336"
+
+        return {
+            'ego': is_ego,
+            'alive': person.alive,
+            'border_color': border_color,
+            'header_color': header_color,
+            'border_width': border_width,
+            'card_color': card_color,
+            'icon': gender_icon,
+            'name': f"{person.first_name}",
+            'surname': person.last_name,
+            'status_text': status_text,
+            'status_color': status_color,
+        }
+
+    def _draw_person_card(self, render: RenderList, cedula, x, y, style: dict, detail: str = "tarjeta"):
+        """Agrega a la lista de dibujo la tarjeta de una persona
+
+        Con detail="rectangulo" solo se dibuja el contorno de la tarjeta y con
+        detail="punto" un círculo del color de la persona (vistas muy alejadas).
+        """
+        tags = ("tarjeta", f"persona:{cedula}")
+
+        # Dimensiones de la tarjeta
+        card_width = CARD_WIDTH
+        card_height = CARD_HEIGHT
+
+        if detail == "punto":
+            radius = card_height // 4
+            render.create_oval((cedula, "punto"), x - radius, y - radius, x + radius, y + radius,
+                               fill=style['border_color'] if style['alive'] else "#9E9E9E",
+                               outline="", tags=tags)
+            return
+
+        # Coordenadas de la tarjeta
+        card_x1, card_y1 = x - card_width//2, y - card_height//2
+        card_x2, card_y2 = x + card_width//2, y + card_height//2
+        
+        # Dibujar tarjeta principal
+        render.create_rectangle((cedula, "tarjeta"), card_x1, card_y1, card_x2, card_y2,
+                                fill=style['card_color'], outline=style['border_color'],
+                                width=style['border_width'], tags=tags)
+        if detail == "rectangulo":
+            return
+
+        # Header de la tarjeta (franja superior)
+        header_height = 25
+        render.create_rectangle((cedula, "cabecera"), card_x1, card_y1, card_x2, card_y1 + header_height,
+                                fill=style['header_color'], outline="", width=0, tags=tags)
+
+        # Ícono de género en header
+        icon_x = card_x1 + 12
+        icon_y = card_y1 + 12
+        
+        if style['ego']:
+            render.create_text((cedula, "ego"), icon_x + 18, icon_y, text="TÚ",
+                               font=("Arial", 8, "bold"), fill="#B8860B", anchor="center", tags=tags)
+        
+        render.create_text((cedula, "icono"), icon_x, icon_y, text=style['icon'],
+                           font=("Arial", 12), anchor="center", tags=tags)
 
-        except Exception as e:
-            # Manejar errores sin intentar dibujar en un canvas inexistente
-            print(f"Error crítico al dibujar árbol: {e}")
-            try:
-                if canvas.winfo_exists():
-                    canvas.create_text(
-                        600, 400,
-                        text=f"Error al dibujar árbol: {str(e)}",
-                        font=("Arial", 12),
-                        fill="red"
-                    )
-            except:
-                # Si no podemos dibujar en el canvas, solo imprimimos el error
-                print(f"Error crítico al dibujar árbol: {e}")
-
-    def _draw_relationship_legend(self, canvas):
+        # Botón de opciones en header (esquina derecha)
+        options_x = card_x2 - 12
+        options_y = card_y1 + 12
+        
+        # Crear área clickeable más grande alrededor de los tres puntitos
+        # (los eventos se enlazan por la etiqueta "opciones" en _get_renderer)
+        button_size = 8
+        render.create_oval((cedula, "opciones_fondo"),
+                           options_x - button_size, options_y - button_size,
+                           options_x + button_size, options_y + button_size,
+                           fill="#f0f0f0", outline="#ccc", width=1, tags=tags + ("opciones",))
+        render.create_text((cedula, "opciones"), options_x, options_y, text="⋮",
+                           font=("Arial", 12, "bold"), fill="#333", anchor="center",
+                           tags=tags + ("opciones",))
+
+        # Nombre completo (línea principal)
+        name_y = card_y1 + 40
+        render.create_text((cedula, "nombre"), x, name_y, text=style['name'],
+                           font=("Arial", 10, "bold"), fill="#333333", anchor="center", tags=tags)
+        render.create_text((cedula, "apellido"), x, name_y + 15, text=style['surname'],
+                           font=("Arial", 9), fill="#666666", anchor="center", tags=tags)
+
+        # Información de edad/estado en la parte inferior
+        info_y = card_y2 - 12
+        render.create_text((cedula, "estado"), x, info_y, text=style['status_text'],
+                           font=("Arial", 7), fill=style['status_color'], anchor="center", tags=tags)
+
+        # Ramas ocultas: insignias clickeables (descendientes abajo, ancestros arriba)
+        if style.get('ocultos'):
+            badge_y = card_y2 + 2
+            render.create_oval((cedula, "expandir_fondo"), x - 16, badge_y - 9, x + 16, badge_y + 9,
+                               fill="#455A64", outline="#FFFFFF", width=1, tags=tags + ("expandir",))
+            render.create_text((cedula, "expandir"), x, badge_y, text=f"+{style['ocultos']}",
+                               font=("Arial", 7, "bold"), fill="white", anchor="center",
+                               tags=tags + ("expandir",))
+        if style.get('padres_ocultos'):
+            render.create_oval((cedula, "ancestros_fondo"), x - 9, card_y1 - 9, x + 9, card_y1 + 9,
+                               fill="#455A64", outline="#FFFFFF", width=1, tags=tags + ("expandir",))
+            render.create_text((cedula, "ancestros"), x, card_y1, text="▲",
+                               font=("Arial", 7, "bold"), fill="white", anchor="center",
+                               tags=tags + ("expandir",))
+
+    def _draw_relationship_legend(self, render: RenderList, canvas):
         """Dibuja una leyenda explicando los colores como en la imagen"""
         try:
-            if not canvas.winfo_exists():
-                return
-            
             # Posición de la leyenda (esquina superior derecha)
             canvas_width = canvas.winfo_width() if canvas.winfo_width() > 1 else 1200
             legend_x = canvas_width - 200
             legend_y = 20
+            tags = ("leyenda",)
             
             # Fondo de la leyenda
-            legend_bg = canvas.create_rectangle(
+            render.create_rectangle(
+                ("leyenda", "fondo"),
                 legend_x - 10, legend_y - 10,
                 legend_x + 180, legend_y + 160,
-                fill="#FFFFFF", outline="#CCCCCC", width=2
+                fill="#FFFFFF", outline="#CCCCCC", width=2, tags=tags
             )
             
             # Título de la leyenda
-            canvas.create_text(
+            render.create_text(
+                ("leyenda", "titulo"),
                 legend_x + 75, legend_y + 10,
                 text="🗂️ Leyenda",
                 font=("Arial", 11, "bold"),
                 fill="#333333",
-                anchor="center"
+                anchor="center",
+                tags=tags
             )
             
             # Elementos de la leyenda como en la imagen
@@ -644,33 +723,35 @@ class FamilyGraphVisualizer:
                 item_y = legend_y + y_offset + (i * 18)
                 
                 # Símbolo/icono
-                canvas.create_text(
+                render.create_text(
+                    ("leyenda", "simbolo", i),
                     legend_x + 10, item_y,
                     text=symbol, font=("Arial", 10),
-                    fill=color, anchor="w"
+                    fill=color, anchor="w", tags=tags
                 )
                 
                 # Etiqueta
-                canvas.create_text(
+                render.create_text(
+                    ("leyenda", "etiqueta", i),
                     legend_x + 30, item_y,
                     text=label,
                     font=("Arial", 8),
                     fill="#333333",
-                    anchor="w"
+                    anchor="w",
+                    tags=tags
                 )
                 
         except Exception as e:
             print(f"Error dibujando leyenda: {e}")
 
-    def _draw_family_connections(self, canvas, family, pos):
+    def _draw_family_connections(self, render: RenderList, members, pos):
         """Dibuja conexiones familiares con sistema anti-colisiones mejorado"""
         try:
+            tags = ("conexion",)
+
             # Sistema de registro de rutas ocupadas para evitar cruces
-            rutas_ocupadas = {
-                'horizontales': [],  # [(y, x_start, x_end)]
-                'verticales': [],    # [(x, y_start, y_end)]
-                'diagonales': []     # [(x1, y1, x2, y2)]
-            }
+            # (índice espacial: cada consulta solo revisa los segmentos cercanos)
+            rutas_ocupadas = SegmentGrid()
             
             # 1. Primero dibujar relaciones de pareja/cónyuge
             parejas_dibujadas = set()
@@ -678,7 +759,7 @@ class FamilyGraphVisualizer:
             
             # Recopilar todas las parejas únicas
             parejas_unicas = set()
-            for person in family.members:
+            for person in members:
                 if person.spouse and person.cedula in pos and person.spouse.cedula in pos:
                     pareja_id = tuple(sorted([person.cedula, person.spouse.cedula]))
                     parejas_unicas.add(pareja_id)
@@ -691,26 +772,26 @@ class FamilyGraphVisualizer:
                     x2, y2 = pos[cedula2]
                     
                     # LÍNEAS MATRIMONIALES: Horizontales directas fucsia
-                    canvas.create_line(x1, y1, x2, y2, 
-                                     fill="#E91E63", width=4, smooth=True, capstyle="round")
+                    render.create_line(("pareja", pareja_id), x1, y1, x2, y2,
+                                       fill="#E91E63", width=4, smooth=True, capstyle="round", tags=tags)
                     
                     # Registrar ruta matrimonial como ocupada
                     min_x, max_x = min(x1, x2), max(x1, x2)
-                    rutas_ocupadas['horizontales'].append((y1, min_x, max_x))
+                    rutas_ocupadas.add_horizontal(y1, min_x, max_x)
                     
                     # Punto medio para conexiones padre-hijo
                     mid_x, mid_y = (x1 + x2) / 2, (y1 + y2) / 2
                     puntos_medios_parejas[pareja_id] = (mid_x, mid_y)
                     
                     # Pequeño círculo en el punto medio
-                    canvas.create_oval(mid_x-4, mid_y-4, mid_x+4, mid_y+4, 
-                                     fill="#E91E63", outline="#FFFFFF", width=1)
+                    render.create_oval(("pareja_punto", pareja_id), mid_x-4, mid_y-4, mid_x+4, mid_y+4,
+                                       fill="#E91E63", outline="#FFFFFF", width=1, tags=tags)
 
             # 2. SISTEMA DE RAMIFICACIÓN SEPARADO POR NÚCLEOS FAMILIARES CON ANTI-COLISIONES
             # Agrupar SOLO los hijos por sus PADRES ESPECÍFICOS (sin mezclar primos)
             conexiones_familiares = {}
             
-            for person in family.members:
+            for person in members:
                 if person.cedula in pos:
                     # Identificar a los padres EXACTOS de esta persona
                     padres_key = None
@@ -738,11 +819,12 @@ class FamilyGraphVisualizer:
                             
                             # Dibujar línea entre padres no casados (solo una vez)
                             if padres_key not in conexiones_familiares:
-                                canvas.create_line(padre_x, padre_y, madre_x, madre_y,
-                                                 fill="#FF9800", width=3, dash=(10, 5), capstyle="round")
+                                render.create_line((padres_key, "padres"), padre_x, padre_y, madre_x, madre_y,
+                                                   fill="#FF9800", width=3, dash=(10, 5), capstyle="round",
+                                                   tags=tags)
                                 # Registrar como ruta ocupada
                                 min_x, max_x = min(padre_x, madre_x), max(padre_x, madre_x)
-                                rutas_ocupadas['horizontales'].append((padre_y, min_x, max_x))
+                                rutas_ocupadas.add_horizontal(padre_y, min_x, max_x)
                     
                     # Caso 2: Solo padre (núcleo monoparental paterno)
                     elif person.father and person.father.cedula in pos:
@@ -791,7 +873,7 @@ class FamilyGraphVisualizer:
                     ruta = self._calcular_ruta_inteligente(parent_x, parent_y, child_x, child_y, rutas_ocupadas)
                     
                     # Dibujar ruta calculada
-                    self._dibujar_ruta_inteligente(canvas, ruta, color_conexion, 4, arrow=True)
+                    self._dibujar_ruta_inteligente(render, (padres_key, cedula), ruta, color_conexion, 4, arrow=True)
                     
                     # Registrar ruta como ocupada
                     self._registrar_ruta_ocupada(rutas_ocupadas, ruta, 'padre-hijo')
@@ -809,26 +891,26 @@ class FamilyGraphVisualizer:
                     max_x = max(child1_x, child2_x, parent_x)
                     
                     # Línea vertical desde padre hasta altura horizontal
-                    canvas.create_line(parent_x, parent_y, parent_x, horizontal_y,
-                                     fill=color_conexion, width=4, capstyle="round")
-                    rutas_ocupadas['verticales'].append((parent_x, parent_y, horizontal_y))
+                    render.create_line((padres_key, "bajada"), parent_x, parent_y, parent_x, horizontal_y,
+                                       fill=color_conexion, width=4, capstyle="round", tags=tags)
+                    rutas_ocupadas.add_vertical(parent_x, parent_y, horizontal_y)
                     
                     # Línea horizontal que conecta SOLO a estos hermanos específicos
-                    canvas.create_line(min_x, horizontal_y, max_x, horizontal_y,
-                                     fill=color_conexion, width=4, capstyle="round")
-                    rutas_ocupadas['horizontales'].append((horizontal_y, min_x, max_x))
+                    render.create_line((padres_key, "hermanos"), min_x, horizontal_y, max_x, horizontal_y,
+                                       fill=color_conexion, width=4, capstyle="round", tags=tags)
+                    rutas_ocupadas.add_horizontal(horizontal_y, min_x, max_x)
                     
                     # Líneas verticales a cada hijo
-                    canvas.create_line(child1_x, horizontal_y, child1_x, child1_y,
-                                     fill=color_conexion, width=4, capstyle="round",
-                                     arrow=tk.LAST, arrowshape=(16, 20, 8))
-                    canvas.create_line(child2_x, horizontal_y, child2_x, child2_y,
-                                     fill=color_conexion, width=4, capstyle="round",
-                                     arrow=tk.LAST, arrowshape=(16, 20, 8))
+                    render.create_line((padres_key, child1_cedula), child1_x, horizontal_y, child1_x, child1_y,
+                                       fill=color_conexion, width=4, capstyle="round",
+                                       arrow=tk.LAST, arrowshape=(16, 20, 8), tags=tags)
+                    render.create_line((padres_key, child2_cedula), child2_x, horizontal_y, child2_x, child2_y,
+                                       fill=color_conexion, width=4, capstyle="round",
+                                       arrow=tk.LAST, arrowshape=(16, 20, 8), tags=tags)
                     
                     # Registrar rutas verticales como ocupadas
-                    rutas_ocupadas['verticales'].append((child1_x, horizontal_y, child1_y))
-                    rutas_ocupadas['verticales'].append((child2_x, horizontal_y, child2_y))
+                    rutas_ocupadas.add_vertical(child1_x, horizontal_y, child1_y)
+                    rutas_ocupadas.add_vertical(child2_x, horizontal_y, child2_y)
                 
                 else:
                     # Más de dos hijos: rutas inteligentes individuales
@@ -837,7 +919,7 @@ class FamilyGraphVisualizer:
                         ruta = self._calcular_ruta_inteligente(parent_x, parent_y, child_x, child_y, rutas_ocupadas)
                         
                         # Dibujar ruta calculada
-                        self._dibujar_ruta_inteligente(canvas, ruta, color_conexion, 4, arrow=True)
+                        self._dibujar_ruta_inteligente(render, (padres_key, cedula), ruta, color_conexion, 4, arrow=True)
                         
                         # Registrar ruta como ocupada
                         self._registrar_ruta_ocupada(rutas_ocupadas, ruta, 'padre-hijo')
@@ -904,14 +986,8 @@ class FamilyGraphVisualizer:
         for factor in [0.6, 0.5, 0.7, 0.4, 0.8, 0.3, 0.9]:
             test_y = parent_y + (avg_child_y - parent_y) * factor
             
-            # Verificar si esta altura está libre
-            libre = True
-            for h_y, h_x1, h_x2 in rutas_ocupadas['horizontales']:
-                if abs(h_y - test_y) < 15:  # Margen de seguridad
-                    libre = False
-                    break
-            
-            if libre:
+            # Verificar si esta altura está libre (margen de seguridad de 15px)
+            if not rutas_ocupadas.horizontal_near_y(test_y, 15):
                 return test_y
         
         # Si no encuentra altura libre, usar la calculada básica
@@ -921,14 +997,9 @@ class FamilyGraphVisualizer:
         """Verifica si una línea directa colisiona con rutas existentes"""
         margen = 10
         
-        # Verificar colisión con líneas horizontales
-        for h_y, h_x1, h_x2 in rutas_ocupadas['horizontales']:
-            if self._lineas_se_cruzan(x1, y1, x2, y2, h_x1, h_y, h_x2, h_y, margen):
-                return True
-        
-        # Verificar colisión con líneas verticales
-        for v_x, v_y1, v_y2 in rutas_ocupadas['verticales']:
-            if self._lineas_se_cruzan(x1, y1, x2, y2, v_x, v_y1, v_x, v_y2, margen):
+        # Solo pueden cruzarse las líneas horizontales y verticales cercanas
+        for x3, y3, x4, y4 in rutas_ocupadas.near(x1, y1, x2, y2):
+            if self._lineas_se_cruzan(x1, y1, x2, y2, x3, y3, x4, y4, margen):
                 return True
         
         return False
@@ -964,48 +1035,32 @@ class FamilyGraphVisualizer:
             px = x1 + t * (x2 - x1)
             py = y1 + t * (y2 - y1)
             
-            # Verificar margen de seguridad
-            min_dist = min(
-                ((px - x1)**2 + (py - y1)**2)**0.5,
-                ((px - x2)**2 + (py - y2)**2)**0.5,
-                ((px - x3)**2 + (py - y3)**2)**0.5,
-                ((px - x4)**2 + (py - y4)**2)**0.5
+            # Verificar margen de seguridad (distancias al cuadrado, sin raíces)
+            min_dist2 = min(
+                (px - x1)**2 + (py - y1)**2,
+                (px - x2)**2 + (py - y2)**2,
+                (px - x3)**2 + (py - y3)**2,
+                (px - x4)**2 + (py - y4)**2
             )
             
-            return min_dist < margen
+            return min_dist2 < margen * margen
         
         return False
 
-    def _dibujar_ruta_inteligente(self, canvas, ruta, color, width, arrow=False):
-        """Dibuja una ruta calculada por el sistema inteligente"""
+    def _dibujar_ruta_inteligente(self, render, key, ruta, color, width, arrow=False):
+        """Dibuja una ruta calculada por el sistema inteligente (un segmento por clave)"""
         puntos = ruta['puntos']
-        
-        if ruta['tipo'] == 'directa':
-            x1, y1 = puntos[0]
-            x2, y2 = puntos[1]
-            
-            if arrow:
-                canvas.create_line(x1, y1, x2, y2, 
-                                 fill=color, width=width, capstyle="round",
-                                 arrow=tk.LAST, arrowshape=(16, 20, 8))
+        opciones = dict(fill=color, width=width, capstyle="round", tags=("conexion",))
+
+        # Ruta directa (un segmento) o ruta en L: flecha solo en el último segmento
+        for i in range(len(puntos) - 1):
+            x1, y1 = puntos[i]
+            x2, y2 = puntos[i + 1]
+            if arrow and i == len(puntos) - 2:
+                render.create_line(key + (i,), x1, y1, x2, y2,
+                                   arrow=tk.LAST, arrowshape=(16, 20, 8), **opciones)
             else:
-                canvas.create_line(x1, y1, x2, y2, 
-                                 fill=color, width=width, capstyle="round")
-        
-        else:  # Ruta L
-            # Dibujar cada segmento
-            for i in range(len(puntos) - 1):
-                x1, y1 = puntos[i]
-                x2, y2 = puntos[i + 1]
-                
-                # Flecha solo en el último segmento
-                if arrow and i == len(puntos) - 2:
-                    canvas.create_line(x1, y1, x2, y2, 
-                                     fill=color, width=width, capstyle="round",
-                                     arrow=tk.LAST, arrowshape=(16, 20, 8))
-                else:
-                    canvas.create_line(x1, y1, x2, y2, 
-                                     fill=color, width=width, capstyle="round")
+                render.create_line(key + (i,), x1, y1, x2, y2, **opciones)
     
     def _dibujar_ruta_en_l(self, canvas, ruta, color, width, arrow=False):
         """Dibuja una ruta en L con los puntos especificados y mejor apariencia"""
@@ -1035,37 +1090,35 @@ class FamilyGraphVisualizer:
         """Registra una ruta como ocupada en el sistema anti-colisiones"""
         puntos = ruta['puntos']
         
-        if ruta['tipo'] == 'directa':
-            x1, y1 = puntos[0]
-            x2, y2 = puntos[1]
+        # Registrar cada segmento (la ruta directa tiene uno solo)
+        for i in range(len(puntos) - 1):
+            x1, y1 = puntos[i]
+            x2, y2 = puntos[i + 1]
             
-            if abs(x1 - x2) < 5:  # Línea vertical
-                rutas_ocupadas['verticales'].append((x1, min(y1, y2), max(y1, y2)))
-            elif abs(y1 - y2) < 5:  # Línea horizontal
-                rutas_ocupadas['horizontales'].append((y1, min(x1, x2), max(x1, x2)))
-            else:  # Línea diagonal
-                rutas_ocupadas['diagonales'].append((x1, y1, x2, y2))
-        
-        else:  # Ruta L
-            # Registrar cada segmento
-            for i in range(len(puntos) - 1):
-                x1, y1 = puntos[i]
-                x2, y2 = puntos[i + 1]
-                
-                if abs(x1 - x2) < 5:  # Segmento vertical
-                    rutas_ocupadas['verticales'].append((x1, min(y1, y2), max(y1, y2)))
-                elif abs(y1 - y2) < 5:  # Segmento horizontal
-                    rutas_ocupadas['horizontales'].append((y1, min(x1, x2), max(x1, x2)))
-                else:  # Segmento diagonal
-                    rutas_ocupadas['diagonales'].append((x1, y1, x2, y2))
+            if abs(x1 - x2) < 5:  # Segmento vertical
+                rutas_ocupadas.add_vertical(x1, min(y1, y2), max(y1, y2))
+            elif abs(y1 - y2) < 5:  # Segmento horizontal
+                rutas_ocupadas.add_horizontal(y1, min(x1, x2), max(x1, x2))
+            else:  # Segmento diagonal
+                rutas_ocupadas.add_diagonal(x1, y1, x2, y2)
     
     def _show_menu(self, event, person):
         """Placeholder - será reemplazado en app.py"""
         print(f"Menú para {person.first_name} - Implementado en app.py")
 
     def _toggle_expand(self, person):
-        """Maneja expand/collapse de una persona (placeholder para futuro)"""
-        print(f"Toggle expand para {person.first_name} - Funcionalidad futura")
+        """Expande la rama oculta de una persona o, si no tiene, colapsa sus descendientes"""
+        card = self._frame['cards'].get(person.cedula) if self._frame else None
+        with self._draw_lock:  # El hilo de trabajo copia estos conjuntos al empezar cada cálculo
+            if card and (card.get('ocultos') or card.get('padres_ocultos')):
+                self._expanded.add(person.cedula)
+                self._collapsed.discard(person.cedula)
+            else:
+                self._collapsed.add(person.cedula)
+                self._expanded.discard(person.cedula)
+            self._view_version += 1
+        if self._redraw:
+            self._redraw()
 
 
 # Función de utilidad
@@ -0,0 +1,84 @@
+# utils/segment_grid.py
+"""Índice espacial de los segmentos ya dibujados (rutas ocupadas).
+
+El enrutado anti-colisiones pregunta, para cada conexión nueva, si choca con
+alguna de las ya registradas. Con listas simples cada consulta recorre todos
+los segmentos (O(E²) en total); con una grilla uniforme solo se revisan los
+segmentos que comparten celda con la consulta.
+"""
+from typing import Iterator, List, Tuple
+
+
+class SegmentGrid:
+    """Grilla uniforme de segmentos horizontales, verticales y diagonales"""
+
+    def __init__(self, cell_size: float = 120.0, row_size: float = 15.0):
+        """
+        Args:
+            cell_size (float): Lado de cada celda de la grilla
+            row_size (float): Alto de las franjas que agrupan horizontales por y
+        """
+        self.cell_size = cell_size
+        self.row_size = row_size
+        self.horizontales: List[Tuple[float, float, float]] = []  # (y, x_inicio, x_fin)
+        self.verticales: List[Tuple[float, float, float]] = []    # (x, y_inicio, y_fin)
+        self.diagonales: List[Tuple[float, float, float, float]] = []  # (x1, y1, x2, y2)
+        self._cells = {}  # (columna, fila) -> [('h' | 'v', índice)]
+        self._rows = {}   # franja de y -> índices de horizontales
+
+    def __getitem__(self, kind: str) -> list:
+        """Acceso de solo lectura con las claves del antiguo diccionario de rutas"""
+        return getattr(self, kind)
+
+    def _cell_range(self, x1, y1, x2, y2) -> Iterator[Tuple[int, int]]:
+        size = self.cell_size
+        for col in range(int(min(x1, x2) // size), int(max(x1, x2) // size) + 1):
+            for row in range(int(min(y1, y2) // size), int(max(y1, y2) // size) + 1):
+                yield col, row
+
+    def _index(self, entry, x1, y1, x2, y2) -> None:
+        for cell in self._cell_range(x1, y1, x2, y2):
+            self._cells.setdefault(cell, []).append(entry)
+
+    def add_horizontal(self, y: float, x_start: float, x_end: float) -> None:
+        self.horizontales.append((y, x_start, x_end))
+        index = len(self.horizontales) - 1
+        self._index(('h', index), x_start, y, x_end, y)
+        self._rows.setdefault(int(y // self.row_size), []).append(index)
+
+    def add_vertical(self, x: float, y_start: float, y_end: float) -> None:
+        self.verticales.append((x, y_start, y_end))
+        self._index(('v', len(self.verticales) - 1), x, y_start, x, y_end)
+
+    def add_diagonal(self, x1: float, y1: float, x2: float, y2: float) -> None:
+        # Las diagonales se registran pero no participan en las colisiones
+        self.diagonales.append((x1, y1, x2, y2))
+
+    def near(self, x1: float, y1: float, x2: float, y2: float) -> Iterator[Tuple[float, float, float, float]]:
+        """
+        Segmentos horizontales y verticales cuyas celdas tocan el rectángulo dado
+
+        Cada segmento se devuelve una sola vez como (x1, y1, x2, y2).
+        """
+        seen = set()
+        for cell in self._cell_range(x1, y1, x2, y2):
+            for entry in self._cells.get(cell, ()):
+                if entry in seen:
+                    continue
+                seen.add(entry)
+                kind, index = entry
+                if kind == 'h':
+                    h_y, h_x1, h_x2 = self.horizontales[index]
+                    yield h_x1, h_y, h_x2, h_y
+                else:
+                    v_x, v_y1, v_y2 = self.verticales[index]
+                    yield v_x, v_y1, v_x, v_y2
+
+    def horizontal_near_y(self, y: float, margin: float) -> bool:
+        """Indica si hay una horizontal a menos de 'margin' de la altura dada"""
+        size = self.row_size
+        for row in range(int((y - margin) // size), int((y + margin) // size) + 1):
+            for index in self._rows.get(row, ()):
+                if abs(self.horizontales[index][0] - y) < margin:
+                    return True
+        return False
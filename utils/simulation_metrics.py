@@ -0,0 +1,169 @@
+# utils/simulation_metrics.py
+"""Medición de los ciclos de simulación.
+
+Cada ciclo medido produce un registro con el tiempo de cada fase (cumpleaños,
+fallecimientos, parejas, nacimientos, efectos...), las personas que revisó y
+contadores de trabajo (evaluaciones de compatibilidad, reintentos de cédula,
+búsquedas). El registro se entrega a los destinos configurados en
+SimulationConfig.metrics_sinks. Si no hay destinos ni perfilado, medir no
+cuesta nada: count() y phase() no hacen nada fuera de un ciclo medido.
+
+El ciclo en curso se guarda en una variable de contexto: lo que cuenten otros
+hilos (la interfaz, el cálculo del árbol) no se suma al ciclo. Los hilos que
+trabajen para el ciclo deben ejecutarse con una copia del contexto
+(contextvars.copy_context().run).
+"""
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_active = contextvars.ContextVar('simulation_metrics', default=None)  # Medición del ciclo en curso
+
+
+class SimulationMetrics:
+    """Tiempos por fase y contadores de un ciclo de simulación"""
+
+    def __init__(self, year: int = None, mode: str = ""):
+        self.year = year
+        self.mode = mode
+        self.phases = {}    # fase -> {'segundos': float, 'personas': int}
+        self.counters = {}  # contador -> cantidad
+        self.total = 0.0
+        self._lock = threading.Lock()  # Los linajes pueden contar desde varios hilos
+
+    def add(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def add_phase(self, name: str, seconds: float, persons: int = 0) -> None:
+        with self._lock:
+            entry = self.phases.setdefault(name, {'segundos': 0.0, 'personas': 0})
+            entry['segundos'] += seconds
+            entry['personas'] += persons
+
+    def to_dict(self) -> dict:
+        return {
+            'año': self.year,
+            'modo': self.mode,
+            'segundos': round(self.total, 6),
+            'fases': {name: {'segundos': round(v['segundos'], 6), 'personas': v['personas']}
+                      for name, v in self.phases.items()},
+            'contadores': dict(self.counters),
+        }
+
+
+class LoggingSink:
+    """Destino que escribe cada registro en un logger"""
+
+    def __init__(self, log: logging.Logger = None, level: int = logging.INFO):
+        self.log = log or logger
+        self.level = level
+
+    def emit(self, record: dict) -> None:
+        fases = ", ".join(f"{name} {v['segundos'] * 1000:.1f}ms/{v['personas']}p"
+                          for name, v in record['fases'].items())
+        self.log.log(self.level, f"⏱️ Ciclo {record['año']} ({record['modo']}): "
+                                 f"{record['segundos'] * 1000:.1f}ms [{fases}] {record['contadores']}")
+
+
+class JsonlSink:
+    """Destino que agrega cada registro como una línea JSON a un archivo"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def emit(self, record: dict) -> None:
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"No se pudieron guardar las métricas de simulación: {e}")
+
+
+class RingBufferSink:
+    """Destino en memoria que conserva solo los últimos registros"""
+
+    def __init__(self, maxlen: int = 100):
+        self.records = deque(maxlen=maxlen)
+
+    def emit(self, record: dict) -> None:
+        self.records.append(record)
+
+
+def count(counter: str, amount: int = 1) -> None:
+    """Suma al contador indicado del ciclo en curso (no hace nada si no se está midiendo)"""
+    metrics = _active.get()
+    if metrics is not None:
+        metrics.add(counter, amount)
+
+
+@contextmanager
+def phase(name: str, persons: int = 0):
+    """Mide el tiempo de una fase del ciclo en curso"""
+    metrics = _active.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_phase(name, time.perf_counter() - start, persons)
+
+
+@contextmanager
+def measure_cycle(config, year: int = None, mode: str = ""):
+    """
+    Mide un ciclo completo y entrega el registro a los destinos de la configuración
+
+    Con config.profile_cycles se captura además un perfil con cProfile: las
+    funciones más costosas se agregan al registro y, si config.profile_path está
+    definido, el perfil completo se guarda en ese archivo (formato pstats).
+    """
+    sinks = list(getattr(config, 'metrics_sinks', None) or [])
+    profile = getattr(config, 'profile_cycles', False)
+    if (not sinks and not profile) or _active.get() is not None:
+        yield None
+        return
+
+    metrics = SimulationMetrics(year, mode)
+    profiler = cProfile.Profile() if profile else None
+    token = _active.set(metrics)
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield metrics
+    finally:
+        if profiler:
+            profiler.disable()
+        metrics.total = time.perf_counter() - start
+        _active.reset(token)
+
+        record = metrics.to_dict()
+        if profiler:
+            record['perfil'] = _top_functions(profiler)
+            if getattr(config, 'profile_path', None):
+                profiler.dump_stats(config.profile_path)
+        for sink in sinks:
+            try:
+                sink.emit(record)
+            except Exception as e:
+                logger.warning(f"Error entregando métricas de simulación: {e}")
+
+
+def _top_functions(profiler: cProfile.Profile, limit: int = 15) -> list:
+    """Resume las funciones con más tiempo acumulado de un perfil"""
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [{'funcion': f"{filename}:{line}({name})", 'llamadas': calls, 'acumulado': round(cumulative, 6)}
+            for (filename, line, name), (_, calls, _, cumulative, _) in entries]
@@ -56,7 +56,7 @@ class TimelineVisualizer:
             # Calcular edad en el evento
             try:
                 from datetime import datetime
-                birth_year = int(person.birth_date.split('-')[0])
+                birth_year = person.birth_year
                 event_year = int(event['fecha'].split('-')[0])
                 age_at_event = event_year - birth_year
                 
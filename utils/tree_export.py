@@ -0,0 +1,308 @@
+# utils/tree_export.py
+"""Exportación del árbol genealógico sin pantalla: SVG o PNG en mosaicos.
+
+Se parte del mismo cuadro que dibuja la interfaz (FamilyGraphVisualizer.compute_frame:
+posiciones, rutas de las conexiones y estilo de cada tarjeta) y no se usa ningún
+widget de Tkinter, así que no hace falta una pantalla.
+
+- SVG: los ítems se escriben al archivo a medida que se recorren, sin armar la
+  lista de dibujo completa en memoria.
+- PNG: el árbol se corta en mosaicos de tamaño fijo. Cada mosaico recibe solo los
+  ítems que lo tocan (consultados en los índices espaciales del cuadro) y se
+  dibuja con Pillow, opcionalmente en un grupo de procesos. La memoria por
+  mosaico queda acotada por su tamaño, y solo hay unos pocos mosaicos en vuelo.
+"""
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import List
+from xml.sax.saxutils import escape, quoteattr
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # Pillow es opcional: sin él solo se puede exportar a SVG
+    Image = None
+
+EXPORT_MARGIN = 40   # Margen alrededor del árbol en la imagen exportada
+TILE_SIZE = 2048     # Lado de cada mosaico PNG en píxeles
+BACKGROUND = "white"
+
+_fonts = {}  # (tamaño, negrita) -> fuente de Pillow, por proceso
+
+
+def _compute_frame(family, visualizer):
+    # Importación local: los procesos de los mosaicos no necesitan el visualizador
+    from utils.graph_visualizer import FamilyGraphVisualizer
+    if visualizer is None:
+        # Se exporta el árbol completo, sin colapsar las ramas lejanas del Ego
+        visualizer = FamilyGraphVisualizer()
+        visualizer.collapse_threshold = math.inf
+    return visualizer, visualizer.compute_frame(family)
+
+
+def _export_bounds(frame: dict) -> tuple:
+    x1, y1, x2, y2 = frame['bbox']
+    return x1 - EXPORT_MARGIN, y1 - EXPORT_MARGIN, x2 + EXPORT_MARGIN, y2 + EXPORT_MARGIN
+
+
+def _font_pixels(font, scale: float = 1.0) -> float:
+    """Tamaño en píxeles de una fuente de Tk (positivo = puntos, negativo = píxeles)"""
+    size = font[1] if isinstance(font, tuple) and len(font) > 1 else 10
+    pixels = -size if size < 0 else size * 4 / 3
+    return pixels * scale
+
+
+def _font_bold(font) -> bool:
+    return isinstance(font, tuple) and "bold" in font[2:]
+
+
+def _arrow_polygon(x1, y1, x2, y2, shape, width) -> list:
+    """Puntas de flecha al estilo de Tk (arrowshape = (cuello, cola, ancho extra))"""
+    length = math.hypot(x2 - x1, y2 - y1)
+    if length == 0:
+        return []
+    neck, tail, spread = shape
+    ux, uy = (x2 - x1) / length, (y2 - y1) / length
+    nx, ny = -uy, ux
+    half = width / 2 + spread
+    base_x, base_y = x2 - ux * tail, y2 - uy * tail
+    return [(x2, y2),
+            (base_x + nx * half, base_y + ny * half),
+            (x2 - ux * neck, y2 - uy * neck),
+            (base_x - nx * half, base_y - ny * half)]
+
+
+def _pairs(coords) -> list:
+    return list(zip(coords[0::2], coords[1::2]))
+
+
+# ---------------------------------------------------------------- SVG
+
+def _svg_text_anchor(anchor: str) -> tuple:
+    horizontal = "start" if "w" in anchor else "end" if "e" in anchor else "middle"
+    vertical = "hanging" if "n" in anchor else "text-after-edge" if "s" in anchor else "central"
+    return horizontal, vertical
+
+
+def _svg_element(spec) -> str:
+    """Elemento SVG equivalente a un ítem de la lista de dibujo"""
+    kind, coords, options = spec
+    if kind == "line":
+        color = options.get('fill', "black")
+        width = options.get('width', 1)
+        stroke = f'stroke="{color}" stroke-width="{width}"'
+        if options.get('capstyle') == "round":
+            stroke += ' stroke-linecap="round" stroke-linejoin="round"'
+        if options.get('dash'):
+            stroke += f' stroke-dasharray="{" ".join(str(d) for d in options["dash"])}"'
+        points = _pairs(coords)
+        if len(points) == 2:
+            (x1, y1), (x2, y2) = points
+            element = f'<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" {stroke}/>'
+        else:
+            element = f'<polyline points="{" ".join(f"{x},{y}" for x, y in points)}" fill="none" {stroke}/>'
+        if options.get('arrow') == "last" and len(points) >= 2:
+            arrow = _arrow_polygon(*points[-2], *points[-1], options.get('arrowshape', (8, 10, 3)), width)
+            element += f'<polygon points="{" ".join(f"{x:.1f},{y:.1f}" for x, y in arrow)}" fill="{color}"/>'
+        return element
+
+    if kind in ("rectangle", "oval"):
+        x1, y1, x2, y2 = coords
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        fill = options.get('fill') or "none"
+        outline = options.get('outline', "black")
+        width = options.get('width', 1)
+        stroke = f'stroke="{outline}" stroke-width="{width}"' if outline and width else 'stroke="none"'
+        if kind == "rectangle":
+            return f'<rect x="{x1}" y="{y1}" width="{x2 - x1}" height="{y2 - y1}" fill="{fill}" {stroke}/>'
+        return (f'<ellipse cx="{(x1 + x2) / 2}" cy="{(y1 + y2) / 2}" rx="{(x2 - x1) / 2}" '
+                f'ry="{(y2 - y1) / 2}" fill="{fill}" {stroke}/>')
+
+    if kind == "text":
+        x, y = coords
+        font = options.get('font', ("Arial", 10))
+        horizontal, vertical = _svg_text_anchor(options.get('anchor', "center"))
+        weight = ' font-weight="bold"' if _font_bold(font) else ""
+        return (f'<text x="{x}" y="{y}" font-family={quoteattr(str(font[0]))} '
+                f'font-size="{_font_pixels(font):.1f}"{weight} fill="{options.get("fill", "black")}" '
+                f'text-anchor="{horizontal}" dominant-baseline="{vertical}">{escape(str(options.get("text", "")))}</text>')
+    return ""
+
+
+def export_svg(family, path: str, visualizer=None, detail: str = "tarjeta") -> str:
+    """
+    Exporta el árbol completo a un archivo SVG
+
+    Args:
+        family (Family): Familia a exportar
+        path (str): Archivo de destino
+        visualizer (FamilyGraphVisualizer): Visualizador a usar (opcional; se exporta
+            lo que muestra, incluidas sus ramas colapsadas)
+        detail (str): Nivel de detalle de las tarjetas ("tarjeta", "rectangulo" o "punto")
+
+    Returns:
+        str: Ruta del archivo escrito
+    """
+    visualizer, frame = _compute_frame(family, visualizer)
+    x1, y1, x2, y2 = _export_bounds(frame)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{x2 - x1:.0f}" height="{y2 - y1:.0f}" '
+                f'viewBox="{x1:.0f} {y1:.0f} {x2 - x1:.0f} {y2 - y1:.0f}">\n')
+        f.write(f'<rect x="{x1:.0f}" y="{y1:.0f}" width="{x2 - x1:.0f}" height="{y2 - y1:.0f}" '
+                f'fill="{BACKGROUND}"/>\n')
+        for _, spec in visualizer.iter_render_items(frame, detail=detail):
+            f.write(_svg_element(spec))
+            f.write("\n")
+        f.write("</svg>\n")
+    return path
+
+
+# ---------------------------------------------------------------- PNG en mosaicos
+
+def _pillow_font(pixels: float, bold: bool):
+    key = (max(1, round(pixels)), bold)
+    font = _fonts.get(key)
+    if font is None:
+        names = ("DejaVuSans-Bold.ttf", "arialbd.ttf") if bold else ("DejaVuSans.ttf", "arial.ttf")
+        for name in names:
+            try:
+                font = ImageFont.truetype(name, key[0])
+                break
+            except OSError:
+                continue
+        else:
+            try:
+                font = ImageFont.load_default(size=key[0])
+            except TypeError:  # Pillow < 10.1: fuente fija
+                font = ImageFont.load_default()
+        _fonts[key] = font
+    return font
+
+
+def _dashed(points: list, pattern: tuple) -> list:
+    """Corta una polilínea en los tramos visibles de un patrón de guiones"""
+    segments = []
+    index, remaining, visible = 0, pattern[0], True
+    for (x1, y1), (x2, y2) in zip(points, points[1:]):
+        length = math.hypot(x2 - x1, y2 - y1)
+        start = 0.0
+        while length - start > 1e-9:
+            step = min(remaining, length - start)
+            if visible:
+                t1, t2 = start / length, (start + step) / length
+                segments.append(((x1 + (x2 - x1) * t1, y1 + (y2 - y1) * t1),
+                                 (x1 + (x2 - x1) * t2, y1 + (y2 - y1) * t2)))
+            start += step
+            remaining -= step
+            if remaining <= 1e-9:
+                index = (index + 1) % len(pattern)
+                remaining, visible = pattern[index], not visible
+    return segments
+
+
+def _render_tile(job) -> str:
+    """Dibuja un mosaico con Pillow (se ejecuta en un proceso del grupo)"""
+    path, size, origin, scale, specs = job
+    image = Image.new("RGB", size, BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    ox, oy = origin
+
+    for kind, coords, options in specs:
+        points = [((x - ox) * scale, (y - oy) * scale) for x, y in _pairs(coords)]
+        if kind == "line":
+            color = options.get('fill', "black")
+            width = max(1, round(options.get('width', 1) * scale))
+            if options.get('dash'):
+                pattern = tuple(d * scale for d in options['dash'])
+                for segment in _dashed(points, pattern):
+                    draw.line(segment, fill=color, width=width)
+            else:
+                draw.line(points, fill=color, width=width, joint="curve")
+            if options.get('arrow') == "last" and len(points) >= 2:
+                shape = tuple(d * scale for d in options.get('arrowshape', (8, 10, 3)))
+                arrow = _arrow_polygon(*points[-2], *points[-1], shape, width)
+                if arrow:
+                    draw.polygon(arrow, fill=color)
+        elif kind in ("rectangle", "oval"):
+            (x1, y1), (x2, y2) = points
+            box = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+            outline = options.get('outline', "black") or None
+            width = round(options.get('width', 1) * scale) if outline else 0
+            shape = draw.rectangle if kind == "rectangle" else draw.ellipse
+            shape(box, fill=options.get('fill') or None, outline=outline if width else None, width=width)
+        elif kind == "text":
+            font = options.get('font', ("Arial", 10))
+            anchor = options.get('anchor', "center")
+            horizontal = "l" if "w" in anchor else "r" if "e" in anchor else "m"
+            vertical = "t" if "n" in anchor else "b" if "s" in anchor else "m"
+            draw.text(points[0], str(options.get('text', "")), fill=options.get('fill', "black"),
+                      font=_pillow_font(_font_pixels(font, scale), _font_bold(font)),
+                      anchor=horizontal + vertical)
+
+    image.save(path)
+    return path
+
+
+def export_png_tiles(family, directory: str, visualizer=None, tile_size: int = TILE_SIZE,
+                     scale: float = 1.0, workers: int = None, detail: str = "tarjeta",
+                     prefix: str = "arbol") -> List[str]:
+    """
+    Exporta el árbol completo como mosaicos PNG de tamaño fijo
+
+    Los mosaicos se nombran {prefix}_{fila}_{columna}.png. Solo se arman los
+    trabajos de unos pocos mosaicos por delante de los que se están dibujando.
+
+    Args:
+        family (Family): Familia a exportar
+        directory (str): Carpeta de destino (se crea si no existe)
+        visualizer (FamilyGraphVisualizer): Visualizador a usar (opcional; se exporta
+            lo que muestra, incluidas sus ramas colapsadas)
+        tile_size (int): Lado de cada mosaico en píxeles
+        scale (float): Píxeles por unidad del layout
+        workers (int): Procesos para dibujar (1 = en este proceso; None = uno por núcleo)
+        detail (str): Nivel de detalle de las tarjetas ("tarjeta", "rectangulo" o "punto")
+        prefix (str): Prefijo del nombre de los archivos
+
+    Returns:
+        list: Rutas de los mosaicos, en orden de filas y columnas
+    """
+    if Image is None:
+        raise ImportError("Se necesita Pillow para exportar el árbol a PNG")
+
+    visualizer, frame = _compute_frame(family, visualizer)
+    os.makedirs(directory, exist_ok=True)
+    x1, y1, x2, y2 = _export_bounds(frame)
+    span = tile_size / scale
+    cols = max(1, math.ceil((x2 - x1) / span))
+    rows = max(1, math.ceil((y2 - y1) / span))
+    digits = max(3, len(str(max(rows, cols) - 1)))  # Nombres de ancho fijo: se ordenan bien
+
+    def jobs():
+        for row in range(rows):
+            for col in range(cols):
+                left, top = x1 + col * span, y1 + row * span
+                region = (left, top, left + span, top + span)
+                size = (min(tile_size, math.ceil((x2 - left) * scale)),
+                        min(tile_size, math.ceil((y2 - top) * scale)))
+                specs = [(kind, coords, {name: value for name, value in options.items() if name != 'tags'})
+                         for _, (kind, coords, options) in visualizer.iter_render_items(frame, region, detail)]
+                path = os.path.join(directory, f"{prefix}_{row:0{digits}d}_{col:0{digits}d}.png")
+                yield path, size, (left, top), scale, specs
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return [_render_tile(job) for job in jobs()]
+
+    paths = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for job in jobs():
+            # Acotar la memoria: no preparar más de dos mosaicos por proceso
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                paths.extend(future.result() for future in done)
+            pending.add(pool.submit(_render_tile, job))
+        paths.extend(future.result() for future in pending)
+    return sorted(paths)
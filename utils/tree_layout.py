@@ -0,0 +1,608 @@
+# utils/tree_layout.py
+"""Motor de layout por niveles para el árbol genealógico.
+
+Las personas se agrupan en unidades (parejas o personas solas) y cada unidad
+queda en el nivel de su generación. Cada linaje (componente conexo) se ubica
+con el algoritmo que le corresponde:
+
+- Árboles de descendientes (cada unidad con una sola unidad de padres): variante
+  de Reingold–Tilford en tiempo lineal (Buchheim, Jünger y Leipert) que centra
+  a los padres sobre sus hijos y nunca cruza conexiones.
+- Pedigríes con uniones entre linajes: layout por capas estilo Sugiyama, con
+  barridos de baricentro para reducir cruces y asignación de coordenadas que
+  acerca cada unidad a sus parientes respetando la separación mínima.
+
+Los linajes se empaquetan de izquierda a derecha por nivel. Las coordenadas no
+dependen del tamaño del canvas y el resultado es determinista.
+
+Para vistas que cambian poco entre un dibujo y el siguiente (ramas que se
+expanden o colapsan) SubtreeLayoutCache ubica los árboles con Reingold–Tilford
+por contornos y guarda la forma de cada subárbol: al expandir una rama solo se
+recalculan la rama y sus ancestros.
+"""
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+COUPLE_WIDTH = 280     # Espacio de una pareja (dos tarjetas lado a lado)
+SINGLE_WIDTH = 160     # Espacio de una persona sola
+COUPLE_SPACING = 150   # Distancia entre los centros de los miembros de una pareja
+UNIT_GAP = 60          # Espacio libre entre unidades vecinas
+LEVEL_HEIGHT = 180     # Distancia vertical entre generaciones
+SWEEPS = 4             # Barridos de baricentro para reducir cruces
+
+
+class LayoutUnit:
+    """Pareja o persona sola que se ubica como un bloque"""
+
+    __slots__ = ('stable_id', 'level', 'members', 'offsets', 'width', 'order_key',
+                 'parents', 'children')
+
+    def __init__(self, stable_id: str, level: int, members: List[str], offsets: List[float], width: float):
+        self.stable_id = stable_id
+        self.level = level
+        self.members = members    # Cédulas de izquierda a derecha
+        self.offsets = offsets    # Desplazamiento de cada miembro respecto al centro
+        self.width = width
+        self.order_key = ("", stable_id)  # Orden entre hermanos (fecha de nacimiento, id)
+        self.parents = []   # [(unidad de padres, desplazamiento en los padres, desplazamiento propio)]
+        self.children = []  # [(unidad hija, desplazamiento propio, desplazamiento en la hija)]
+
+
+def assign_levels(members: Iterable) -> Dict[str, int]:
+    """
+    Asigna a cada persona el nivel de su generación
+
+    Parte de las personas sin padres (nivel 0): la pareja queda en el mismo
+    nivel, los padres uno arriba y los hijos uno abajo. Gana el primer nivel
+    asignado, así que el resultado depende solo del orden de los miembros.
+    """
+    members = list(members)
+    in_family = {p.cedula for p in members}
+    levels = {}
+    queue = deque()
+
+    def visit(person, level):
+        if person is not None and person.cedula in in_family and person.cedula not in levels:
+            levels[person.cedula] = level
+            queue.append(person)
+
+    def spread():
+        while queue:
+            person = queue.popleft()
+            level = levels[person.cedula]
+            visit(person.spouse, level)
+            visit(person.father, level - 1)
+            visit(person.mother, level - 1)
+            for child in person.children:
+                if child.father is person or child.mother is person:
+                    visit(child, level + 1)
+
+    # Cada raíz extiende sus niveles antes de pasar a la siguiente (un cónyuge
+    # sin padres toma el nivel de su pareja, no el de raíz). Cuentan como raíz
+    # quienes no tienen padres entre los miembros dados.
+    for person in members:
+        if not any(parent is not None and parent.cedula in in_family
+                   for parent in (person.father, person.mother)):
+            visit(person, 0)
+            spread()
+
+    # Personas que no se alcanzan desde ninguna raíz
+    for person in members:
+        if person.cedula not in levels:
+            visit(person, 0)
+            spread()
+    return levels
+
+
+def build_units(members: Iterable, levels: Dict[str, int]) -> List[LayoutUnit]:
+    """Agrupa a las personas en parejas y solteros, y conecta cada unidad con sus padres"""
+    members = sorted(members, key=lambda p: str(p.cedula))
+    unit_of = {}
+    offset_of = {}
+    units = []
+
+    for person in members:
+        if person.cedula in unit_of:
+            continue
+        level = levels.get(person.cedula, 0)
+        spouse = person.spouse
+        if (spouse is not None and spouse.cedula in levels and spouse.cedula not in unit_of
+                and levels[spouse.cedula] == level):
+            # Pareja: mujer a la izquierda y hombre a la derecha (o por cédula)
+            if person.gender == 'F' and spouse.gender == 'M':
+                left, right = person.cedula, spouse.cedula
+            elif person.gender == 'M' and spouse.gender == 'F':
+                left, right = spouse.cedula, person.cedula
+            else:
+                left, right = sorted([person.cedula, spouse.cedula], key=str)
+            low, high = sorted([person.cedula, spouse.cedula], key=str)
+            unit = LayoutUnit(f"couple_{low}_{high}", level, [left, right],
+                              [-COUPLE_SPACING / 2, COUPLE_SPACING / 2], COUPLE_WIDTH)
+        else:
+            unit = LayoutUnit(f"single_{person.cedula}", level, [person.cedula], [0.0], SINGLE_WIDTH)
+        units.append(unit)
+        for cedula, offset in zip(unit.members, unit.offsets):
+            unit_of[cedula] = unit
+            offset_of[cedula] = offset
+
+    # Conexiones padre-hijo entre unidades
+    for person in members:
+        unit = unit_of[person.cedula]
+        parents = [p for p in (person.father, person.mother) if p is not None and p.cedula in unit_of]
+        if not parents:
+            continue
+        parent_units = {id(unit_of[p.cedula]): unit_of[p.cedula] for p in parents}
+        for parent_unit in parent_units.values():
+            own = [p for p in parents if unit_of[p.cedula] is parent_unit]
+            # Con los dos padres en la misma pareja la conexión sale del punto medio
+            parent_offset = 0.0 if len(own) == 2 else offset_of[own[0].cedula]
+            child_offset = offset_of[person.cedula]
+            unit.parents.append((parent_unit, parent_offset, child_offset))
+            parent_unit.children.append((unit, parent_offset, child_offset))
+        key = (person.birth_date or "", unit.stable_id)
+        if unit.order_key == ("", unit.stable_id) or key < unit.order_key:
+            unit.order_key = key
+
+    units.sort(key=lambda u: (u.level, u.stable_id))
+    for unit in units:
+        unit.children.sort(key=lambda link: link[0].order_key)
+    return units
+
+
+def _components(units: List[LayoutUnit]) -> List[List[LayoutUnit]]:
+    """Linajes (componentes conexos de unidades), en orden determinista"""
+    seen = set()
+    components = []
+    for unit in units:
+        if id(unit) in seen:
+            continue
+        seen.add(id(unit))
+        component, stack = [], [unit]
+        while stack:
+            current = stack.pop()
+            component.append(current)
+            for other, _, _ in current.parents + current.children:
+                if id(other) not in seen:
+                    seen.add(id(other))
+                    stack.append(other)
+        components.append(component)
+    return components
+
+
+def _is_tree(component: List[LayoutUnit]) -> bool:
+    """Un árbol de descendientes: cada unidad con una sola unidad de padres en el nivel anterior"""
+    for unit in component:
+        if len(unit.parents) > 1:
+            return False
+        if unit.parents and unit.parents[0][0].level != unit.level - 1:
+            return False
+    return True
+
+
+def _separation(left: LayoutUnit, right: LayoutUnit) -> float:
+    return (left.width + right.width) / 2 + UNIT_GAP
+
+
+# --- Reingold–Tilford (Buchheim, Jünger y Leipert) ---------------------------
+
+class _TreeNode:
+    __slots__ = ('unit', 'children', 'parent', 'number', 'x', 'mod', 'thread',
+                 'ancestor', 'change', 'shift', 'midpoint')
+
+    def __init__(self, unit, parent, number):
+        self.unit = unit
+        self.children = []
+        self.parent = parent
+        self.number = number
+        self.x = 0.0
+        self.mod = 0.0
+        self.thread = None
+        self.ancestor = self
+        self.change = 0.0
+        self.shift = 0.0
+        self.midpoint = 0.0
+
+    def left(self):
+        return self.thread or (self.children[0] if self.children else None)
+
+    def right(self):
+        return self.thread or (self.children[-1] if self.children else None)
+
+
+def _node_separation(left: _TreeNode, right: _TreeNode) -> float:
+    return _separation(left.unit, right.unit)
+
+
+def _move_subtree(wl: _TreeNode, wr: _TreeNode, shift: float) -> None:
+    subtrees = wr.number - wl.number
+    wr.change -= shift / subtrees
+    wr.shift += shift
+    wl.change += shift / subtrees
+    wr.x += shift
+    wr.mod += shift
+
+
+def _execute_shifts(v: _TreeNode) -> None:
+    shift = change = 0.0
+    for w in reversed(v.children):
+        w.x += shift
+        w.mod += shift
+        change += w.change
+        shift += w.shift + change
+
+
+def _apportion(v: _TreeNode, default_ancestor: _TreeNode) -> _TreeNode:
+    """Separa el subárbol de v de los subárboles de sus hermanos de la izquierda"""
+    if v.number == 0:
+        return default_ancestor
+    siblings = v.parent.children
+    vir = vor = v
+    vil = siblings[v.number - 1]
+    vol = siblings[0]
+    sir = sor = v.mod
+    sil = vil.mod
+    sol = vol.mod
+    while True:
+        next_right, next_left = vil.right(), vir.left()
+        if next_right is None or next_left is None:
+            break
+        vil, vir = next_right, next_left
+        vol, vor = vol.left(), vor.right()
+        vor.ancestor = v
+        shift = (vil.x + sil) - (vir.x + sir) + _node_separation(vil, vir)
+        if shift > 0:
+            ancestor = vil.ancestor if vil.ancestor.parent is v.parent else default_ancestor
+            _move_subtree(ancestor, v, shift)
+            sir += shift
+            sor += shift
+        sil += vil.mod
+        sir += vir.mod
+        sol += vol.mod
+        sor += vor.mod
+    if vil.right() is not None and vor.right() is None:
+        vor.thread = vil.right()
+        vor.mod += sil - sor
+    else:
+        if vir.left() is not None and vol.left() is None:
+            vol.thread = vir.left()
+            vol.mod += sir - sol
+        default_ancestor = v
+    return default_ancestor
+
+
+def _tidy_tree(component: List[LayoutUnit]) -> Dict[int, float]:
+    """Centro x de cada unidad (por id) de un árbol de descendientes"""
+    root_unit = next(u for u in component if not u.parents)
+    root = _TreeNode(root_unit, None, 0)
+    postorder, stack = [], [root]
+    while stack:
+        node = stack.pop()
+        postorder.append(node)
+        for number, (child, _, _) in enumerate(node.unit.children):
+            child_node = _TreeNode(child, node, number)
+            node.children.append(child_node)
+            stack.append(child_node)
+    postorder.reverse()  # Hijos antes que padres
+
+    for node in postorder:
+        if not node.children:
+            continue
+        default_ancestor = node.children[0]
+        for child in node.children:
+            # Ubicación preliminar junto al hermano de la izquierda (ya separado)
+            if child.number > 0:
+                brother = node.children[child.number - 1]
+                child.x = brother.x + _node_separation(brother, child)
+                if child.children:
+                    child.mod = child.x - child.midpoint
+            default_ancestor = _apportion(child, default_ancestor)
+        _execute_shifts(node)
+        node.midpoint = (node.children[0].x + node.children[-1].x) / 2
+        node.x = node.midpoint
+
+    # Segundo recorrido: acumular los modificadores
+    positions = {}
+    stack = [(root, 0.0)]
+    while stack:
+        node, modsum = stack.pop()
+        positions[id(node.unit)] = node.x + modsum
+        for child in node.children:
+            stack.append((child, modsum + node.mod))
+    return positions
+
+
+# --- Subárboles reutilizables (Reingold–Tilford por contornos) ---------------
+
+class SubtreeLayoutCache:
+    """
+    Formas de subárboles ya calculadas, para reutilizarlas entre layouts
+
+    La forma de un subárbol (desplazamiento de cada hijo y contornos izquierdo y
+    derecho por profundidad) depende solo de su contenido, así que se guarda por
+    firma: unidad, ancho y firmas de los hijos en orden. Al cambiar una rama,
+    solo la rama y sus ancestros tienen firmas nuevas.
+    """
+
+    def __init__(self, max_entries: int = 50000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._ids = {}     # firma -> id corto
+        self._shapes = {}  # id -> (desplazamientos de los hijos, contorno izquierdo, contorno derecho)
+
+    def clear(self) -> None:
+        self._ids.clear()
+        self._shapes.clear()
+
+    @staticmethod
+    def _shape(width: float, children: list) -> tuple:
+        """Ubica los subárboles hijos de izquierda a derecha y centra la unidad sobre ellos"""
+        if not children:
+            return (), [-width / 2], [width / 2]
+        offsets = [0.0]
+        left, right = list(children[0][1]), list(children[0][2])
+        for _, child_left, child_right in children[1:]:
+            # Lo justo para que ninguna profundidad se superponga con lo ya ubicado
+            shift = max(r - l for r, l in zip(right, child_left)) + UNIT_GAP
+            offsets.append(shift)
+            for depth, edge in enumerate(child_right):
+                if depth < len(right):
+                    right[depth] = shift + edge
+                else:
+                    right.append(shift + edge)
+                    left.append(shift + child_left[depth])
+        middle = (offsets[0] + offsets[-1]) / 2
+        return (tuple(offset - middle for offset in offsets),
+                [-width / 2] + [edge - middle for edge in left],
+                [width / 2] + [edge - middle for edge in right])
+
+    def tidy_tree(self, component: List[LayoutUnit]) -> Dict[int, float]:
+        """Centro x de cada unidad (por id) de un árbol de descendientes"""
+        if len(self._shapes) > self.max_entries:
+            self.clear()
+        root = next(u for u in component if not u.parents)
+        order, stack = [], [root]
+        while stack:
+            unit = stack.pop()
+            order.append(unit)
+            stack.extend(child for child, _, _ in unit.children)
+
+        signature_of = {}
+        for unit in reversed(order):  # Hijos antes que padres
+            signature = (unit.stable_id, unit.width,
+                         tuple(signature_of[id(child)] for child, _, _ in unit.children))
+            key = self._ids.setdefault(signature, len(self._ids))
+            signature_of[id(unit)] = key
+            if key in self._shapes:
+                self.hits += 1
+                continue
+            self.misses += 1
+            self._shapes[key] = self._shape(
+                unit.width, [self._shapes[signature_of[id(child)]] for child, _, _ in unit.children])
+
+        positions = {}
+        stack = [(root, 0.0)]
+        while stack:
+            unit, x = stack.pop()
+            positions[id(unit)] = x
+            offsets = self._shapes[signature_of[id(unit)]][0]
+            for (child, _, _), offset in zip(unit.children, offsets):
+                stack.append((child, x + offset))
+        return positions
+
+
+# --- Layout por capas (Sugiyama) ---------------------------------------------
+
+def _count_crossings(edges: List[Tuple[int, int]]) -> int:
+    """Cruces entre dos capas a partir de las posiciones (arriba, abajo) de cada conexión"""
+    if not edges:
+        return 0
+    edges.sort()
+    size = max(lower for _, lower in edges) + 2
+    tree = [0] * size
+    crossings = 0
+    for seen, (_, lower) in enumerate(edges):
+        # Conexiones anteriores que llegan más a la derecha abajo
+        i, not_greater = lower + 1, 0
+        while i > 0:
+            not_greater += tree[i]
+            i -= i & -i
+        crossings += seen - not_greater
+        i = lower + 1
+        while i < size:
+            tree[i] += 1
+            i += i & -i
+    return crossings
+
+
+def _total_crossings(layers: Dict[int, List[LayoutUnit]], position: Dict[int, int]) -> int:
+    total = 0
+    for level, layer in layers.items():
+        edges = [(position[id(parent)], position[id(unit)])
+                 for unit in layer for parent, _, _ in unit.parents if parent.level == level - 1]
+        total += _count_crossings(edges)
+    return total
+
+
+def _initial_order(component: List[LayoutUnit]) -> Dict[int, List[LayoutUnit]]:
+    """
+    Orden inicial de cada capa: recorrido en profundidad desde la primera raíz
+
+    El recorrido sigue tanto a los hijos como a los padres, así los padres de un
+    cónyuge quedan cerca de él en su capa y no al final.
+    """
+    layers = {}
+    seen = set()
+    start = min(component, key=lambda u: (bool(u.parents), u.level, u.stable_id))
+    stack = [start]
+    while stack:
+        unit = stack.pop()
+        if id(unit) in seen:
+            continue
+        seen.add(id(unit))
+        layers.setdefault(unit.level, []).append(unit)
+        stack.extend(child for child, _, _ in reversed(unit.children))
+        stack.extend(parent for parent, _, _ in reversed(unit.parents))
+    return dict(sorted(layers.items()))
+
+
+def _reorder(layer: List[LayoutUnit], position: Dict[int, int], neighbours, adjacent_size: int) -> None:
+    """Ordena una capa por el baricentro de sus vecinos en la capa adyacente"""
+    keys = {}
+    size = len(layer)
+    for index, unit in enumerate(layer):
+        linked = neighbours(unit)
+        # Posiciones relativas (0..1) para comparar baricentros con las unidades sin vecinos
+        if linked:
+            key = (sum(position[id(n)] for n in linked) / len(linked) + 0.5) / adjacent_size
+        else:
+            key = (index + 0.5) / size
+        keys[id(unit)] = (key, index)
+    layer.sort(key=lambda u: keys[id(u)])
+    for index, unit in enumerate(layer):
+        position[id(unit)] = index
+
+
+def _place_in_order(desired: List[float], separations: List[float]) -> List[float]:
+    """
+    Coordenadas lo más cercanas posible a las deseadas respetando el orden
+
+    Minimiza la suma de (x - deseado)² con x[i+1] - x[i] >= separación[i]
+    usando "pool adjacent violators" en tiempo lineal.
+    """
+    offsets = [0.0]
+    for gap in separations:
+        offsets.append(offsets[-1] + gap)
+    blocks = []  # [suma, cantidad]
+    for target, offset in zip(desired, offsets):
+        blocks.append([target - offset, 1])
+        while len(blocks) > 1 and blocks[-2][0] / blocks[-2][1] > blocks[-1][0] / blocks[-1][1]:
+            total, count = blocks.pop()
+            blocks[-1][0] += total
+            blocks[-1][1] += count
+    result = []
+    for total, count in blocks:
+        result.extend([total / count] * count)
+    return [value + offset for value, offset in zip(result, offsets)]
+
+
+def _layered(component: List[LayoutUnit]) -> Dict[int, float]:
+    """Centro x de cada unidad (por id) de un linaje con uniones entre ramas"""
+    layers = _initial_order(component)
+    levels = list(layers)
+    position = {id(u): i for layer in layers.values() for i, u in enumerate(layer)}
+
+    def parents_of(unit):
+        return [p for p, _, _ in unit.parents if p.level == unit.level - 1]
+
+    def children_of(unit):
+        return [c for c, _, _ in unit.children if c.level == unit.level + 1]
+
+    # Reducción de cruces: barridos hacia abajo y hacia arriba, conservando el mejor orden
+    best = {level: list(layer) for level, layer in layers.items()}
+    best_crossings = _total_crossings(layers, position)
+    for _ in range(SWEEPS):
+        if best_crossings == 0:
+            break
+        for previous, level in zip(levels, levels[1:]):
+            _reorder(layers[level], position, parents_of, len(layers[previous]))
+        for level, following in reversed(list(zip(levels, levels[1:]))):
+            _reorder(layers[level], position, children_of, len(layers[following]))
+        crossings = _total_crossings(layers, position)
+        if crossings < best_crossings:
+            best_crossings = crossings
+            best = {level: list(layer) for level, layer in layers.items()}
+    layers = best
+
+    # Coordenadas: empaquetado inicial y acercamiento a padres e hijos
+    x = {}
+    for layer in layers.values():
+        current = 0.0
+        for index, unit in enumerate(layer):
+            if index:
+                current += _separation(layer[index - 1], unit)
+            x[id(unit)] = current
+
+    def align(layer, links):
+        desired = []
+        for unit in layer:
+            targets = [x[id(other)] + other_offset - own_offset
+                       for other, other_offset, own_offset in links(unit)]
+            desired.append(sum(targets) / len(targets) if targets else x[id(unit)])
+        separations = [_separation(a, b) for a, b in zip(layer, layer[1:])]
+        for unit, value in zip(layer, _place_in_order(desired, separations)):
+            x[id(unit)] = value
+
+    def to_parents(unit):
+        return [(p, p_off, c_off) for p, p_off, c_off in unit.parents if p.level == unit.level - 1]
+
+    def to_children(unit):
+        return [(c, c_off, p_off) for c, p_off, c_off in unit.children if c.level == unit.level + 1]
+
+    for _ in range(2):
+        for level in levels[1:]:
+            align(layers[level], to_parents)
+        for level in reversed(levels[:-1]):
+            align(layers[level], to_children)
+    return x
+
+
+# --- Layout completo ----------------------------------------------------------
+
+def compute_layout(members: Iterable, levels: Dict[str, int] = None,
+                   origin: Tuple[float, float] = (50, 80),
+                   cache: SubtreeLayoutCache = None) -> Dict[str, Tuple[float, float]]:
+    """
+    Calcula la posición (x, y) del centro de la tarjeta de cada persona
+
+    Args:
+        members: Personas a ubicar
+        levels (dict): Nivel de cada cédula (por defecto assign_levels)
+        origin (tuple): Esquina superior izquierda del dibujo
+        cache (SubtreeLayoutCache): Si se indica, los árboles reutilizan las formas
+            de subárboles de layouts anteriores
+
+    Returns:
+        dict: cédula -> (x, y)
+    """
+    members = list(members)
+    if not members:
+        return {}
+    if levels is None:
+        levels = assign_levels(members)
+    min_level = min(levels.values())
+    levels = {cedula: level - min_level for cedula, level in levels.items()}
+
+    units = build_units(members, levels)
+    center = {}
+    right_edge = {}  # nivel -> borde derecho ocupado por los linajes ya ubicados
+    for component in _components(units):
+        if not _is_tree(component):
+            x = _layered(component)
+        elif cache is not None:
+            x = cache.tidy_tree(component)
+        else:
+            x = _tidy_tree(component)
+
+        # Empaquetar el linaje a la derecha de los anteriores, nivel por nivel
+        left_edge = {}
+        for unit in component:
+            edge = x[id(unit)] - unit.width / 2
+            left_edge[unit.level] = min(edge, left_edge.get(unit.level, edge))
+        shift = -min(left_edge.values())
+        for level, edge in left_edge.items():
+            if level in right_edge:
+                shift = max(shift, right_edge[level] + UNIT_GAP - edge)
+        for unit in component:
+            center[id(unit)] = x[id(unit)] + shift
+            edge = center[id(unit)] + unit.width / 2
+            right_edge[unit.level] = max(edge, right_edge.get(unit.level, edge))
+
+    origin_x, origin_y = origin
+    pos = {}
+    for unit in units:
+        y = origin_y + unit.level * LEVEL_HEIGHT
+        left = origin_x + center[id(unit)] - unit.width / 2
+        for cedula, offset in zip(unit.members, unit.offsets):
+            pos[cedula] = (left + unit.width / 2 + offset, y)
+    return pos